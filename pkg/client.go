@@ -3,22 +3,26 @@ package main
 import (
 	"bytes"
 	"context"
+	"crypto/rand"
 	"crypto/tls"
 	"crypto/x509"
 	"encoding/json"
 	"errors"
 	"fmt"
 	"io"
+	"net"
 	"net/http"
 	"net/url"
 	"slices"
+	"strings"
+	"sync"
+	"sync/atomic"
 	"time"
 
-	"compress/flate"
-	"compress/gzip"
-	"github.com/andybalholm/brotli"
 	"github.com/grafana/grafana-plugin-sdk-go/backend"
-	"github.com/klauspost/compress/zstd"
+	"go.opentelemetry.io/otel"
+	"go.opentelemetry.io/otel/attribute"
+	"go.opentelemetry.io/otel/propagation"
 )
 
 const TimeZoneFieldName = "timezone()"
@@ -27,43 +31,235 @@ var TimeZoneQuery = fmt.Sprintf("SELECT %s FORMAT JSON;", TimeZoneFieldName)
 
 type ClickHouseClient struct {
 	settings *DatasourceSettings
+	// userQuery adds settings derived from sendProgress and maxRowsToRead,
+	// isAlert selects alertQuerySettings instead of panelQuerySettings for user query
+	userQuery bool
+	isAlert   bool
 }
 
+// MaxErrorBodySize limits part of unparsable response body which is shown in error
+const MaxErrorBodySize = 4096
+
+// KillQueryTimeout limits KILL QUERY request sent after cancellation of query context
+const KillQueryTimeout = 3 * time.Second
+
 func (client *ClickHouseClient) Query(ctx context.Context, query string) (*Response, error) {
+	ctx, span := startSpan(ctx, "ClickHouseClient.Query")
+	defer span.End()
 
 	onErr := func(err error) (*Response, error) {
 		backend.Logger.Error(fmt.Sprintf("clickhouse client query error: %v", err))
+		client.settings.metrics.queryError(err)
+		recordSpanError(span, err)
 		return nil, err
 	}
 
-	datasourceUrl, err := url.Parse(client.settings.Instance.URL)
+	queryId, err := newQueryId()
+	if err != nil {
+		return onErr(fmt.Errorf("unable to generate query_id: %w", err))
+	}
+	span.SetAttributes(attribute.String("queryId", queryId))
+	defer client.settings.metrics.queryStarted()()
+	start := time.Now()
+	resp, release, err := client.send(ctx, query, queryId, client.querySettings())
 	if err != nil {
-		return onErr(fmt.Errorf("unable to parse clickhouse datasource url: %w", err))
+		return onErr(err)
 	}
+	defer release()
+	// body shall be fully read and closed, otherwise connection will not return to the pool
+	defer resp.Body.Close()
+	progress := parseQueryProgress(resp.Header)
+	client.settings.queryProgress.add(progress)
+	headersReceived := time.Now()
+	client.settings.metrics.observeStage("http", headersReceived.Sub(start))
+	span.SetAttributes(attribute.Int("statusCode", resp.StatusCode))
+	_, decodeSpan := startSpan(ctx, "ClickHouseClient.decode")
+	defer decodeSpan.End()
 
-	httpClient := &http.Client{}
-	tlsConfig := &tls.Config{}
-	var req *http.Request
-	if client.settings.UsePost {
-		req, err = http.NewRequest("POST", datasourceUrl.String(), bytes.NewBufferString(query))
+	contentEncoding := resp.Header.Get("Content-Encoding")
+	received := &countingReader{reader: resp.Body}
+	decompressor, putDecompressor, err := getDecompressor(contentEncoding, received)
+	if err != nil {
+		return onErr(err)
+	}
+	defer putDecompressor()
+	reader := &countingReader{reader: decompressor}
+	// decoders stop at the end of result, rest of body is read through decompressor
+	// to verify gzip and zstd checksums and to return keep-alive connection to the pool
+	onDecoded := func(res *Response) (*Response, error) {
+		if _, err := io.Copy(io.Discard, reader); err != nil {
+			return onErr(fmt.Errorf("unable to read response: %w", err))
+		}
+		res.progress = progress
+		return res, nil
+	}
+	defer func() {
+		client.settings.metrics.observeStage("decode", time.Since(headersReceived))
+		client.settings.metrics.observeResponse(contentEncoding, received.n, reader.n)
+		decodeSpan.SetAttributes(attribute.String("contentEncoding", contentEncoding), attribute.Int64("bytes", received.n), attribute.Int64("decompressedBytes", reader.n))
+	}()
+
+	if resp.StatusCode == 200 {
+		switch detectResponseFormat(resp, query) {
+		case ResponseFormatJSONCompact:
+			jsonResp, err := decodeJSONCompact(ctx, reader, client.FetchTimeZone)
+			if err != nil {
+				return onErr(fmt.Errorf("unable to parse JSONCompact response. Error: %w", err))
+			}
+			return onDecoded(jsonResp)
+		case ResponseFormatRowBinary:
+			binaryResp, err := decodeRowBinary(ctx, reader, client.FetchTimeZone)
+			if err != nil {
+				return onErr(fmt.Errorf("unable to parse RowBinaryWithNamesAndTypes response. Error: %w", err))
+			}
+			return onDecoded(binaryResp)
+		}
+	}
+
+	if resp.StatusCode != 200 {
+		body, err := io.ReadAll(reader)
 		if err != nil {
 			return onErr(err)
 		}
+		return onErr(errors.New(string(body)))
+	}
+
+	// JSON is decoded from decompressed stream, whole body is not buffered
+	var jsonResp = &Response{ctx: ctx}
+	decoder := json.NewDecoder(reader)
+	err = decoder.Decode(jsonResp)
+	if err != nil {
+		// ClickHouse writes exception to body when query fails after response is started
+		rest, _ := io.ReadAll(io.LimitReader(io.MultiReader(decoder.Buffered(), reader), MaxErrorBodySize))
+		return onErr(fmt.Errorf("unable to parse json %s. Error: %w", rest, err))
+	}
+
+	return onDecoded(jsonResp)
+}
+
+// querySettings returns ClickHouse settings of panel or alert query, and settings without options for internal queries
+func (client *ClickHouseClient) querySettings() url.Values {
+	switch {
+	case !client.userQuery:
+		return client.settings.internalParams
+	case client.isAlert:
+		return client.settings.alertParams
+	default:
+		return client.settings.panelParams
+	}
+}
+
+// send executes query on replica picked by balancer, idempotent queries are retried on other replicas
+// after connection errors or unavailable replica responses, release shall be called after response body is read
+func (client *ClickHouseClient) send(ctx context.Context, query string, queryId string, querySettings url.Values) (*http.Response, func(), error) {
+	var tried []*replica
+	for {
+		// query canceled while waiting for limiter is not sent, so there is nothing to kill
+		if err := ctx.Err(); err != nil {
+			return nil, nil, err
+		}
+		r := client.settings.replicas.pick(tried)
+		replicaUrl := client.settings.Instance.URL
+		if r != nil {
+			replicaUrl = r.url
+		}
+		req, err := client.newRequest(ctx, replicaUrl, query, queryId, client.settings.UsePost, querySettings)
+		if err != nil {
+			client.settings.replicas.release(r, 0, false)
+			return nil, nil, err
+		}
+
+		// http request is aborted on context cancel, but ClickHouse continues query execution until KILL QUERY
+		stopKill := context.AfterFunc(ctx, func() {
+			client.killQuery(replicaUrl, queryId)
+		})
+		start := time.Now()
+		resp, err := client.settings.httpClient.Do(req)
+		latency := time.Since(start)
+		failed := ctx.Err() == nil && (err != nil || slices.Contains(replicaUnavailableStatuses, resp.StatusCode))
+		if !failed || r == nil || len(tried)+1 >= client.settings.replicas.len() || !isIdempotentQuery(query) {
+			release := func() {
+				stopKill()
+				client.settings.replicas.release(r, latency, failed)
+			}
+			if err != nil {
+				release()
+				return nil, nil, err
+			}
+			return resp, release, nil
+		}
+
+		stopKill()
+		client.settings.replicas.release(r, latency, failed)
+		if err == nil {
+			_, _ = io.Copy(io.Discard, resp.Body)
+			resp.Body.Close()
+			err = fmt.Errorf("unexpected status %s", resp.Status)
+		}
+		backend.Logger.Warn(fmt.Sprintf("clickhouse replica %s failed, query is retried on other replica: %v", replicaUrl, err))
+		tried = append(tried, r)
+	}
+}
+
+// replicaUnavailableStatuses are returned by proxies in front of ClickHouse when replica is down,
+// other error statuses are query errors which will be the same on each replica
+var replicaUnavailableStatuses = []int{http.StatusBadGateway, http.StatusServiceUnavailable, http.StatusGatewayTimeout}
+
+// newRequest builds ClickHouse HTTP request with authorization and compression settings of datasource
+func (client *ClickHouseClient) newRequest(ctx context.Context, replicaUrl string, query string, queryId string, usePost bool, querySettings url.Values) (*http.Request, error) {
+	datasourceUrl, err := url.Parse(replicaUrl)
+	if err != nil {
+		return nil, fmt.Errorf("unable to parse clickhouse datasource url: %w", err)
+	}
+
+	var req *http.Request
+	if usePost {
+		var body io.Reader = strings.NewReader(query)
+		contentEncoding := ""
+		if client.settings.UseCompression && client.settings.RequestCompressionThreshold > 0 && len(query) >= client.settings.RequestCompressionThreshold {
+			compressed, err := compressRequestBody(client.settings.CompressionType, query)
+			if err != nil {
+				return nil, fmt.Errorf("unable to compress query: %w", err)
+			}
+			if compressed != nil {
+				body = bytes.NewReader(compressed)
+				contentEncoding = client.settings.CompressionType
+			}
+		}
+		req, err = http.NewRequestWithContext(ctx, "POST", datasourceUrl.String(), body)
+		if err != nil {
+			return nil, err
+		}
+		if contentEncoding != "" {
+			req.Header.Set("Content-Encoding", contentEncoding)
+		}
 	} else {
-		req, err = http.NewRequest("GET", datasourceUrl.String(), nil)
+		req, err = http.NewRequestWithContext(ctx, "GET", datasourceUrl.String(), nil)
 		if err != nil {
-			return onErr(err)
+			return nil, err
 		}
 		params := req.URL.Query()
 		params.Add("query", query)
 		req.URL.RawQuery = params.Encode()
 	}
+	if queryId != "" || len(querySettings) > 0 {
+		params := req.URL.Query()
+		if queryId != "" {
+			params.Add("query_id", queryId)
+		}
+		for name, values := range querySettings {
+			params[name] = values
+		}
+		req.URL.RawQuery = params.Encode()
+	}
 	if client.settings.UseCompression && slices.Contains([]string{"gzip", "br", "deflate", "zstd"}, client.settings.CompressionType) {
 		req.Header.Set("Accept-Encoding", client.settings.CompressionType)
 		params := req.URL.Query()
 		params.Add("enable_http_compression", "1")
 		req.URL.RawQuery = params.Encode()
 	}
+	// traceparent header joins ClickHouse spans to Grafana trace
+	otel.GetTextMapPropagator().Inject(ctx, propagation.HeaderCarrier(req.Header))
 	if client.settings.Instance.BasicAuthEnabled {
 		password := client.settings.Instance.DecryptedSecureJSONData["basicAuthPassword"]
 		req.SetBasicAuth(client.settings.Instance.BasicAuthUser, password)
@@ -76,86 +272,219 @@ func (client *ClickHouseClient) Query(ctx context.Context, query string) (*Respo
 			req.Header.Set("X-ClickHouse-Key", password)
 		}
 	}
+	return req, nil
+}
 
-	tlsCACert, tlsCACertExists := client.settings.Instance.DecryptedSecureJSONData["tlsCACert"]
-	tlsClientCert, tlsClientCertExists := client.settings.Instance.DecryptedSecureJSONData["tlsClientCert"]
-	tlsClientKey, tlsClientKeyExists := client.settings.Instance.DecryptedSecureJSONData["tlsClientKey"]
+// newQueryId returns random UUID which is sent as query_id, it allows to find and kill query on ClickHouse server
+func newQueryId() (string, error) {
+	var id [16]byte
+	if _, err := rand.Read(id[:]); err != nil {
+		return "", err
+	}
+	id[6] = (id[6] & 0x0f) | 0x40
+	id[8] = (id[8] & 0x3f) | 0x80
+	return fmt.Sprintf("%x-%x-%x-%x-%x", id[0:4], id[4:6], id[6:8], id[8:10], id[10:]), nil
+}
+
+// killQuery stops query which context was canceled, it is called in separate go-routine by context.AfterFunc,
+// POST is used because GET requests are readonly
+func (client *ClickHouseClient) killQuery(replicaUrl string, queryId string) {
+	client.settings.queryCancels.canceled.Add(1)
+	ctx, cancel := context.WithTimeout(context.Background(), KillQueryTimeout)
+	defer cancel()
+	err := client.sendQuery(ctx, replicaUrl, fmt.Sprintf("KILL QUERY WHERE query_id = '%s' ASYNC FORMAT JSON", queryId))
+	if err != nil {
+		client.settings.queryCancels.killErrors.Add(1)
+		backend.Logger.Warn(fmt.Sprintf("unable to kill query_id=%s: %v", queryId, err))
+		return
+	}
+	client.settings.queryCancels.killed.Add(1)
+}
+
+// sendQuery sends POST request to one replica and discards response
+func (client *ClickHouseClient) sendQuery(ctx context.Context, replicaUrl string, query string) error {
+	req, err := client.newRequest(ctx, replicaUrl, query, "", true, nil)
+	if err != nil {
+		return err
+	}
+	resp, err := client.settings.httpClient.Do(req)
+	if err != nil {
+		return err
+	}
+	defer resp.Body.Close()
+	body, err := io.ReadAll(resp.Body)
+	if err != nil {
+		return err
+	}
+	if resp.StatusCode != 200 {
+		return errors.New(string(body))
+	}
+	return nil
+}
+
+// queryCancelCounters counts queries stopped on ClickHouse server after cancellation of request context
+type queryCancelCounters struct {
+	canceled   atomic.Uint64
+	killed     atomic.Uint64
+	killErrors atomic.Uint64
+}
+
+type queryCancelStats struct {
+	Canceled   uint64 `json:"canceled"`
+	Killed     uint64 `json:"killed"`
+	KillErrors uint64 `json:"killErrors"`
+}
+
+func (c *queryCancelCounters) stats() queryCancelStats {
+	return queryCancelStats{Canceled: c.canceled.Load(), Killed: c.killed.Load(), KillErrors: c.killErrors.Load()}
+}
+
+// detectResponseFormat detect result format via X-ClickHouse-Format header, fallback to query suffix
+func detectResponseFormat(resp *http.Response, query string) string {
+	if format := resp.Header.Get("X-ClickHouse-Format"); format != "" {
+		return format
+	}
+	for _, format := range []string{ResponseFormatJSONCompact, ResponseFormatRowBinary} {
+		if strings.HasSuffix(query, "FORMAT "+format) {
+			return format
+		}
+	}
+	return ResponseFormatJSON
+}
+
+// newHTTPClient build one http.Client with pooled keep-alive transport per datasource instance,
+// TLS settings are read once, instead of each query
+func newHTTPClient(settings *DatasourceSettings) (*http.Client, error) {
+	tlsConfig := &tls.Config{}
+	tlsCACert, tlsCACertExists := settings.Instance.DecryptedSecureJSONData["tlsCACert"]
+	tlsClientCert, tlsClientCertExists := settings.Instance.DecryptedSecureJSONData["tlsClientCert"]
+	tlsClientKey, tlsClientKeyExists := settings.Instance.DecryptedSecureJSONData["tlsClientKey"]
 
 	if tlsCACertExists {
 		rootCA := x509.NewCertPool()
 		ok := rootCA.AppendCertsFromPEM([]byte(tlsCACert))
 		if !ok {
-			return onErr(errors.New(fmt.Sprintf("invalid tlsCACert: %s", tlsCACert)))
+			return nil, errors.New(fmt.Sprintf("invalid tlsCACert: %s", tlsCACert))
 		}
 		tlsConfig.RootCAs = rootCA
 	}
 	if tlsClientCertExists != tlsClientKeyExists {
-		return onErr(errors.New("please setup both tlsClientCert and tlsClientKey"))
+		return nil, errors.New("please setup both tlsClientCert and tlsClientKey")
 	}
 	if tlsClientCertExists && tlsClientKeyExists {
 		clientKeyPair, err := tls.X509KeyPair([]byte(tlsClientCert), []byte(tlsClientKey))
 		if err != nil {
-			return onErr(err)
+			return nil, err
 		}
 		tlsConfig.Certificates = append(tlsConfig.Certificates, clientKeyPair)
 	}
-	if client.settings.TLSSkipVerify {
+	if settings.TLSSkipVerify {
 		tlsConfig.InsecureSkipVerify = true
 	}
 
-	httpClient.Transport = &http.Transport{TLSClientConfig: tlsConfig}
-	req = req.WithContext(ctx)
-	resp, err := httpClient.Do(req)
-	if err != nil {
-		return onErr(err)
+	maxIdleConnsPerHost := settings.MaxIdleConnsPerHost
+	if maxIdleConnsPerHost <= 0 {
+		maxIdleConnsPerHost = DefaultMaxIdleConnsPerHost
 	}
-
-	var reader io.Reader
-	switch resp.Header.Get("Content-Encoding") {
-	case "gzip":
-		reader, err = gzip.NewReader(resp.Body)
-		if err != nil {
-			return onErr(fmt.Errorf("error creating GZIP reader: %v", err))
-		}
-	case "deflate":
-		reader = flate.NewReader(resp.Body)
-	case "br":
-		reader = brotli.NewReader(resp.Body)
-	case "zstd":
-		decoder, zstdErr := zstd.NewReader(resp.Body)
-		if zstdErr != nil {
-			return onErr(fmt.Errorf("error creating ZSTD reader: %v", zstdErr))
-		}
-		defer decoder.Close()
-		reader = decoder.IOReadCloser()
-	default:
-		reader = resp.Body
+	maxIdleConns := settings.MaxIdleConns
+	if maxIdleConns <= 0 {
+		maxIdleConns = DefaultMaxIdleConns
+	}
+	idleConnTimeout := DefaultIdleConnTimeout
+	if settings.IdleConnTimeout > 0 {
+		idleConnTimeout = time.Duration(settings.IdleConnTimeout) * time.Second
 	}
 
-	body, err := io.ReadAll(reader)
-	if err != nil {
-		return onErr(err)
+	transport := &http.Transport{
+		DialContext: (&net.Dialer{
+			Timeout:   30 * time.Second,
+			KeepAlive: 30 * time.Second,
+		}).DialContext,
+		TLSClientConfig:       tlsConfig,
+		MaxIdleConns:          maxIdleConns,
+		MaxIdleConnsPerHost:   maxIdleConnsPerHost,
+		MaxConnsPerHost:       settings.MaxConnsPerHost,
+		IdleConnTimeout:       idleConnTimeout,
+		TLSHandshakeTimeout:   10 * time.Second,
+		ExpectContinueTimeout: 1 * time.Second,
 	}
+	return &http.Client{Transport: transport}, nil
+}
 
-	if resp.StatusCode != 200 {
-		return onErr(errors.New(string(body)))
+// FetchTimeZone returns server timezone, cached per datasource instance for timeZoneCacheTTL
+func (client *ClickHouseClient) FetchTimeZone(ctx context.Context) *time.Location {
+	if location, ok := client.settings.serverTimeZone.get(); ok {
+		return location
 	}
+	// timezone is fetched by internal query without settings of user panel or alert query
+	internal := *client
+	internal.userQuery = false
+	res, err := internal.Query(ctx, TimeZoneQuery)
 
-	var jsonResp = &Response{ctx: ctx}
-	err = json.Unmarshal(body, jsonResp)
-	if err != nil {
-		return onErr(fmt.Errorf("unable to parse json %s. Error: %w", body, err))
+	if err == nil && res != nil && len(res.Data) > 0 && res.Data[0] != nil {
+		location := ParseTimeZone(fmt.Sprintf("%v", res.Data[0][TimeZoneFieldName]))
+		client.settings.serverTimeZone.set(location)
+		return location
 	}
 
-	return jsonResp, nil
+	return time.UTC
 }
 
-func (client *ClickHouseClient) FetchTimeZone(ctx context.Context) *time.Location {
-	res, err := client.Query(ctx, TimeZoneQuery)
+type serverTimeZoneCache struct {
+	mu        sync.RWMutex
+	ttl       time.Duration
+	location  *time.Location
+	fetchedAt time.Time
 
-	if err == nil && res != nil && len(res.Data) > 0 && res.Data[0] != nil {
-		return ParseTimeZone(fmt.Sprintf("%v", res.Data[0][TimeZoneFieldName]))
+	hits   atomic.Uint64
+	misses atomic.Uint64
+}
+
+type serverTimeZoneStats struct {
+	Hits   uint64 `json:"hits"`
+	Misses uint64 `json:"misses"`
+}
+
+func newServerTimeZoneCache(ttl time.Duration) *serverTimeZoneCache {
+	return &serverTimeZoneCache{ttl: ttl}
+}
+
+func (c *serverTimeZoneCache) get() (*time.Location, bool) {
+	if c == nil {
+		return nil, false
+	}
+	c.mu.RLock()
+	defer c.mu.RUnlock()
+	if c.location == nil || time.Since(c.fetchedAt) > c.ttl {
+		c.misses.Add(1)
+		return nil, false
 	}
+	c.hits.Add(1)
+	return c.location, true
+}
 
-	return time.UTC
+func (c *serverTimeZoneCache) stats() serverTimeZoneStats {
+	if c == nil {
+		return serverTimeZoneStats{}
+	}
+	return serverTimeZoneStats{Hits: c.hits.Load(), Misses: c.misses.Load()}
+}
+
+func (c *serverTimeZoneCache) set(location *time.Location) {
+	if c == nil {
+		return
+	}
+	c.mu.Lock()
+	defer c.mu.Unlock()
+	c.location = location
+	c.fetchedAt = time.Now()
+}
+
+func (c *serverTimeZoneCache) invalidate() {
+	if c == nil {
+		return
+	}
+	c.mu.Lock()
+	defer c.mu.Unlock()
+	c.location = nil
 }
@@ -0,0 +1,300 @@
+package main
+
+import (
+	"bytes"
+	"compress/gzip"
+	"compress/zlib"
+	"context"
+	"io"
+	"net"
+	"net/http"
+	"net/http/httptest"
+	"strings"
+	"sync"
+	"sync/atomic"
+	"testing"
+	"time"
+
+	"github.com/grafana/grafana-plugin-sdk-go/backend"
+	"github.com/stretchr/testify/require"
+	"go.opentelemetry.io/otel"
+	"go.opentelemetry.io/otel/propagation"
+	"go.opentelemetry.io/otel/trace"
+)
+
+func TestQueryKilledOnContextCancel(t *testing.T) {
+	r := require.New(t)
+	var mu sync.Mutex
+	var queryId string
+	killed := make(chan string, 1)
+	started := make(chan struct{})
+	server := httptest.NewServer(http.HandlerFunc(func(w http.ResponseWriter, req *http.Request) {
+		body, _ := io.ReadAll(req.Body)
+		if strings.HasPrefix(string(body), "KILL QUERY") {
+			killed <- req.Method + " " + string(body)
+			return
+		}
+		mu.Lock()
+		queryId = req.URL.Query().Get("query_id")
+		mu.Unlock()
+		close(started)
+		<-req.Context().Done()
+	}))
+	defer server.Close()
+
+	settings := &DatasourceSettings{
+		Instance:   backend.DataSourceInstanceSettings{URL: server.URL},
+		httpClient: server.Client(),
+	}
+	client := &ClickHouseClient{settings: settings}
+	ctx, cancel := context.WithCancel(context.Background())
+	go func() {
+		<-started
+		cancel()
+	}()
+	_, err := client.Query(ctx, "SELECT sleep(3) FORMAT JSON")
+	r.ErrorIs(err, context.Canceled)
+
+	select {
+	case killQuery := <-killed:
+		mu.Lock()
+		defer mu.Unlock()
+		r.Len(queryId, 36)
+		r.Equal("POST KILL QUERY WHERE query_id = '"+queryId+"' ASYNC FORMAT JSON", killQuery)
+	case <-time.After(KillQueryTimeout):
+		t.Fatal("KILL QUERY was not sent")
+	}
+	r.Eventually(func() bool {
+		return settings.queryCancels.stats() == queryCancelStats{Canceled: 1, Killed: 1}
+	}, time.Second, time.Millisecond)
+}
+
+func TestQueryNotKilledAfterFinish(t *testing.T) {
+	r := require.New(t)
+	var queryId string
+	server := httptest.NewServer(http.HandlerFunc(func(w http.ResponseWriter, req *http.Request) {
+		queryId = req.URL.Query().Get("query_id")
+		_, _ = w.Write([]byte(`{"meta":[{"name":"1","type":"UInt8"}],"data":[{"1":1}],"rows":1}`))
+	}))
+	defer server.Close()
+
+	settings := &DatasourceSettings{
+		Instance:   backend.DataSourceInstanceSettings{URL: server.URL},
+		httpClient: server.Client(),
+		UsePost:    true,
+	}
+	client := &ClickHouseClient{settings: settings}
+	ctx, cancel := context.WithCancel(context.Background())
+	response, err := client.Query(ctx, "SELECT 1 FORMAT JSON")
+	r.NoError(err)
+	r.Equal(1, response.Rows)
+	r.Len(queryId, 36)
+	cancel()
+	time.Sleep(10 * time.Millisecond)
+	r.Equal(queryCancelStats{}, settings.queryCancels.stats())
+}
+
+func TestQueryNotSentAfterContextDone(t *testing.T) {
+	r := require.New(t)
+	var requests atomic.Int32
+	server := httptest.NewServer(http.HandlerFunc(func(w http.ResponseWriter, req *http.Request) {
+		requests.Add(1)
+	}))
+	defer server.Close()
+
+	settings := &DatasourceSettings{
+		Instance:   backend.DataSourceInstanceSettings{URL: server.URL},
+		httpClient: server.Client(),
+	}
+	client := &ClickHouseClient{settings: settings}
+	ctx, cancel := context.WithCancel(context.Background())
+	cancel()
+	_, err := client.Query(ctx, "SELECT 1 FORMAT JSON")
+	r.ErrorIs(err, context.Canceled)
+	time.Sleep(10 * time.Millisecond)
+	r.Equal(int32(0), requests.Load())
+	r.Equal(queryCancelStats{}, settings.queryCancels.stats())
+}
+
+func TestQueryConnectionReused(t *testing.T) {
+	r := require.New(t)
+	var connections atomic.Int32
+	server := httptest.NewUnstartedServer(http.HandlerFunc(func(w http.ResponseWriter, req *http.Request) {
+		body := `{"meta":[{"name":"1","type":"UInt8"}],"data":[{"1":1}],"rows":1}`
+		if strings.HasSuffix(req.URL.Query().Get("query"), "FORMAT JSONCompact") {
+			body = `{"meta":[{"name":"1","type":"UInt8"}],"data":[[1]],"rows":1}`
+		}
+		// net/http reads at most 256KB of unread body on Close before it drops connection
+		body += strings.Repeat("\n", 512*1024)
+		if req.Header.Get("Accept-Encoding") != "gzip" {
+			_, _ = w.Write([]byte(body))
+			return
+		}
+		w.Header().Set("Content-Encoding", "gzip")
+		gzipWriter := gzip.NewWriter(w)
+		_, _ = gzipWriter.Write([]byte(body))
+		_ = gzipWriter.Close()
+	}))
+	server.Config.ConnState = func(_ net.Conn, state http.ConnState) {
+		if state == http.StateNew {
+			connections.Add(1)
+		}
+	}
+	server.Start()
+	defer server.Close()
+
+	settings := &DatasourceSettings{
+		Instance:        backend.DataSourceInstanceSettings{URL: server.URL},
+		httpClient:      server.Client(),
+		CompressionType: "gzip",
+	}
+	client := &ClickHouseClient{settings: settings}
+	for _, useCompression := range []bool{false, true} {
+		settings.UseCompression = useCompression
+		for _, query := range []string{"SELECT 1 FORMAT JSON", "SELECT 1 FORMAT JSON", "SELECT 1 FORMAT JSONCompact"} {
+			response, err := client.Query(context.Background(), query)
+			r.NoError(err)
+			r.Equal(1, response.Rows)
+		}
+	}
+	r.Equal(int32(1), connections.Load())
+}
+
+func TestQuerySettingsParams(t *testing.T) {
+	r := require.New(t)
+	instance, err := NewDatasourceSettings(context.Background(), backend.DataSourceInstanceSettings{
+		URL: "http://localhost:8123",
+		JSONData: []byte(`{
+			"querySettings": {"max_execution_time": 60, "use_query_cache": true, "result_overflow_mode": "break"},
+			"panelQuerySettings": {"max_result_rows": 100000, "priority": 1},
+			"alertQuerySettings": {"max_execution_time": 20, "use_query_cache": false}
+		}`),
+	})
+	r.NoError(err)
+	settings := instance.(*DatasourceSettings)
+
+	client := &ClickHouseClient{settings: settings}
+	req, err := client.newRequest(context.Background(), settings.Instance.URL, "SELECT 1", "id", false, settings.panelParams)
+	r.NoError(err)
+	params := req.URL.Query()
+	r.Equal("60", params.Get("max_execution_time"))
+	r.Equal("1", params.Get("use_query_cache"))
+	r.Equal("break", params.Get("result_overflow_mode"))
+	r.Equal("100000", params.Get("max_result_rows"))
+	r.Equal("1", params.Get("priority"))
+	r.Equal("id", params.Get("query_id"))
+	r.Equal("SELECT 1", params.Get("query"))
+
+	req, err = client.newRequest(context.Background(), settings.Instance.URL, "SELECT 1", "id", false, settings.alertParams)
+	r.NoError(err)
+	params = req.URL.Query()
+	r.Equal("20", params.Get("max_execution_time"))
+	r.Equal("0", params.Get("use_query_cache"))
+	r.False(params.Has("max_result_rows"))
+
+	// internal queries of plugin are sent without panel settings
+	req, err = client.newRequest(context.Background(), settings.Instance.URL, "SELECT 1", "id", false, settings.internalParams)
+	r.NoError(err)
+	params = req.URL.Query()
+	r.Equal("60", params.Get("max_execution_time"))
+	r.Equal("1", params.Get("use_query_cache"))
+	r.False(params.Has("max_result_rows"))
+	r.False(params.Has("priority"))
+
+	_, err = NewDatasourceSettings(context.Background(), backend.DataSourceInstanceSettings{
+		JSONData: []byte(`{"alertQuerySettings": {"query_id": "x"}}`),
+	})
+	r.ErrorContains(err, "query_id can't be used as ClickHouse setting")
+
+	_, err = NewDatasourceSettings(context.Background(), backend.DataSourceInstanceSettings{
+		JSONData: []byte(`{"querySettings": {"query_id": "x"}}`),
+	})
+	r.ErrorContains(err, "invalid querySettings")
+}
+
+func TestRequestCompression(t *testing.T) {
+	r := require.New(t)
+	var contentEncoding, receivedQuery string
+	server := httptest.NewServer(http.HandlerFunc(func(w http.ResponseWriter, req *http.Request) {
+		contentEncoding = req.Header.Get("Content-Encoding")
+		var reader io.Reader
+		if contentEncoding == "deflate" {
+			// ClickHouse decodes deflate request body as zlib stream
+			zlibReader, err := zlib.NewReader(req.Body)
+			if err != nil {
+				w.WriteHeader(http.StatusBadRequest)
+				return
+			}
+			reader = zlibReader
+		} else {
+			decompressor, put, err := getDecompressor(contentEncoding, req.Body)
+			if err != nil {
+				w.WriteHeader(http.StatusBadRequest)
+				return
+			}
+			defer put()
+			reader = decompressor
+		}
+		body, _ := io.ReadAll(reader)
+		receivedQuery = string(body)
+		_, _ = w.Write([]byte(`{"meta":[{"name":"1","type":"UInt8"}],"data":[{"1":1}],"rows":1}`))
+	}))
+	defer server.Close()
+
+	longQuery := "SELECT 1 FROM t WHERE host IN (" + strings.Repeat("'host', ", 1000) + "'host') FORMAT JSON"
+	for _, compressionType := range compressionTypes {
+		settings := &DatasourceSettings{
+			Instance:                    backend.DataSourceInstanceSettings{URL: server.URL},
+			UsePost:                     true,
+			UseCompression:              true,
+			CompressionType:             compressionType,
+			RequestCompressionThreshold: 1024,
+			httpClient:                  server.Client(),
+		}
+		client := &ClickHouseClient{settings: settings}
+		_, err := client.Query(context.Background(), longQuery)
+		r.NoError(err)
+		r.Equal(compressionType, contentEncoding)
+		r.Equal(longQuery, receivedQuery)
+
+		// short queries are sent as is
+		_, err = client.Query(context.Background(), DefaultQuery)
+		r.NoError(err)
+		r.Equal("", contentEncoding)
+		r.Equal(DefaultQuery, receivedQuery)
+	}
+}
+
+func TestDeflateRequestBodyIsZlib(t *testing.T) {
+	r := require.New(t)
+	query := "SELECT 1 FROM t WHERE host IN (" + strings.Repeat("'host', ", 1000) + "'host') FORMAT JSON"
+	// pooled writer is reused by the second call
+	for i := 0; i < 2; i++ {
+		compressed, err := compressRequestBody("deflate", query)
+		r.NoError(err)
+		r.Equal(byte(0x78), compressed[0])
+		reader, err := zlib.NewReader(bytes.NewReader(compressed))
+		r.NoError(err)
+		body, err := io.ReadAll(reader)
+		r.NoError(err)
+		r.Equal(query, string(body))
+	}
+}
+
+func TestTraceparentSentToClickHouse(t *testing.T) {
+	r := require.New(t)
+	otel.SetTextMapPropagator(propagation.TraceContext{})
+	defer otel.SetTextMapPropagator(propagation.NewCompositeTextMapPropagator())
+
+	traceId, _ := trace.TraceIDFromHex("4bf92f3577b34da6a3ce929d0e0e4736")
+	spanId, _ := trace.SpanIDFromHex("00f067aa0ba902b7")
+	ctx := trace.ContextWithSpanContext(context.Background(), trace.NewSpanContext(trace.SpanContextConfig{
+		TraceID:    traceId,
+		SpanID:     spanId,
+		TraceFlags: trace.FlagsSampled,
+	}))
+	client := &ClickHouseClient{settings: &DatasourceSettings{Instance: backend.DataSourceInstanceSettings{URL: "http://localhost:8123"}}}
+	req, err := client.newRequest(ctx, client.settings.Instance.URL, DefaultQuery, "", false, nil)
+	r.NoError(err)
+	r.Equal("00-4bf92f3577b34da6a3ce929d0e0e4736-00f067aa0ba902b7-01", req.Header.Get("traceparent"))
+}
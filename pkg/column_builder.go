@@ -0,0 +1,93 @@
+package main
+
+import (
+	"strings"
+	"time"
+
+	"github.com/grafana/grafana-plugin-sdk-go/data"
+)
+
+// columnBuilder appends raw values decoded from JSON to typed vector of one data.Field,
+// conversion is resolved once per column instead of ParseValue type switch for each cell
+type columnBuilder interface {
+	append(value interface{})
+	field() *data.Field
+}
+
+type typedColumnBuilder[T any] struct {
+	name   string
+	values []T
+	parse  func(value interface{}) T
+}
+
+func (b *typedColumnBuilder[T]) append(value interface{}) {
+	b.values = append(b.values, b.parse(value))
+}
+
+func (b *typedColumnBuilder[T]) field() *data.Field {
+	return data.NewField(b.name, nil, b.values)
+}
+
+// newTypedColumnBuilder pre-allocates rows values, zero is used when value is not nullable and can't be converted
+func newTypedColumnBuilder[T any](fieldName string, rows int, isNullable bool, zero T, convert func(value interface{}) (T, bool)) columnBuilder {
+	if isNullable {
+		return &typedColumnBuilder[*T]{name: fieldName, values: make([]*T, 0, rows), parse: func(value interface{}) *T {
+			if v, ok := convert(value); ok {
+				return &v
+			}
+			return nil
+		}}
+	}
+	return &typedColumnBuilder[T]{name: fieldName, values: make([]T, 0, rows), parse: func(value interface{}) T {
+		if v, ok := convert(value); ok {
+			return v
+		}
+		return zero
+	}}
+}
+
+// newColumnBuilder returns builder for the same data.Field type as NewDataFieldByType and the same values as ParseValue
+func newColumnBuilder(fieldName, fieldType string, tz *time.Location, rows int) columnBuilder {
+	if strings.HasPrefix(fieldType, "LowCardinality") {
+		fieldType = strings.TrimSuffix(strings.TrimPrefix(fieldType, "LowCardinality("), ")")
+	}
+	isNullable := strings.HasPrefix(fieldType, "Nullable(")
+	if isNullable {
+		fieldType = strings.TrimSuffix(strings.TrimPrefix(fieldType, "Nullable("), ")")
+	}
+
+	switch fieldType {
+	case "String", "UUID", "IPv6", "IPv4":
+		return newTypedColumnBuilder(fieldName, rows, isNullable, "", toString)
+	case "UInt8", "UInt16", "UInt32", "Int8", "Int16", "Int32", "Float32", "Float64":
+		return newTypedColumnBuilder(fieldName, rows, isNullable, 0.0, toFloat64)
+	case "UInt64":
+		if fieldName == "t" {
+			return newTypedColumnBuilder(fieldName, rows, isNullable, time.Unix(0, 0), toTimestamp)
+		}
+		return newTypedColumnBuilder(fieldName, rows, isNullable, uint64(0), toUInt64)
+	case "Int64":
+		if fieldName == "t" {
+			return newTypedColumnBuilder(fieldName, rows, isNullable, time.Unix(0, 0), toTimestamp)
+		}
+		return newTypedColumnBuilder(fieldName, rows, isNullable, int64(0), toInt64)
+	}
+
+	if strings.HasPrefix(fieldType, "Decimal") {
+		return newTypedColumnBuilder(fieldName, rows, isNullable, 0.0, toFloat64)
+	} else if strings.HasPrefix(fieldType, "FixedString") || strings.HasPrefix(fieldType, "Enum") {
+		return newTypedColumnBuilder(fieldName, rows, isNullable, "", toString)
+	} else if layout, isDate := dateTimeLayoutByFieldType(fieldType); isDate {
+		return newTypedColumnBuilder(fieldName, rows, isNullable, time.Unix(0, 0), func(value interface{}) (time.Time, bool) {
+			return toDateTime(value, layout, tz)
+		})
+	}
+	// Map and other compound types are rare, keep ParseValue with JSON encoding for them
+	return newTypedColumnBuilder(fieldName, rows, isNullable, "", func(value interface{}) (string, bool) {
+		if isNullable && value == nil {
+			return "", false
+		}
+		str, ok := ParseValue(fieldName, fieldType, tz, value, false).(string)
+		return str, ok
+	})
+}
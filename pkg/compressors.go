@@ -0,0 +1,79 @@
+package main
+
+import (
+	"bytes"
+	"compress/gzip"
+	"compress/zlib"
+	"io"
+	"sync"
+
+	"github.com/andybalholm/brotli"
+	"github.com/klauspost/compress/zstd"
+)
+
+// compressor pools keep writers with their dictionaries and hash tables between requests
+var (
+	gzipWriters   sync.Pool
+	zlibWriters   sync.Pool
+	brotliWriters sync.Pool
+	// zstdEncoder is used only with EncodeAll which is safe for concurrent calls and doesn't start go-routines
+	zstdEncoder, _ = zstd.NewWriter(nil)
+)
+
+// compressRequestBody compresses POST body of query, returns nil when compression type is not supported
+// or compressed body is not smaller, ClickHouse decompresses body according Content-Encoding header
+func compressRequestBody(contentEncoding string, query string) ([]byte, error) {
+	var compressed []byte
+	switch contentEncoding {
+	case "zstd":
+		compressed = zstdEncoder.EncodeAll([]byte(query), make([]byte, 0, len(query)/4))
+	case "gzip", "deflate", "br":
+		buffer := bytes.NewBuffer(make([]byte, 0, len(query)/4))
+		writer, put := getCompressor(contentEncoding, buffer)
+		defer put()
+		if _, err := io.WriteString(writer, query); err != nil {
+			return nil, err
+		}
+		if err := writer.Close(); err != nil {
+			return nil, err
+		}
+		compressed = buffer.Bytes()
+	default:
+		return nil, nil
+	}
+	if len(compressed) >= len(query) {
+		return nil, nil
+	}
+	return compressed, nil
+}
+
+// getCompressor returns pooled writer reset to dst, put returns writer to pool after Close
+func getCompressor(contentEncoding string, dst io.Writer) (io.WriteCloser, func()) {
+	switch contentEncoding {
+	case "gzip":
+		writer, isPooled := gzipWriters.Get().(*gzip.Writer)
+		if isPooled {
+			writer.Reset(dst)
+		} else {
+			writer = gzip.NewWriter(dst)
+		}
+		return writer, func() { gzipWriters.Put(writer) }
+	case "deflate":
+		// ClickHouse reads Content-Encoding: deflate as zlib stream, not as raw DEFLATE
+		writer, isPooled := zlibWriters.Get().(*zlib.Writer)
+		if isPooled {
+			writer.Reset(dst)
+		} else {
+			writer = zlib.NewWriter(dst)
+		}
+		return writer, func() { zlibWriters.Put(writer) }
+	default:
+		writer, isPooled := brotliWriters.Get().(*brotli.Writer)
+		if isPooled {
+			writer.Reset(dst)
+		} else {
+			writer = brotli.NewWriterLevel(dst, brotli.DefaultCompression)
+		}
+		return writer, func() { brotliWriters.Put(writer) }
+	}
+}
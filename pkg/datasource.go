@@ -4,11 +4,17 @@ import (
 	"encoding/json"
 	"fmt"
 	"golang.org/x/sync/errgroup"
+	"net/http"
+	"net/url"
+	"slices"
+	"time"
 
 	"context"
 	"github.com/grafana/grafana-plugin-sdk-go/backend"
 	"github.com/grafana/grafana-plugin-sdk-go/backend/datasource"
 	"github.com/grafana/grafana-plugin-sdk-go/backend/instancemgmt"
+	"github.com/grafana/grafana-plugin-sdk-go/data"
+	"go.opentelemetry.io/otel/attribute"
 )
 
 func GetDatasourceServeOpts() datasource.ServeOpts {
@@ -17,8 +23,9 @@ func GetDatasourceServeOpts() datasource.ServeOpts {
 	}
 
 	return datasource.ServeOpts{
-		QueryDataHandler:   ds,
-		CheckHealthHandler: ds,
+		QueryDataHandler:    ds,
+		CheckHealthHandler:  ds,
+		CallResourceHandler: ds,
 	}
 }
 
@@ -38,9 +45,12 @@ func (ds *ClickHouseDatasource) getClient(ctx backend.PluginContext) (*ClickHous
 }
 
 func (ds *ClickHouseDatasource) executeQuery(pluginContext backend.PluginContext, ctx context.Context, query *Query) backend.DataResponse {
+	ctx, span := startSpan(ctx, "ClickHouseDatasource.executeQuery", attribute.String("refId", query.RefId), attribute.String("ruleUid", query.RuleUid))
+	defer span.End()
 
 	onErr := func(err error) backend.DataResponse {
 		backend.Logger.Error(fmt.Sprintf("Datasource executeQuery error: %s", err))
+		recordSpanError(span, err)
 		return backend.DataResponse{Error: err}
 	}
 
@@ -48,54 +58,214 @@ func (ds *ClickHouseDatasource) executeQuery(pluginContext backend.PluginContext
 	if err != nil {
 		return onErr(err)
 	}
-	sql := query.ApplyTimeRangeToQuery()
-	clickhouseResponse, err := client.Query(ctx, sql)
+	// alert rules are evaluated with alertQuerySettings
+	client.userQuery = true
+	client.isAlert = query.RuleUid != ""
+	sql := applyResponseFormat(query.ApplyTimeRangeToQuery(), client.settings.ResponseFormat)
+	flightKey := sql
+	if client.isAlert {
+		flightKey = "alert\x00" + sql
+	}
+	var queueWait time.Duration
+	start := time.Now()
+	clickhouseResponse, isShared, err := client.settings.queryFlights.do(ctx, flightKey, func(ctx context.Context) (*Response, error) {
+		release, wait, err := client.settings.queryLimiter.acquire(ctx, userLogin(pluginContext))
+		client.settings.metrics.observeStage("queue", wait)
+		if err != nil {
+			client.settings.metrics.queryError(err)
+			return nil, fmt.Errorf("query canceled after waiting %v in queue: %w", wait, err)
+		}
+		defer release()
+		queueWait = wait
+		response, err := client.Query(ctx, sql)
+		if err != nil {
+			return nil, err
+		}
+		client.settings.metrics.observeRows(response.Rows)
+		// response can be shared between identical queries, so typed columns are built once before toFrames
+		response.buildColumns(client.FetchTimeZone)
+		return response, nil
+	})
 	if err != nil {
 		return onErr(err)
 	}
+	execution := time.Since(start) - queueWait
+	span.SetAttributes(attribute.Bool("shared", isShared), attribute.Int64("queueWaitMs", queueWait.Milliseconds()), attribute.Int("rows", clickhouseResponse.Rows))
 
+	framesStart := time.Now()
+	_, framesSpan := startSpan(ctx, "Response.toFrames")
 	frames, err := clickhouseResponse.toFrames(query, client.FetchTimeZone)
 	if err != nil {
+		framesSpan.End()
+		client.settings.metrics.queryError(err)
 		return onErr(err)
 	}
+	framesSpan.SetAttributes(attribute.Int("frames", len(frames)))
+	framesSpan.End()
+	client.settings.metrics.observeStage("frames", time.Since(framesStart))
+	addQueryTimeStats(frames, queueWait, execution)
+	addQueryProgressStats(frames, clickhouseResponse.progress)
 
-	backend.Logger.Debug(fmt.Sprintf("queryResponse: %s returns %v frames", sql, len(frames)))
+	backend.Logger.Debug(fmt.Sprintf("queryResponse: %s returns %v frames, queue wait %v, execution %v, shared %v", sql, len(frames), queueWait, execution, isShared))
 	return backend.DataResponse{
 		Frames: frames,
 	}
 }
 
+// userLogin is used to queue queries of different users fairly, alert queries don't have user
+func userLogin(pluginContext backend.PluginContext) string {
+	if pluginContext.User == nil {
+		return ""
+	}
+	return pluginContext.User.Login
+}
+
+// addQueryTimeStats shows time spent in queue of queryLimiter separately from ClickHouse execution time in query inspector
+func addQueryTimeStats(frames data.Frames, queueWait, execution time.Duration) {
+	for _, frame := range frames {
+		if frame.Meta == nil {
+			frame.Meta = &data.FrameMeta{}
+		}
+		frame.Meta.Stats = append(frame.Meta.Stats,
+			data.QueryStat{FieldConfig: data.FieldConfig{DisplayName: "Queue wait time", Unit: "ms"}, Value: float64(queueWait.Microseconds()) / 1000},
+			data.QueryStat{FieldConfig: data.FieldConfig{DisplayName: "Execution time", Unit: "ms"}, Value: float64(execution.Microseconds()) / 1000},
+		)
+	}
+}
+
 func (ds *ClickHouseDatasource) evalQuery(pluginContext backend.PluginContext, ctx context.Context, evalQuery *EvalQuery) backend.DataResponse {
+	ctx, span := startSpan(ctx, "ClickHouseDatasource.evalQuery", attribute.String("refId", evalQuery.RefId), attribute.String("ruleUid", evalQuery.RuleUid))
+	defer span.End()
+
 	onErr := func(err error) backend.DataResponse {
 		backend.Logger.Error(fmt.Sprintf("Datasource evalQuery error: %s", err))
+		recordSpanError(span, err)
 		return backend.DataResponse{Error: err}
 	}
 
+	client, err := ds.getClient(pluginContext)
+	if err != nil {
+		return onErr(err)
+	}
+	evalQuery.cache = client.settings.evalQueryCache
+	_, macrosSpan := startSpan(ctx, "EvalQuery.ApplyMacrosAndTimeRangeToQuery")
 	sql, err := evalQuery.ApplyMacrosAndTimeRangeToQuery()
+	macrosSpan.End()
+	if err != nil {
+		return onErr(err)
+	}
+	// Query.ApplyTimeRangeToQuery formats time filters again, rounded range keeps $from and $to rounded
+	from, to, err := evalQuery.roundedTimeRange()
+	if err != nil {
+		return onErr(err)
+	}
+
+	plan, isCacheable, err := client.settings.resultCache.newResultCachePlan(evalQuery)
+	if err != nil {
+		return onErr(err)
+	}
+	if !isCacheable {
+		return ds.executeEvalQuery(pluginContext, ctx, evalQuery, sql, from, to)
+	}
+	span.SetAttributes(attribute.Bool("resultCacheHit", plan.cached != nil))
+	if plan.cached == nil {
+		response := ds.executeEvalQuery(pluginContext, ctx, evalQuery, sql, from, to)
+		if response.Error == nil {
+			client.settings.resultCache.set(plan.key, plan.from, plan.to, response.Frames)
+		}
+		return response
+	}
+
+	// only buckets after cached result and unsettled window are fetched, buckets are the same as for whole range
+	tailQuery := *evalQuery
+	tailQuery.From = plan.tailFrom
+	tailQuery.Round = ""
+	tailQuery.naturalTimeSeriesDuration = evalQuery.convertTimestamp(plan.to) - evalQuery.convertTimestamp(plan.from)
+	tailSQL, err := tailQuery.ApplyMacrosAndTimeRangeToQuery()
+	if err != nil {
+		return onErr(err)
+	}
+	response := ds.executeEvalQuery(pluginContext, ctx, &tailQuery, tailSQL, plan.tailFrom, to)
+	if response.Error != nil {
+		return response
+	}
+	frames, isMerged := mergeTimeSeriesFrames(plan.cached.frames, response.Frames, plan.from, plan.tailFrom)
+	if !isMerged {
+		backend.Logger.Debug(fmt.Sprintf("unable to merge cached frames of refId=%s, whole time range is fetched", evalQuery.RefId))
+		return ds.executeEvalQuery(pluginContext, ctx, evalQuery, sql, from, to)
+	}
+	client.settings.resultCache.set(plan.key, plan.from, plan.to, frames)
+	return backend.DataResponse{Frames: frames}
+}
+
+// executeEvalQuery executes sql of evalQuery for rounded time range, when splitInterval is set
+// long time range is split to parts which are executed in parallel under queryLimiter and joined in time order
+func (ds *ClickHouseDatasource) executeEvalQuery(pluginContext backend.PluginContext, ctx context.Context, evalQuery *EvalQuery, sql string, from, to time.Time) backend.DataResponse {
+	onErr := func(err error) backend.DataResponse {
+		backend.Logger.Error(fmt.Sprintf("Datasource executeEvalQuery error: %s", err))
+		return backend.DataResponse{Error: err}
+	}
+
+	parts, isSplit, err := splitTimeRange(evalQuery, from, to)
 	if err != nil {
 		return onErr(err)
 	}
+	if !isSplit {
+		return ds.executeQuery(pluginContext, ctx, &Query{From: from, To: to, RawQuery: sql, RuleUid: evalQuery.RuleUid})
+	}
+
+	partFrames := make([]data.Frames, len(parts))
+	wg, wgCtx := errgroup.WithContext(ctx)
+	for i, part := range parts {
+		// parts use buckets of whole time range, range is already rounded
+		partQuery := *evalQuery
+		partQuery.From = part.from
+		partQuery.To = part.to
+		partQuery.Round = ""
+		if partQuery.naturalTimeSeriesDuration == 0 {
+			partQuery.naturalTimeSeriesDuration = evalQuery.convertTimestamp(to) - evalQuery.convertTimestamp(from)
+		}
+		partSQL, err := partQuery.ApplyMacrosAndTimeRangeToQuery()
+		if err != nil {
+			return onErr(err)
+		}
+		wg.Go(func() error {
+			response := ds.executeQuery(pluginContext, wgCtx, &Query{From: part.from, To: part.to, RawQuery: partSQL, RuleUid: evalQuery.RuleUid})
+			partFrames[i] = response.Frames
+			return response.Error
+		})
+	}
+	if err := wg.Wait(); err != nil {
+		return onErr(err)
+	}
 
-	q := Query{
-		From:     evalQuery.From,
-		To:       evalQuery.To,
-		RawQuery: sql,
+	frames, isJoined := concatTimeSeriesFrames(parts, partFrames)
+	if !isJoined {
+		backend.Logger.Debug(fmt.Sprintf("unable to join frames of time range parts of refId=%s, whole time range is fetched", evalQuery.RefId))
+		return ds.executeQuery(pluginContext, ctx, &Query{From: from, To: to, RawQuery: sql, RuleUid: evalQuery.RuleUid})
 	}
-	return ds.executeQuery(pluginContext, ctx, &q)
+	return backend.DataResponse{Frames: frames}
 }
 
 func (ds *ClickHouseDatasource) QueryData(
 	ctx context.Context,
 	req *backend.QueryDataRequest) (*backend.QueryDataResponse, error) {
 
+	ruleUid := req.Headers["X-Rule-Uid"]
+	ctx, span := startSpan(ctx, "ClickHouseDatasource.QueryData", attribute.Int("queries", len(req.Queries)), attribute.String("ruleUid", ruleUid))
+	defer span.End()
+
 	onErr := func(err error) (*backend.QueryDataResponse, error) {
 		backend.Logger.Error(fmt.Sprintf("QueryData error: %v", err))
+		recordSpanError(span, err)
 		return nil, err
 	}
 	response := backend.NewQueryDataResponse()
 	wg, wgCtx := errgroup.WithContext(ctx)
-	ruleUid := req.Headers["X-Rule-Uid"]
-	for _, query := range req.Queries {
+	// each go-routine writes only own item, response map is filled after Wait
+	refIds := make([]string, len(req.Queries))
+	responses := make([]backend.DataResponse, len(req.Queries))
+	for i, query := range req.Queries {
 		var evalQ = EvalQuery{
 			RuleUid:       ruleUid,
 			From:          query.TimeRange.From,
@@ -104,8 +274,9 @@ func (ds *ClickHouseDatasource) QueryData(
 		}
 		evalJsonErr := json.Unmarshal(query.JSON, &evalQ)
 		if evalJsonErr == nil {
+			refIds[i] = evalQ.RefId
 			wg.Go(func() error {
-				response.Responses[evalQ.RefId] = ds.evalQuery(req.PluginContext, wgCtx, &evalQ)
+				responses[i] = ds.evalQuery(req.PluginContext, wgCtx, &evalQ)
 				return nil
 			})
 		}
@@ -119,8 +290,9 @@ func (ds *ClickHouseDatasource) QueryData(
 			if jsonErr != nil {
 				return onErr(fmt.Errorf("unable to parse json, to Query error: %v, to EvalQuery error: %v, source JSON: %s", jsonErr, evalJsonErr, query.JSON))
 			}
+			refIds[i] = q.RefId
 			wg.Go(func() error {
-				response.Responses[q.RefId] = ds.executeQuery(req.PluginContext, wgCtx, &q)
+				responses[i] = ds.executeQuery(req.PluginContext, wgCtx, &q)
 				return nil
 			})
 		}
@@ -128,6 +300,9 @@ func (ds *ClickHouseDatasource) QueryData(
 	if err := wg.Wait(); err != nil {
 		return onErr(fmt.Errorf("one of executeQuery go-routine return error: %v", err))
 	}
+	for i, refId := range refIds {
+		response.Responses[refId] = responses[i]
+	}
 
 	return response, nil
 }
@@ -148,13 +323,71 @@ func (ds *ClickHouseDatasource) CheckHealth(
 	if err != nil {
 		return onErr(err)
 	}
+	client.settings.InvalidateServerTimeZone()
 	_, err = client.Query(ctx, DefaultQuery)
 	if err != nil {
 		return onErr(err)
 	}
 
+	// hit rate of macros cache and queue length help to tune evalQueryCacheSize and maxConcurrentQueries
+	details, err := json.Marshal(map[string]interface{}{
+		"evalQueryCache": client.settings.evalQueryCache.stats(),
+		"queryLimiter":   client.settings.queryLimiter.stats(),
+		"queryFlights":   client.settings.queryFlights.stats(),
+		"resultCache":    client.settings.resultCache.stats(),
+		"replicas":       client.settings.replicas.stats(),
+		"queryCancels":   client.settings.queryCancels.stats(),
+		"queryProgress":  client.settings.queryProgress.stats(),
+	})
+	if err != nil {
+		return onErr(err)
+	}
 	return &backend.CheckHealthResult{
-		Status:  backend.HealthStatusOk,
-		Message: "OK",
+		Status:      backend.HealthStatusOk,
+		Message:     "OK",
+		JSONDetails: details,
 	}, nil
 }
+
+// CallResource serves databases, tables and columns from schemaCache of datasource to ad-hoc filters and query builder,
+// see schema.find for supported query params
+func (ds *ClickHouseDatasource) CallResource(ctx context.Context, req *backend.CallResourceRequest, sender backend.CallResourceResponseSender) error {
+	onErr := func(status int, err error) error {
+		backend.Logger.Error(fmt.Sprintf("CallResource error: %v", err))
+		body, _ := json.Marshal(map[string]string{"error": err.Error()})
+		return sender.Send(&backend.CallResourceResponse{
+			Status:  status,
+			Headers: map[string][]string{"Content-Type": {"application/json"}},
+			Body:    body,
+		})
+	}
+
+	if !slices.Contains(schemaResources, req.Path) {
+		return onErr(http.StatusNotFound, fmt.Errorf("unknown resource %s, allowed: %v", req.Path, schemaResources))
+	}
+	resourceUrl, err := url.Parse(req.URL)
+	if err != nil {
+		return onErr(http.StatusBadRequest, err)
+	}
+	client, err := ds.getClient(req.PluginContext)
+	if err != nil {
+		return onErr(http.StatusInternalServerError, err)
+	}
+	schema, err := client.settings.schemaCache.get(ctx)
+	if err != nil {
+		return onErr(http.StatusBadGateway, err)
+	}
+	response, err := schema.find(req.Path, resourceUrl.Query())
+	if err != nil {
+		return onErr(http.StatusBadRequest, err)
+	}
+	body, err := json.Marshal(response)
+	if err != nil {
+		return onErr(http.StatusInternalServerError, err)
+	}
+	return sender.Send(&backend.CallResourceResponse{
+		Status:  http.StatusOK,
+		Headers: map[string][]string{"Content-Type": {"application/json"}},
+		Body:    body,
+	})
+}
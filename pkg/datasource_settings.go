@@ -4,6 +4,12 @@ import (
 	"context"
 	"encoding/json"
 	"fmt"
+	"net/http"
+	"net/url"
+	"regexp"
+	"slices"
+	"strconv"
+	"time"
 
 	"github.com/grafana/grafana-plugin-sdk-go/backend"
 	"github.com/grafana/grafana-plugin-sdk-go/backend/instancemgmt"
@@ -21,9 +27,72 @@ type DatasourceSettings struct {
 	XHeaderUser                 string `json:"xHeaderUser,omitempty"`
 	UseCompression              bool   `json:"useCompression,omitempty"`
 	CompressionType             string `json:"compressionType,omitempty"`
+	// RequestCompressionThreshold POST queries longer than threshold in bytes are sent compressed with CompressionType, 0 disables
+	RequestCompressionThreshold int    `json:"requestCompressionThreshold,omitempty"`
 	TLSSkipVerify               bool   `json:"tlsSkipVerify"`
+	MaxIdleConns                int    `json:"maxIdleConns,omitempty"`
+	MaxIdleConnsPerHost         int    `json:"maxIdleConnsPerHost,omitempty"`
+	MaxConnsPerHost             int    `json:"maxConnsPerHost,omitempty"`
+	IdleConnTimeout             int    `json:"idleConnTimeout,omitempty"`
+	TimeZoneCacheTTL            int    `json:"timeZoneCacheTTL,omitempty"`
+	SchemaCacheTTL              int    `json:"schemaCacheTTL,omitempty"`
+	ResponseFormat              string `json:"responseFormat,omitempty"`
+	EvalQueryCacheSize          int    `json:"evalQueryCacheSize,omitempty"`
+	MaxConcurrentQueries        int    `json:"maxConcurrentQueries,omitempty"`
+	DeduplicateQueries          bool   `json:"deduplicateQueries,omitempty"`
+	ResultCacheSize             int    `json:"resultCacheSize,omitempty"`
+	ResultCacheUnsettledWindow  int    `json:"resultCacheUnsettledWindow,omitempty"`
+	// QuerySettings are ClickHouse settings sent as HTTP params with each query,
+	// PanelQuerySettings and AlertQuerySettings override them for dashboard panels and alert rules
+	QuerySettings      map[string]interface{} `json:"querySettings,omitempty"`
+	PanelQuerySettings map[string]interface{} `json:"panelQuerySettings,omitempty"`
+	AlertQuerySettings map[string]interface{} `json:"alertQuerySettings,omitempty"`
+	// Replicas are URLs of other ClickHouse replicas, queries are balanced between them and datasource URL
+	Replicas                   []string `json:"replicas,omitempty"`
+	ReplicaHealthCheckInterval int      `json:"replicaHealthCheckInterval,omitempty"`
+	// SendProgress enables X-ClickHouse-Progress headers, MaxRowsToRead stops queries which read more rows
+	SendProgress  bool `json:"sendProgress,omitempty"`
+	MaxRowsToRead int  `json:"maxRowsToRead,omitempty"`
+
+	httpClient     *http.Client
+	serverTimeZone *serverTimeZoneCache
+	evalQueryCache *evalQueryCache
+	queryLimiter   *queryLimiter
+	queryFlights   *queryFlightGroup
+	resultCache    *resultCache
+	queryCancels   queryCancelCounters
+	queryProgress  queryProgressCounters
+	panelParams    url.Values
+	alertParams    url.Values
+	internalParams url.Values
+	replicas       *replicaBalancer
+	metrics        *datasourceMetrics
+	schemaCache    *schemaCache
 }
 
+const DefaultMaxIdleConns = 100
+const DefaultMaxIdleConnsPerHost = 32
+const DefaultIdleConnTimeout = 90 * time.Second
+const DefaultTimeZoneCacheTTL = 5 * time.Minute
+const DefaultSchemaCacheTTL = 5 * time.Minute
+const DefaultEvalQueryCacheSize = 16 * 1024 * 1024
+
+// DefaultMaxConcurrentQueries the same as DefaultMaxIdleConnsPerHost, so running queries reuse keep-alive connections
+const DefaultMaxConcurrentQueries = DefaultMaxIdleConnsPerHost
+const DefaultResultCacheUnsettledWindow = time.Minute
+const DefaultReplicaHealthCheckInterval = 10 * time.Second
+
+const ResponseFormatJSON = "JSON"
+const ResponseFormatJSONCompact = "JSONCompact"
+const ResponseFormatRowBinary = "RowBinaryWithNamesAndTypes"
+
+var supportedResponseFormats = []string{"", ResponseFormatJSON, ResponseFormatJSONCompact, ResponseFormatRowBinary}
+
+var querySettingNameRE = regexp.MustCompile(`^[a-zA-Z_][a-zA-Z0-9_]*$`)
+
+// reservedQueryParams are HTTP params of ClickHouse interface which are not settings or set by plugin itself
+var reservedQueryParams = []string{"query", "query_id", "user", "password", "quota_key", "database", "default_format", "enable_http_compression", "session_id"}
+
 func NewDatasourceSettings(ctx context.Context, settings backend.DataSourceInstanceSettings) (instancemgmt.Instance, error) {
 	var dsSettings = DatasourceSettings{}
 
@@ -34,7 +103,139 @@ func NewDatasourceSettings(ctx context.Context, settings backend.DataSourceInsta
 
 	dsSettings.Instance = settings
 
+	if !slices.Contains(supportedResponseFormats, dsSettings.ResponseFormat) {
+		return nil, fmt.Errorf("unsupported responseFormat %s, allowed values: %v", dsSettings.ResponseFormat, supportedResponseFormats[1:])
+	}
+
+	// explicit querySettings override settings derived from datasource options,
+	// option settings are sent only with panel and alert queries, internal queries of plugin shall not be stopped by them
+	optionSettings := map[string]interface{}{}
+	if dsSettings.SendProgress {
+		optionSettings["send_progress_in_http_headers"] = true
+		optionSettings["http_headers_progress_interval_ms"] = float64(DefaultProgressHeadersInterval.Milliseconds())
+	}
+	if dsSettings.MaxRowsToRead > 0 {
+		optionSettings["max_rows_to_read"] = float64(dsSettings.MaxRowsToRead)
+		optionSettings["read_overflow_mode"] = "throw"
+	}
+	dsSettings.internalParams, err = newQuerySettingsParams(dsSettings.QuerySettings)
+	if err != nil {
+		return nil, fmt.Errorf("invalid querySettings: %w", err)
+	}
+	dsSettings.panelParams, err = newQuerySettingsParams(optionSettings, dsSettings.QuerySettings, dsSettings.PanelQuerySettings)
+	if err != nil {
+		return nil, fmt.Errorf("invalid panelQuerySettings: %w", err)
+	}
+	dsSettings.alertParams, err = newQuerySettingsParams(optionSettings, dsSettings.QuerySettings, dsSettings.AlertQuerySettings)
+	if err != nil {
+		return nil, fmt.Errorf("invalid alertQuerySettings: %w", err)
+	}
+
+	dsSettings.httpClient, err = newHTTPClient(&dsSettings)
+	if err != nil {
+		return nil, fmt.Errorf("unable to create http client for datasource %s. Error: %w", settings.Name, err)
+	}
+
+	timeZoneCacheTTL := DefaultTimeZoneCacheTTL
+	if dsSettings.TimeZoneCacheTTL > 0 {
+		timeZoneCacheTTL = time.Duration(dsSettings.TimeZoneCacheTTL) * time.Second
+	}
+	dsSettings.serverTimeZone = newServerTimeZoneCache(timeZoneCacheTTL)
+
+	schemaCacheTTL := DefaultSchemaCacheTTL
+	if dsSettings.SchemaCacheTTL > 0 {
+		schemaCacheTTL = time.Duration(dsSettings.SchemaCacheTTL) * time.Second
+	}
+	schemaClient := &ClickHouseClient{settings: &dsSettings}
+	dsSettings.schemaCache = newSchemaCache(schemaCacheTTL, schemaClient.FetchSchema)
+
+	// negative size disables cache of queries with applied macros
+	if dsSettings.EvalQueryCacheSize == 0 {
+		dsSettings.evalQueryCache = newEvalQueryCache(DefaultEvalQueryCacheSize)
+	} else if dsSettings.EvalQueryCacheSize > 0 {
+		dsSettings.evalQueryCache = newEvalQueryCache(dsSettings.EvalQueryCacheSize * 1024 * 1024)
+	}
+
+	// negative value means unlimited in-flight queries
+	if dsSettings.MaxConcurrentQueries == 0 {
+		dsSettings.queryLimiter = newQueryLimiter(DefaultMaxConcurrentQueries)
+	} else if dsSettings.MaxConcurrentQueries > 0 {
+		dsSettings.queryLimiter = newQueryLimiter(dsSettings.MaxConcurrentQueries)
+	}
+
+	// instance is created per datasource and recreated after settings change,
+	// so the same SQL means the same ClickHouse credentials and the same result
+	if dsSettings.DeduplicateQueries {
+		dsSettings.queryFlights = newQueryFlightGroup()
+	}
+
+	if dsSettings.ResultCacheSize > 0 {
+		unsettledWindow := DefaultResultCacheUnsettledWindow
+		if dsSettings.ResultCacheUnsettledWindow > 0 {
+			unsettledWindow = time.Duration(dsSettings.ResultCacheUnsettledWindow) * time.Second
+		}
+		dsSettings.resultCache = newResultCache(dsSettings.ResultCacheSize*1024*1024, unsettledWindow)
+	}
+
+	if len(dsSettings.Replicas) > 0 {
+		replicaUrls := []string{settings.URL}
+		for _, replicaUrl := range dsSettings.Replicas {
+			if _, err := url.Parse(replicaUrl); err != nil || replicaUrl == "" {
+				return nil, fmt.Errorf("invalid replica url %q: %v", replicaUrl, err)
+			}
+			if !slices.Contains(replicaUrls, replicaUrl) {
+				replicaUrls = append(replicaUrls, replicaUrl)
+			}
+		}
+		healthCheckInterval := DefaultReplicaHealthCheckInterval
+		if dsSettings.ReplicaHealthCheckInterval > 0 {
+			healthCheckInterval = time.Duration(dsSettings.ReplicaHealthCheckInterval) * time.Second
+		}
+		client := &ClickHouseClient{settings: &dsSettings}
+		dsSettings.replicas = newReplicaBalancer(replicaUrls, healthCheckInterval, func(ctx context.Context, replicaUrl string) error {
+			return client.sendQuery(ctx, replicaUrl, DefaultQuery)
+		})
+		go dsSettings.replicas.run()
+	}
+
+	dsSettings.metrics = newDatasourceMetrics(settings.UID)
+	datasourceStats.register(&dsSettings)
+
 	return &dsSettings, nil
 }
 
-func (s *DatasourceSettings) Dispose() {}
+// newQuerySettingsParams merges ClickHouse settings to HTTP params, settings of the last map win
+func newQuerySettingsParams(settingsMaps ...map[string]interface{}) (url.Values, error) {
+	params := url.Values{}
+	for _, querySettings := range settingsMaps {
+		for name, value := range querySettings {
+			if !querySettingNameRE.MatchString(name) || slices.Contains(reservedQueryParams, name) {
+				return nil, fmt.Errorf("%s can't be used as ClickHouse setting", name)
+			}
+			switch v := value.(type) {
+			case string:
+				params.Set(name, v)
+			case bool:
+				params.Set(name, map[bool]string{true: "1", false: "0"}[v])
+			case float64:
+				params.Set(name, strconv.FormatFloat(v, 'f', -1, 64))
+			default:
+				return nil, fmt.Errorf("unsupported value %v of setting %s", value, name)
+			}
+		}
+	}
+	return params, nil
+}
+
+// InvalidateServerTimeZone forces next FetchTimeZone call to ask ClickHouse server again
+func (s *DatasourceSettings) InvalidateServerTimeZone() {
+	s.serverTimeZone.invalidate()
+}
+
+func (s *DatasourceSettings) Dispose() {
+	datasourceStats.unregister(s)
+	s.replicas.stop()
+	if s.httpClient != nil {
+		s.httpClient.CloseIdleConnections()
+	}
+}
@@ -0,0 +1,76 @@
+package main
+
+import (
+	"compress/flate"
+	"compress/gzip"
+	"fmt"
+	"io"
+	"sync"
+
+	"github.com/andybalholm/brotli"
+	"github.com/klauspost/compress/zstd"
+)
+
+// decompressor pools keep readers with their window buffers between responses,
+// readers are reset to new response body instead of allocating them for each query
+var (
+	gzipReaders   sync.Pool
+	flateReaders  sync.Pool
+	brotliReaders sync.Pool
+	// zstd decoders are synchronous, so pooled decoders don't keep go-routines and can be collected by GC without Close
+	zstdDecoders sync.Pool
+)
+
+// getDecompressor returns reader which decompresses body according Content-Encoding,
+// put returns reader to pool and shall be called after body is read
+func getDecompressor(contentEncoding string, body io.Reader) (reader io.Reader, put func(), err error) {
+	switch contentEncoding {
+	case "gzip":
+		gzipReader, isPooled := gzipReaders.Get().(*gzip.Reader)
+		if isPooled {
+			err = gzipReader.Reset(body)
+		} else {
+			gzipReader, err = gzip.NewReader(body)
+		}
+		if err != nil {
+			return nil, nil, fmt.Errorf("error creating GZIP reader: %v", err)
+		}
+		return gzipReader, func() { gzipReaders.Put(gzipReader) }, nil
+	case "deflate":
+		flateReader, isPooled := flateReaders.Get().(io.ReadCloser)
+		if isPooled {
+			_ = flateReader.(flate.Resetter).Reset(body, nil)
+		} else {
+			flateReader = flate.NewReader(body)
+		}
+		return flateReader, func() { flateReaders.Put(flateReader) }, nil
+	case "br":
+		brotliReader, isPooled := brotliReaders.Get().(*brotli.Reader)
+		if isPooled {
+			err = brotliReader.Reset(body)
+		} else {
+			brotliReader = brotli.NewReader(body)
+		}
+		if err != nil {
+			return nil, nil, fmt.Errorf("error creating Brotli reader: %v", err)
+		}
+		return brotliReader, func() { brotliReaders.Put(brotliReader) }, nil
+	case "zstd":
+		decoder, isPooled := zstdDecoders.Get().(*zstd.Decoder)
+		if isPooled {
+			err = decoder.Reset(body)
+		} else {
+			decoder, err = zstd.NewReader(body, zstd.WithDecoderConcurrency(1))
+		}
+		if err != nil {
+			return nil, nil, fmt.Errorf("error creating ZSTD reader: %v", err)
+		}
+		return decoder, func() {
+			// release reference to body, Reset(nil) keeps buffers
+			_ = decoder.Reset(nil)
+			zstdDecoders.Put(decoder)
+		}, nil
+	default:
+		return body, func() {}, nil
+	}
+}
@@ -0,0 +1,131 @@
+package main
+
+import (
+	"bytes"
+	"compress/flate"
+	"compress/gzip"
+	"fmt"
+	"io"
+	"strings"
+	"testing"
+
+	"github.com/andybalholm/brotli"
+	"github.com/klauspost/compress/zstd"
+	"github.com/stretchr/testify/require"
+)
+
+var compressionTypes = []string{"gzip", "deflate", "br", "zstd"}
+
+func compressTestBody(t testing.TB, contentEncoding string, body []byte) []byte {
+	var compressed bytes.Buffer
+	var writer io.WriteCloser
+	var err error
+	switch contentEncoding {
+	case "gzip":
+		writer = gzip.NewWriter(&compressed)
+	case "deflate":
+		writer, err = flate.NewWriter(&compressed, flate.DefaultCompression)
+	case "br":
+		writer = brotli.NewWriter(&compressed)
+	case "zstd":
+		writer, err = zstd.NewWriter(&compressed)
+	}
+	require.NoError(t, err)
+	_, err = writer.Write(body)
+	require.NoError(t, err)
+	require.NoError(t, writer.Close())
+	return compressed.Bytes()
+}
+
+func testJSONBody(rows int) []byte {
+	body := strings.Builder{}
+	body.WriteString(`{"meta":[{"name":"t","type":"UInt64"},{"name":"host","type":"String"},{"name":"value","type":"Float64"}],"data":[`)
+	for i := 0; i < rows; i++ {
+		if i > 0 {
+			body.WriteByte(',')
+		}
+		body.WriteString(fmt.Sprintf(`{"t":"%d","host":"host-%d","value":%d.5}`, 1700000000000+i*1000, i%10, i))
+	}
+	body.WriteString(fmt.Sprintf(`],"rows":%d}`, rows))
+	return []byte(body.String())
+}
+
+func TestPooledDecompressors(t *testing.T) {
+	r := require.New(t)
+	for _, contentEncoding := range compressionTypes {
+		// next iterations reuse reader returned to pool
+		for i := 0; i < 3; i++ {
+			body := testJSONBody(10 + i)
+			reader, put, err := getDecompressor(contentEncoding, bytes.NewReader(compressTestBody(t, contentEncoding, body)))
+			r.NoError(err)
+			decompressed, err := io.ReadAll(reader)
+			r.NoError(err, contentEncoding)
+			r.Equal(string(body), string(decompressed), contentEncoding)
+			put()
+		}
+	}
+
+	reader, put, err := getDecompressor("", strings.NewReader("plain"))
+	r.NoError(err)
+	plain, _ := io.ReadAll(reader)
+	r.Equal("plain", string(plain))
+	put()
+
+	_, _, err = getDecompressor("gzip", strings.NewReader("not gzip"))
+	r.ErrorContains(err, "error creating GZIP reader")
+}
+
+// BenchmarkDecompressors compares pooled readers with readers created for each response
+func BenchmarkDecompressors(b *testing.B) {
+	body := testJSONBody(10000)
+	for _, contentEncoding := range compressionTypes {
+		compressed := compressTestBody(b, contentEncoding, body)
+		b.Run(contentEncoding+"/pooled", func(b *testing.B) {
+			b.ReportAllocs()
+			b.SetBytes(int64(len(body)))
+			for i := 0; i < b.N; i++ {
+				reader, put, err := getDecompressor(contentEncoding, bytes.NewReader(compressed))
+				if err != nil {
+					b.Fatal(err)
+				}
+				if _, err := io.Copy(io.Discard, reader); err != nil {
+					b.Fatal(err)
+				}
+				put()
+			}
+		})
+		b.Run(contentEncoding+"/new", func(b *testing.B) {
+			b.ReportAllocs()
+			b.SetBytes(int64(len(body)))
+			for i := 0; i < b.N; i++ {
+				var reader io.Reader
+				var err error
+				switch contentEncoding {
+				case "gzip":
+					reader, err = gzip.NewReader(bytes.NewReader(compressed))
+				case "deflate":
+					reader = flate.NewReader(bytes.NewReader(compressed))
+				case "br":
+					reader = brotli.NewReader(bytes.NewReader(compressed))
+				case "zstd":
+					var decoder *zstd.Decoder
+					decoder, err = zstd.NewReader(bytes.NewReader(compressed))
+					if err != nil {
+						b.Fatal(err)
+					}
+					// decoder goroutines are stopped after each response
+					reader = decoder.IOReadCloser()
+				}
+				if err != nil {
+					b.Fatal(err)
+				}
+				if _, err := io.Copy(io.Discard, reader); err != nil {
+					b.Fatal(err)
+				}
+				if closer, isCloser := reader.(io.Closer); isCloser {
+					_ = closer.Close()
+				}
+			}
+		})
+	}
+}
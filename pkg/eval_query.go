@@ -49,9 +49,16 @@ type EvalQuery struct {
 	IntervalMs     int
 	Database       string `json:"database"`
 	Table          string `json:"table"`
+	SplitInterval  string `json:"splitInterval"`
 	MaxDataPoints  int64
 	From           time.Time
 	To             time.Time
+
+	cache *evalQueryCache
+	// template is query with applied macros functions before time range substitution, filled by replace
+	template string
+	// naturalTimeSeriesDuration overrides to - from used by $naturalTimeSeries, so tail queries keep buckets of the whole range
+	naturalTimeSeriesDuration int64
 }
 
 func (q *EvalQuery) ApplyMacrosAndTimeRangeToQuery() (string, error) {
@@ -105,33 +112,11 @@ func (q *EvalQuery) replace(query string) (string, error) {
 			return "", err
 		}
 	}
-	scanner := newScanner(query)
-	ast, err := scanner.toAST()
-	if err != nil {
-		return "", fmt.Errorf("parse AST error: %v ", err)
-	}
-	topQueryAST := ast
-
-	query, err = q.applyMacros(query, topQueryAST)
-	if err != nil {
-		return "", fmt.Errorf("applyMacros error: %v", err)
-	}
-
-	if q.SkipComments {
-		query, err = scanner.RemoveComments(query)
-		if err != nil {
-			return "", err
-		}
-	}
-
-	if q.AddMetadata {
-		query = scanner.AddMetadata(query, q)
-	}
-
-	query, err = q.unescape(query)
+	query, err = q.macrosTemplate(query)
 	if err != nil {
 		return "", err
 	}
+	q.template = query
 
 	timeFilter := q.getDateTimeFilter(q.DateTimeType)
 	timeFilterMs := q.getDateTimeFilterMs(q.DateTimeType)
@@ -145,19 +130,20 @@ func (q *EvalQuery) replace(query string) (string, error) {
 		table = q.escapeTableIdentifier(q.Database) + "." + table
 	}
 
-	myRound, err := q.convertInterval(q.Round, q.IntervalFactor, false)
+	myRound, err := q.roundSeconds()
 	if err != nil {
 		return "", err
 	}
-	if q.Round == "$step" {
-		myRound = q.IntervalSec
-	}
 	from := q.convertTimestamp(q.round(q.From, myRound))
 	to := q.convertTimestamp(q.round(q.To, myRound))
+	naturalFrom := from
+	if q.naturalTimeSeriesDuration > 0 {
+		naturalFrom = to - q.naturalTimeSeriesDuration
+	}
 
 	query = timeSeriesMacroRegexp.ReplaceAllString(query, strings.Replace(q.getTimeSeries(q.DateTimeType), "$", "$$", -1))
 	query = timeSeriesMsMacroRegexp.ReplaceAllString(query, strings.Replace(q.getTimeSeriesMs(q.DateTimeType), "$", "$$", -1))
-	query = naturalTimeSeriesMacroRegexp.ReplaceAllString(query, strings.Replace(q.getNaturalTimeSeries(q.DateTimeType, from, to), "$", "$$", -1))
+	query = naturalTimeSeriesMacroRegexp.ReplaceAllString(query, strings.Replace(q.getNaturalTimeSeries(q.DateTimeType, naturalFrom, to), "$", "$$", -1))
 	query = timeFilterMacroRegexp.ReplaceAllString(query, strings.Replace(timeFilter, "$", "$$", -1))
 	query = timeFilterMsMacroRegexp.ReplaceAllString(query, strings.Replace(timeFilterMs, "$", "$$", -1))
 	query = tableMacroRegexp.ReplaceAllString(query, table)
@@ -175,6 +161,68 @@ func (q *EvalQuery) replace(query string) (string, error) {
 	return query, nil
 }
 
+// roundSeconds returns Round setting in seconds, $step means current interval
+func (q *EvalQuery) roundSeconds() (int, error) {
+	if q.Round == "$step" {
+		return q.IntervalSec, nil
+	}
+	return q.convertInterval(q.Round, q.IntervalFactor, false)
+}
+
+// roundedTimeRange returns From and To rounded the same way as $from and $to, replace shall be called before
+func (q *EvalQuery) roundedTimeRange() (time.Time, time.Time, error) {
+	myRound, err := q.roundSeconds()
+	if err != nil {
+		return time.Time{}, time.Time{}, err
+	}
+	return q.round(q.From, myRound), q.round(q.To, myRound), nil
+}
+
+// macrosTemplate returns query with applied macros functions, comments and metadata,
+// result doesn't depend on time range, so it is cached and only time range macros are replaced on each call
+func (q *EvalQuery) macrosTemplate(query string) (string, error) {
+	var key string
+	if q.cache != nil {
+		key = evalQueryCacheKey(query, q)
+		if template, isCached := q.cache.get(key); isCached {
+			return template, nil
+		}
+	}
+
+	scanner := newScanner(query)
+	ast, err := scanner.toAST()
+	if err != nil {
+		return "", fmt.Errorf("parse AST error: %v ", err)
+	}
+	topQueryAST := ast
+
+	query, err = q.applyMacros(query, topQueryAST)
+	if err != nil {
+		return "", fmt.Errorf("applyMacros error: %v", err)
+	}
+
+	if q.SkipComments {
+		query, err = scanner.RemoveComments(query)
+		if err != nil {
+			return "", err
+		}
+	}
+
+	if q.AddMetadata {
+		query = scanner.AddMetadata(query, q)
+	}
+
+	query, err = q.unescape(query)
+	if err != nil {
+		return "", err
+	}
+
+	if q.cache != nil {
+		q.cache.set(key, query)
+	}
+	return query, nil
+}
+
 func (q *EvalQuery) escapeIdentifier(identifier string) string {
 	if regexp.MustCompile(`^[a-zA-Z][0-9a-zA-Z_]+$`).MatchString(identifier) || regexp.MustCompile(`\(.*\)`).MatchString(identifier) || regexp.MustCompile(`[/*+\-]`).MatchString(identifier) {
 		return identifier
@@ -998,6 +1046,43 @@ func (q *EvalQuery) getTimeSeriesMs(dateTimeType string) string {
 	return "(intDiv($dateTimeCol, $__interval_ms) * $__interval_ms)"
 }
 
+// timeSeriesStepMs returns bucket size of $timeSeries, $timeSeriesMs or $naturalTimeSeries used in template,
+// false when template has no buckets, mixes different macros or buckets depend on calendar and time zone
+func (q *EvalQuery) timeSeriesStepMs(template string, from, to int64) (int64, bool) {
+	var steps []int64
+	if timeSeriesMacroRegexp.MatchString(template) {
+		steps = append(steps, int64(q.IntervalSec)*1000)
+	}
+	if timeSeriesMsMacroRegexp.MatchString(template) {
+		steps = append(steps, int64(q.IntervalMs))
+	}
+	if naturalTimeSeriesMacroRegexp.MatchString(template) {
+		if q.naturalTimeSeriesDuration > 0 {
+			from = to - q.naturalTimeSeriesDuration
+		}
+		if q.DateTimeType != "DATETIME" && q.DateTimeType != "DATETIME64" {
+			steps = append(steps, int64(q.IntervalSec)*1000)
+		} else {
+			switch q.getNaturalTimeSeries(q.DateTimeType, from, to) {
+			case "toUInt32($dateTimeCol) * 1000":
+				steps = append(steps, 1000)
+			case "toUInt32(toStartOfMinute($dateTimeCol)) * 1000":
+				steps = append(steps, 60*1000)
+			case "toUInt32(toStartOfFiveMinute($dateTimeCol)) * 1000":
+				steps = append(steps, 5*60*1000)
+			case "toUInt32(toStartOfFifteenMinutes($dateTimeCol)) * 1000":
+				steps = append(steps, 15*60*1000)
+			default:
+				return 0, false
+			}
+		}
+	}
+	if len(steps) != 1 || steps[0] <= 0 {
+		return 0, false
+	}
+	return steps[0], true
+}
+
 func (q *EvalQuery) getDateFilter() string {
 	return "$dateCol >= toDate($from) AND $dateCol <= toDate($to)"
 }
@@ -1140,7 +1225,6 @@ type EvalQueryScanner struct {
 	RootToken    string
 	Token        string
 	SkipSpace    bool
-	re           *regexp2.Regexp
 	expectedNext bool
 	_sOriginal   string
 	_s           string
@@ -1163,12 +1247,13 @@ func (s *EvalQueryScanner) Next() (bool, error) {
 			if len(s._s) == 0 {
 				return false, nil
 			}
-			r, err := s.re.FindStringMatch(s._s)
-			if err != nil || r == nil {
+			if n := scanToken(s._s); n > 0 {
+				s.Token = s._s[:n]
+			} else if token, isFound := scanTokenAtLineStart(s._s); isFound {
+				s.Token = token
+			} else {
 				return false, fmt.Errorf("cannot find next token in [%v]", s._s)
 			}
-
-			s.Token = r.String()
 			s._s = s._s[len(s.Token):]
 
 			return true, nil
@@ -1249,7 +1334,6 @@ func (s *EvalQueryScanner) toAST() (*EvalAST, error) {
 	s.SetRoot("root")
 	s.expectedNext = false
 	s.SkipSpace = true
-	s.re = tokenReComplied
 	subQuery := ""
 	argument := ""
 
@@ -1708,13 +1792,6 @@ var skipSpaceOnlyRe = regexp.MustCompile("^(?:" + skipSpaceRe + ")$")
 
 /* var binaryOnlyRe = regexp.MustCompile("^(?:" + binaryOpRe + ")$") */
 
-var tokenRe = strings.Join([]string{
-	statementRe, macroFuncRe, joinsRe, inRe, wsRe, commentRe, idRe, stringRe, powerIntRe, floatRe, intRe,
-	binaryOpRe, closureRe, specCharsRe, macroRe,
-}, "|")
-
-var tokenReComplied = regexp2.MustCompile("^(?:"+tokenRe+")", regexp2.IgnoreCase+regexp2.Multiline)
-
 func isSkipSpace(token string) bool {
 	return skipSpaceOnlyRe.MatchString(token)
 }
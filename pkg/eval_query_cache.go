@@ -0,0 +1,131 @@
+package main
+
+import (
+	"container/list"
+	"strconv"
+	"strings"
+	"sync"
+	"sync/atomic"
+)
+
+// evalQueryCacheEntryOverhead approximate memory used by list element, map bucket and string headers of one entry
+const evalQueryCacheEntryOverhead = 128
+
+// evalQueryCache is LRU cache of query templates with applied macros functions, comments and metadata,
+// time range macros like $timeFilter and $from are still not replaced in template,
+// so dashboard refresh and alert evaluation of the same SQL only substitute timestamps, size is limited by bytes
+type evalQueryCache struct {
+	mu       sync.Mutex
+	maxBytes int
+	bytes    int
+	lru      *list.List
+	items    map[string]*list.Element
+
+	hits      atomic.Uint64
+	misses    atomic.Uint64
+	evictions atomic.Uint64
+}
+
+type evalQueryCacheEntry struct {
+	key      string
+	template string
+}
+
+type evalQueryCacheStats struct {
+	Hits      uint64 `json:"hits"`
+	Misses    uint64 `json:"misses"`
+	Evictions uint64 `json:"evictions"`
+	Entries   int    `json:"entries"`
+	Bytes     int    `json:"bytes"`
+}
+
+func newEvalQueryCache(maxBytes int) *evalQueryCache {
+	return &evalQueryCache{
+		maxBytes: maxBytes,
+		lru:      list.New(),
+		items:    map[string]*list.Element{},
+	}
+}
+
+func (e *evalQueryCacheEntry) size() int {
+	return len(e.key) + len(e.template) + evalQueryCacheEntryOverhead
+}
+
+// evalQueryCacheKey contains query text and all settings which change macros template
+func evalQueryCacheKey(query string, q *EvalQuery) string {
+	key := strings.Builder{}
+	key.Grow(len(query) + len(q.RuleUid) + len(q.RefId) + 8)
+	key.WriteString(strconv.FormatBool(q.SkipComments))
+	key.WriteByte(0)
+	key.WriteString(strconv.FormatBool(q.AddMetadata))
+	key.WriteByte(0)
+	if q.AddMetadata {
+		key.WriteString(q.RuleUid)
+		key.WriteByte(0)
+		key.WriteString(q.RefId)
+		key.WriteByte(0)
+	}
+	key.WriteString(query)
+	return key.String()
+}
+
+func (c *evalQueryCache) get(key string) (string, bool) {
+	if c == nil {
+		return "", false
+	}
+	c.mu.Lock()
+	element, exists := c.items[key]
+	if exists {
+		c.lru.MoveToFront(element)
+	}
+	c.mu.Unlock()
+	if !exists {
+		c.misses.Add(1)
+		return "", false
+	}
+	c.hits.Add(1)
+	return element.Value.(*evalQueryCacheEntry).template, true
+}
+
+func (c *evalQueryCache) set(key string, template string) {
+	if c == nil {
+		return
+	}
+	entry := &evalQueryCacheEntry{key: key, template: template}
+	if entry.size() > c.maxBytes {
+		return
+	}
+	c.mu.Lock()
+	defer c.mu.Unlock()
+	if element, exists := c.items[key]; exists {
+		c.bytes -= element.Value.(*evalQueryCacheEntry).size()
+		element.Value = entry
+		c.bytes += entry.size()
+		c.lru.MoveToFront(element)
+	} else {
+		c.items[key] = c.lru.PushFront(entry)
+		c.bytes += entry.size()
+	}
+	for c.bytes > c.maxBytes {
+		oldest := c.lru.Back()
+		oldestEntry := c.lru.Remove(oldest).(*evalQueryCacheEntry)
+		delete(c.items, oldestEntry.key)
+		c.bytes -= oldestEntry.size()
+		c.evictions.Add(1)
+	}
+}
+
+func (c *evalQueryCache) stats() evalQueryCacheStats {
+	if c == nil {
+		return evalQueryCacheStats{}
+	}
+	c.mu.Lock()
+	defer c.mu.Unlock()
+	return evalQueryCacheStats{
+		Hits:      c.hits.Load(),
+		Misses:    c.misses.Load(),
+		Evictions: c.evictions.Load(),
+		Entries:   c.lru.Len(),
+		Bytes:     c.bytes,
+	}
+}
@@ -0,0 +1,109 @@
+package main
+
+import (
+	"strings"
+	"testing"
+	"time"
+
+	"github.com/stretchr/testify/require"
+)
+
+func TestEvalQueryCacheEvictsLeastRecentlyUsed(t *testing.T) {
+	r := require.New(t)
+	entrySize := (&evalQueryCacheEntry{key: "a", template: "SELECT 1"}).size()
+	cache := newEvalQueryCache(entrySize * 2)
+
+	cache.set("a", "SELECT 1")
+	cache.set("b", "SELECT 2")
+	_, isCached := cache.get("a")
+	r.True(isCached)
+	cache.set("c", "SELECT 3")
+
+	_, isCached = cache.get("b")
+	r.False(isCached, "least recently used entry should be evicted")
+	template, isCached := cache.get("a")
+	r.True(isCached)
+	r.Equal("SELECT 1", template)
+	template, isCached = cache.get("c")
+	r.True(isCached)
+	r.Equal("SELECT 3", template)
+
+	cache.set("big", strings.Repeat("x", entrySize*2))
+	_, isCached = cache.get("big")
+	r.False(isCached, "entry bigger than cache size should not be cached")
+
+	r.Equal(evalQueryCacheStats{Hits: 3, Misses: 2, Evictions: 1, Entries: 2, Bytes: entrySize * 2}, cache.stats())
+}
+
+func TestEvalQueryCacheNil(t *testing.T) {
+	var cache *evalQueryCache
+	cache.set("a", "SELECT 1")
+	_, isCached := cache.get("a")
+	require.False(t, isCached)
+	require.Equal(t, evalQueryCacheStats{}, cache.stats())
+}
+
+func TestEvalQueryCacheOnlyTimeRangeReplaced(t *testing.T) {
+	r := require.New(t)
+	const query = "/* dashboard */ $rate(countIf(Type = 200) AS good, countIf(Type != 200) AS bad) FROM $table WHERE $timeFilter -- comment"
+	cache := newEvalQueryCache(DefaultEvalQueryCacheSize)
+	from := time.Date(2018, 12, 24, 1, 2, 3, 0, time.UTC)
+	newQuery := func(from time.Time) EvalQuery {
+		return EvalQuery{
+			RefId:        "A",
+			Query:        query,
+			Database:     "default",
+			Table:        "requests",
+			DateCol:      "EventDate",
+			DateTimeCol:  "EventTime",
+			SkipComments: true,
+			Interval:     "1m",
+			From:         from,
+			To:           from.Add(time.Hour),
+		}
+	}
+
+	for i := 0; i < 3; i++ {
+		uncached := newQuery(from.Add(time.Duration(i) * time.Minute))
+		expected, err := uncached.ApplyMacrosAndTimeRangeToQuery()
+		r.NoError(err)
+
+		cached := newQuery(from.Add(time.Duration(i) * time.Minute))
+		cached.cache = cache
+		actual, err := cached.ApplyMacrosAndTimeRangeToQuery()
+		r.NoError(err)
+		r.Equal(expected, actual)
+		r.NotContains(actual, "comment")
+	}
+	r.Equal(uint64(2), cache.stats().Hits)
+	r.Equal(uint64(1), cache.stats().Misses)
+
+	withMetadata := newQuery(from)
+	withMetadata.AddMetadata = true
+	withMetadata.cache = cache
+	_, err := withMetadata.ApplyMacrosAndTimeRangeToQuery()
+	r.NoError(err)
+	r.Equal(uint64(2), cache.stats().Misses, "metadata should change cache key")
+}
+
+func BenchmarkApplyMacrosAndTimeRangeToQuery(b *testing.B) {
+	queries := dashboardQueries()
+	cache := newEvalQueryCache(DefaultEvalQueryCacheSize)
+	from := time.Date(2018, 12, 24, 1, 2, 3, 0, time.UTC)
+	for _, benchmark := range []struct {
+		name  string
+		cache *evalQueryCache
+	}{{"WithoutCache", nil}, {"WithCache", cache}} {
+		b.Run(benchmark.name, func(b *testing.B) {
+			b.ReportAllocs()
+			for i := 0; i < b.N; i++ {
+				for _, query := range queries {
+					q := EvalQuery{Query: query, Table: "requests", DateTimeCol: "EventTime", Interval: "1m", From: from, To: from.Add(time.Hour), cache: benchmark.cache}
+					if _, err := q.ApplyMacrosAndTimeRangeToQuery(); err != nil {
+						b.Fatal(err)
+					}
+				}
+			}
+		})
+	}
+}
@@ -0,0 +1,379 @@
+package main
+
+import (
+	"strings"
+	"unicode"
+	"unicode/utf8"
+)
+
+// lexer alternatives are taken from the same regular expressions used by is* token checks, first matched alternative wins,
+// alternatives order: statementRe, macroFuncRe, joinsRe, inRe, wsRe, commentRe, idRe, stringRe, powerIntRe, floatRe, intRe,
+// binaryOpRe, closureRe, specCharsRe, macroRe
+var statementTokens = splitTokenAlternatives(statementRe, "\\b(", ")\\b", " ")
+var macroFuncTokens = splitTokenAlternatives(macroFuncRe, "(", ")", "")
+var joinTokens = splitTokenAlternatives(joinsRe, "\\b(", ")\\b", "\\s+")
+var inTokens = splitTokenAlternatives(inRe[:strings.Index(inRe, ")\\b")+3], "\\b(", ")\\b", " ")
+
+// splitTokenAlternatives returns words of each alternative in `prefix(alt1|alt2)suffix` regular expression
+func splitTokenAlternatives(re, prefix, suffix, separator string) [][]string {
+	alternatives := strings.Split(strings.TrimSuffix(strings.TrimPrefix(re, prefix), suffix), "|")
+	tokens := make([][]string, len(alternatives))
+	for i, alternative := range alternatives {
+		alternative = strings.ToLower(strings.ReplaceAll(alternative, "\\$", "$"))
+		if separator == "" {
+			tokens[i] = []string{alternative}
+		} else {
+			tokens[i] = strings.Split(alternative, separator)
+		}
+	}
+	return tokens
+}
+
+// scanToken returns length in bytes of the token at the start of query or -1,
+// it returns the same token as case-insensitive regexp2 match of all alternatives without backtracking over the rest of query
+func scanToken(query string) int {
+	if len(query) == 0 {
+		return -1
+	}
+	if n := scanWords(query, statementTokens, false, true); n > 0 {
+		return n
+	}
+	if query[0] == '$' {
+		if n := scanWords(query, macroFuncTokens, false, false); n > 0 {
+			return n
+		}
+	}
+	if n := scanWords(query, joinTokens, true, true); n > 0 {
+		return n
+	}
+	if n := scanIn(query); n > 0 {
+		return n
+	}
+	if n := scanWS(query); n > 0 {
+		return n
+	}
+	if n := scanComment(query); n > 0 {
+		return n
+	}
+	if n := scanID(query); n > 0 {
+		return n
+	}
+	if n := scanString(query); n > 0 {
+		return n
+	}
+	if n := scanNumber(query); n > 0 {
+		return n
+	}
+	if n := scanOperator(query); n > 0 {
+		return n
+	}
+	return scanMacro(query)
+}
+
+// scanTokenAtLineStart emulates `^` in multiline mode of previous regexp based scanner,
+// when nothing matches at the start of query the first token matched at the start of any next line is returned
+func scanTokenAtLineStart(query string) (string, bool) {
+	for i := strings.IndexByte(query, '\n'); i >= 0 && i+1 < len(query); {
+		if n := scanToken(query[i+1:]); n > 0 {
+			return query[i+1 : i+1+n], true
+		}
+		next := strings.IndexByte(query[i+1:], '\n')
+		if next < 0 {
+			break
+		}
+		i += next + 1
+	}
+	return "", false
+}
+
+// foldRuneAt returns lower case rune and its size, the same way as regexp2.IgnoreCase compares runes
+func foldRuneAt(query string, i int) (rune, int) {
+	c := query[i]
+	if c < utf8.RuneSelf {
+		if 'A' <= c && c <= 'Z' {
+			c += 'a' - 'A'
+		}
+		return rune(c), 1
+	}
+	r, size := utf8.DecodeRuneInString(query[i:])
+	return unicode.ToLower(r), size
+}
+
+// matchWord returns position after case-insensitive word at position i or -1
+func matchWord(query string, i int, word string) int {
+	for j := 0; j < len(word); j++ {
+		if i >= len(query) {
+			return -1
+		}
+		r, size := foldRuneAt(query, i)
+		if r != rune(word[j]) {
+			return -1
+		}
+		i += size
+	}
+	return i
+}
+
+// isWordChar is `\w` of regexp2 used by `\b`
+func isWordChar(r rune) bool {
+	if r < utf8.RuneSelf {
+		return r == '_' || ('a' <= r && r <= 'z') || ('A' <= r && r <= 'Z') || ('0' <= r && r <= '9')
+	}
+	return unicode.In(r, unicode.L, unicode.Mn, unicode.Nd, unicode.Pc) || r == '\u200D' || r == '\u200C'
+}
+
+// isBoundary checks `\b` after word char at position i
+func isBoundary(query string, i int) bool {
+	if i >= len(query) {
+		return true
+	}
+	r, _ := utf8.DecodeRuneInString(query[i:])
+	return !isWordChar(r)
+}
+
+// isSpace is `\s` of regexp2
+func isSpace(r rune) bool {
+	return unicode.IsSpace(r)
+}
+
+func spacesLen(query string, i int) int {
+	start := i
+	for i < len(query) {
+		r, size := utf8.DecodeRuneInString(query[i:])
+		if !isSpace(r) {
+			break
+		}
+		i += size
+	}
+	return i - start
+}
+
+// digitsLen returns length of `\d*` at position i, regexp2 digits are unicode decimal digits
+func digitsLen(query string, i int) int {
+	start := i
+	for i < len(query) {
+		c := query[i]
+		if '0' <= c && c <= '9' {
+			i++
+			continue
+		}
+		if c < utf8.RuneSelf {
+			break
+		}
+		r, size := utf8.DecodeRuneInString(query[i:])
+		if !unicode.IsDigit(r) {
+			break
+		}
+		i += size
+	}
+	return i - start
+}
+
+// scanWords matches the first alternative, words are separated by single space or by `\s+`
+func scanWords(query string, alternatives [][]string, multiSpace bool, wordBoundary bool) int {
+	for _, words := range alternatives {
+		i := 0
+		for w, word := range words {
+			if w > 0 {
+				if multiSpace {
+					spaces := spacesLen(query, i)
+					if spaces == 0 {
+						i = -1
+						break
+					}
+					i += spaces
+				} else if i < len(query) && query[i] == ' ' {
+					i++
+				} else {
+					i = -1
+					break
+				}
+			}
+			if i = matchWord(query, i, word); i < 0 {
+				break
+			}
+		}
+		if i > 0 && (!wordBoundary || isBoundary(query, i)) {
+			return i
+		}
+	}
+	return -1
+}
+
+// scanIn matches `IN` operators with optional list of string literals: in ['a', 'b']
+func scanIn(query string) int {
+	i := scanWords(query, inTokens, false, true)
+	if i < 0 {
+		return -1
+	}
+	spaces := spacesLen(query, i)
+	if spaces == 0 || i+spaces >= len(query) || query[i+spaces] != '[' {
+		return i
+	}
+	j := i + spaces + 1
+	for {
+		j += spacesLen(query, j)
+		if j >= len(query) || query[j] != '\'' {
+			return i
+		}
+		end := strings.IndexByte(query[j+1:], '\'')
+		if end < 0 {
+			return i
+		}
+		j += end + 2
+		j += spacesLen(query, j)
+		if j >= len(query) {
+			return i
+		}
+		switch query[j] {
+		case ',':
+			j++
+		case ']':
+			return j + 1
+		default:
+			return i
+		}
+	}
+}
+
+func scanWS(query string) int {
+	return spacesLen(query, 0)
+}
+
+// scanComment matches `-- ...` up to the end of line when it contains even number of quotes and /* ... */
+func scanComment(query string) int {
+	if strings.HasPrefix(query, "--") {
+		end := strings.IndexByte(query, '\n')
+		if end < 0 {
+			end = len(query)
+		}
+		if strings.Count(query[2:end], "'")%2 == 0 {
+			return end
+		}
+		return -1
+	}
+	if strings.HasPrefix(query, "/*") {
+		// `(?:[^*]|\*[^/])*\*/`, `**/` doesn't close comment
+		i := 2
+		for i < len(query) {
+			if query[i] != '*' {
+				i++
+			} else if i+1 < len(query) && query[i+1] != '/' {
+				i += 2
+			} else {
+				break
+			}
+		}
+		if strings.HasPrefix(query[i:], "*/") {
+			return i + 2
+		}
+	}
+	return -1
+}
+
+func isIDRune(r rune, isFirst bool) bool {
+	return r == '_' || ('a' <= r && r <= 'z') || (!isFirst && '0' <= r && r <= '9')
+}
+
+// scanIDRunes returns length of [a-zA-Z_][a-zA-Z_0-9]* or [A-Za-z0-9_$]* for macros with regexp2 case folding
+func scanIDRunes(query string, i int, isMacro bool) int {
+	start := i
+	for i < len(query) {
+		r, size := foldRuneAt(query, i)
+		if !isIDRune(r, !isMacro && i == start) && !(isMacro && r == '$') {
+			break
+		}
+		i += size
+	}
+	return i - start
+}
+
+func scanID(query string) int {
+	if n := scanIDRunes(query, 0, false); n > 0 {
+		return n
+	}
+	return -1
+}
+
+func scanMacro(query string) int {
+	if query[0] != '$' {
+		return -1
+	}
+	if n := scanIDRunes(query, 1, true); n > 0 {
+		return n + 1
+	}
+	return -1
+}
+
+// scanString matches quoted string, identifier or column name with backslash escaping
+func scanString(query string) int {
+	quote := query[0]
+	if quote != '\'' && quote != '`' && quote != '"' {
+		return -1
+	}
+	i := 1
+	for i < len(query) && query[i] != quote {
+		if query[i] != '\\' {
+			i++
+			continue
+		}
+		// `\\.` doesn't match new line
+		if i+1 >= len(query) || query[i+1] == '\n' {
+			return -1
+		}
+		_, size := utf8.DecodeRuneInString(query[i+1:])
+		i += 1 + size
+	}
+	if i >= len(query) {
+		return -1
+	}
+	return i + 1
+}
+
+func isExponent(query string, i int) bool {
+	if i >= len(query) {
+		return false
+	}
+	r, _ := foldRuneAt(query, i)
+	return r == 'e'
+}
+
+// scanNumber matches powerIntRe, floatRe and intRe in the same order
+func scanNumber(query string) int {
+	intPart := digitsLen(query, 0)
+	if intPart > 0 && isExponent(query, intPart) {
+		if power := digitsLen(query, intPart+1); power > 0 {
+			return intPart + 1 + power
+		}
+	}
+	if intPart < len(query) && query[intPart] == '.' {
+		fraction := digitsLen(query, intPart+1)
+		if intPart > 0 || fraction > 0 {
+			return intPart + 1 + fraction
+		}
+	}
+	if intPart > 0 && isExponent(query, intPart) && intPart+1 < len(query) && (query[intPart+1] == '-' || query[intPart+1] == '+') {
+		if power := digitsLen(query, intPart+2); power > 0 {
+			return intPart + 2 + power
+		}
+	}
+	if intPart > 0 {
+		return intPart
+	}
+	return -1
+}
+
+var twoCharOperators = []string{"=>", "||", ">=", "<=", "==", "!=", "<>", "->"}
+
+// scanOperator matches binaryOpRe, closureRe and specCharsRe
+func scanOperator(query string) int {
+	for _, operator := range twoCharOperators {
+		if strings.HasPrefix(query, operator) {
+			return 2
+		}
+	}
+	if strings.IndexByte("-+/%*=<>.!()[],?:", query[0]) >= 0 {
+		return 1
+	}
+	return -1
+}
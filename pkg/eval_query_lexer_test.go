@@ -0,0 +1,109 @@
+package main
+
+import (
+	"fmt"
+	"strings"
+	"testing"
+
+	"github.com/stretchr/testify/require"
+)
+
+func scanAllTokens(query string) ([]string, error) {
+	scanner := newScanner(query)
+	scanner._s = query
+	scanner.SkipSpace = true
+	var tokens []string
+	for {
+		isNext, err := scanner.Next()
+		if err != nil {
+			return tokens, err
+		}
+		if !isNext {
+			return tokens, nil
+		}
+		tokens = append(tokens, scanner.Token)
+	}
+}
+
+func TestScanToken(t *testing.T) {
+	testCases := []struct {
+		query  string
+		tokens []string
+	}{
+		{"SELECT selected FROM t", []string{"SELECT", " ", "selected", " ", "FROM", " ", "t"}},
+		{"order by x ORDER  BY y", []string{"order by", " ", "x", " ", "ORDER", "  ", "BY", " ", "y"}},
+		{"GLOBAL ANY  LEFT\nJOIN t", []string{"GLOBAL ANY  LEFT\nJOIN", " ", "t"}},
+		{"a LEFT ARRAY JOIN arr", []string{"a", " ", "LEFT ARRAY JOIN", " ", "arr"}},
+		{"x GLOBAL NOT IN ('a') index", []string{"x", " ", "GLOBAL NOT IN", " ", "(", "'a'", ")", " ", "index"}},
+		{"x in ['a', 'b' ] y in ['a',]", []string{"x", " ", "in ['a', 'b' ]", " ", "y", " ", "in", " ", "[", "'a'", ",", "]"}},
+		{"$rateColumns(a,b) $columnsX $rate $__from $$a", []string{"$rateColumns", "(", "a", ",", "b", ")", " ", "$columns", "X", " ", "$rate", " ", "$__from", " ", "$$a"}},
+		{"-- it's 'ok''\nx -- don't\n'", []string{"-- it's 'ok''", "\n", "x", " ", "-", "-", " ", "don", "'t\n'"}},
+		{"/* a */x/* b **/", []string{"/* a */", "x", "/", "*", " ", "b", " ", "*", "*", "/"}},
+		{"'it\\'s' `a\\`b` \"c\"", []string{"'it\\'s'", " ", "`a\\`b`", " ", "\"c\""}},
+		{"1e5 1E+5 1.5 .5 1. 1e 12", []string{"1e5", " ", "1E+5", " ", "1.5", " ", ".5", " ", "1.", " ", "1", "e", " ", "12"}},
+		{"a=>b||c>=d<=e==f!=g<>h->i%j", []string{"a", "=>", "b", "||", "c", ">=", "d", "<=", "e", "==", "f", "!=", "g", "<>", "h", "->", "i", "%", "j"}},
+		{"x ? y : z", []string{"x", "?", "y", ":", "z"}},
+	}
+	for _, tc := range testCases {
+		tokens, err := scanAllTokens(tc.query)
+		require.NoError(t, err, tc.query)
+		var withoutSpaces []string
+		for _, token := range tc.tokens {
+			if !isWS(token) {
+				withoutSpaces = append(withoutSpaces, token)
+			}
+		}
+		require.Equal(t, withoutSpaces, tokens, tc.query)
+	}
+
+	_, err := scanAllTokens("SELECT 'unterminated")
+	require.Error(t, err)
+}
+
+// dashboardQueries contains typical queries from dashboards, big IN list from multi-value variables and $columns with many CASE branches
+func dashboardQueries() []string {
+	hosts := make([]string, 2000)
+	for i := range hosts {
+		hosts[i] = fmt.Sprintf("'host-%d.example.com'", i)
+	}
+	branches := make([]string, 300)
+	for i := range branches {
+		branches[i] = fmt.Sprintf("WHEN status = %d THEN 'status %d'", i, i)
+	}
+	return []string{
+		"SELECT $timeSeries as t, count() FROM $table WHERE $timeFilter GROUP BY t ORDER BY t",
+		"/* dashboard */ $rate(countIf(service_name='mysql' AND from_user='alice') AS mysql_alice, countIf(service_name='postgres') AS postgres) " +
+			"FROM $table WHERE $timeFilter -- rate of queries",
+		"SELECT t, groupArray((host, c)) AS groupArr FROM ( SELECT $timeSeries AS t, host, count() AS c FROM $table " +
+			"ANY LEFT JOIN hosts USING host WHERE $timeFilter AND host GLOBAL IN (SELECT host FROM top_hosts) GROUP BY t, host ) GROUP BY t ORDER BY t",
+		"SELECT $timeSeries AS t, host, sum(requests) FROM $table WHERE $timeFilter AND host IN (" + strings.Join(hosts, ", ") + ") GROUP BY t, host ORDER BY t",
+		"$columns(CASE " + strings.Join(branches, " ") + " ELSE 'other' END AS s, count() c) FROM $table WHERE $timeFilter",
+	}
+}
+
+func BenchmarkScannerToAST(b *testing.B) {
+	queries := dashboardQueries()
+	b.ReportAllocs()
+	b.ResetTimer()
+	for i := 0; i < b.N; i++ {
+		for _, query := range queries {
+			scanner := newScanner(query)
+			if _, err := scanner.toAST(); err != nil {
+				b.Fatal(err)
+			}
+		}
+	}
+}
+
+func BenchmarkScannerNext(b *testing.B) {
+	queries := dashboardQueries()
+	b.ReportAllocs()
+	b.ResetTimer()
+	for i := 0; i < b.N; i++ {
+		for _, query := range queries {
+			if _, err := scanAllTokens(query); err != nil {
+				b.Fatal(err)
+			}
+		}
+	}
+}
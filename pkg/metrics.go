@@ -0,0 +1,260 @@
+package main
+
+import (
+	"context"
+	"errors"
+	"io"
+	"net"
+	"strings"
+	"sync"
+	"time"
+
+	"github.com/prometheus/client_golang/prometheus"
+	"github.com/prometheus/client_golang/prometheus/promauto"
+)
+
+// metrics are registered in prometheus default registry, plugin SDK exports it to Grafana via CollectMetrics,
+// all metrics have datasource label with datasource UID
+const metricsNamespace = "grafana_plugin"
+const metricsSubsystem = "clickhouse"
+
+var (
+	queryStageDuration = promauto.NewHistogramVec(prometheus.HistogramOpts{
+		Namespace: metricsNamespace,
+		Subsystem: metricsSubsystem,
+		Name:      "query_stage_duration_seconds",
+		Help:      "Time spent by queries in stages: queue (waiting for maxConcurrentQueries), http (until response headers), decode (reading and parsing body), frames (building data frames)",
+		Buckets:   prometheus.ExponentialBuckets(0.001, 2.5, 12),
+	}, []string{"datasource", "stage"})
+
+	responseSize = promauto.NewHistogramVec(prometheus.HistogramOpts{
+		Namespace: metricsNamespace,
+		Subsystem: metricsSubsystem,
+		Name:      "response_size_bytes",
+		Help:      "Size of ClickHouse response body as received, before decompression",
+		Buckets:   prometheus.ExponentialBuckets(256, 4, 10),
+	}, []string{"datasource"})
+
+	responseRows = promauto.NewHistogramVec(prometheus.HistogramOpts{
+		Namespace: metricsNamespace,
+		Subsystem: metricsSubsystem,
+		Name:      "response_rows",
+		Help:      "Rows returned by ClickHouse queries",
+		Buckets:   prometheus.ExponentialBuckets(1, 4, 12),
+	}, []string{"datasource"})
+
+	responseCompressionRatio = promauto.NewHistogramVec(prometheus.HistogramOpts{
+		Namespace: metricsNamespace,
+		Subsystem: metricsSubsystem,
+		Name:      "response_compression_ratio",
+		Help:      "Decompressed to compressed size ratio of compressed ClickHouse responses",
+		Buckets:   []float64{1, 1.5, 2, 3, 5, 8, 13, 21, 34},
+	}, []string{"datasource", "encoding"})
+
+	queryErrors = promauto.NewCounterVec(prometheus.CounterOpts{
+		Namespace: metricsNamespace,
+		Subsystem: metricsSubsystem,
+		Name:      "query_errors_total",
+		Help:      "Failed queries by class: canceled, timeout, connection, clickhouse, decode",
+	}, []string{"datasource", "class"})
+
+	queriesInFlight = promauto.NewGaugeVec(prometheus.GaugeOpts{
+		Namespace: metricsNamespace,
+		Subsystem: metricsSubsystem,
+		Name:      "queries_in_flight",
+		Help:      "Queries which are sent to ClickHouse and wait for response",
+	}, []string{"datasource"})
+)
+
+// datasourceMetrics observes metrics of one datasource instance, nil metrics are not observed
+type datasourceMetrics struct {
+	datasource string
+}
+
+func newDatasourceMetrics(uid string) *datasourceMetrics {
+	return &datasourceMetrics{datasource: uid}
+}
+
+func (m *datasourceMetrics) observeStage(stage string, duration time.Duration) {
+	if m == nil {
+		return
+	}
+	queryStageDuration.WithLabelValues(m.datasource, stage).Observe(duration.Seconds())
+}
+
+// observeResponse records body size as received and ratio of decompressed size for compressed responses
+func (m *datasourceMetrics) observeResponse(contentEncoding string, received, decompressed int64) {
+	if m == nil {
+		return
+	}
+	responseSize.WithLabelValues(m.datasource).Observe(float64(received))
+	if contentEncoding != "" && received > 0 {
+		responseCompressionRatio.WithLabelValues(m.datasource, contentEncoding).Observe(float64(decompressed) / float64(received))
+	}
+}
+
+func (m *datasourceMetrics) observeRows(rows int) {
+	if m == nil {
+		return
+	}
+	responseRows.WithLabelValues(m.datasource).Observe(float64(rows))
+}
+
+func (m *datasourceMetrics) queryError(err error) {
+	if m == nil || err == nil {
+		return
+	}
+	queryErrors.WithLabelValues(m.datasource, queryErrorClass(err)).Inc()
+}
+
+// queryStarted increases in-flight queries, returned func shall be called after response is read
+func (m *datasourceMetrics) queryStarted() func() {
+	if m == nil {
+		return func() {}
+	}
+	gauge := queriesInFlight.WithLabelValues(m.datasource)
+	gauge.Inc()
+	return gauge.Dec
+}
+
+// queryErrorClass groups errors by the side which shall be investigated
+func queryErrorClass(err error) string {
+	var netErr net.Error
+	switch {
+	case errors.Is(err, context.Canceled):
+		return "canceled"
+	case errors.Is(err, context.DeadlineExceeded):
+		return "timeout"
+	case errors.As(err, &netErr) || errors.Is(err, io.ErrUnexpectedEOF):
+		return "connection"
+	case strings.HasPrefix(err.Error(), "Code:"):
+		// ClickHouse exception, e.g. "Code: 62. DB::Exception: Syntax error"
+		return "clickhouse"
+	default:
+		return "decode"
+	}
+}
+
+// countingReader counts bytes read from response body
+type countingReader struct {
+	reader io.Reader
+	n      int64
+}
+
+func (r *countingReader) Read(p []byte) (int, error) {
+	n, err := r.reader.Read(p)
+	r.n += int64(n)
+	return n, err
+}
+
+// datasourceStatsCollector exports counters which are already kept by caches, limiter and other parts of datasource instances
+type datasourceStatsCollector struct {
+	mu        sync.Mutex
+	instances map[string]*DatasourceSettings
+}
+
+var datasourceStats = &datasourceStatsCollector{instances: map[string]*DatasourceSettings{}}
+
+func init() {
+	prometheus.MustRegister(datasourceStats)
+}
+
+func newStatsDesc(name, help string, labels ...string) *prometheus.Desc {
+	return prometheus.NewDesc(prometheus.BuildFQName(metricsNamespace, metricsSubsystem, name), help, append([]string{"datasource"}, labels...), nil)
+}
+
+var (
+	cacheLookupsDesc       = newStatsDesc("cache_lookups_total", "Lookups in caches of datasource by result: hit or miss", "cache", "result")
+	cacheEvictionsDesc     = newStatsDesc("cache_evictions_total", "Entries evicted from caches of datasource", "cache")
+	cacheSizeDesc          = newStatsDesc("cache_size_bytes", "Approximate memory used by caches of datasource", "cache")
+	queuedQueriesDesc      = newStatsDesc("queued_queries", "Queries waiting in queue of maxConcurrentQueries")
+	activeQueriesDesc      = newStatsDesc("active_queries", "Queries which hold slot of maxConcurrentQueries")
+	deduplicatedDesc       = newStatsDesc("deduplicated_queries_total", "Queries executed in ClickHouse and collapsed into identical in-flight query", "result")
+	canceledQueriesDesc    = newStatsDesc("canceled_queries_total", "Queries canceled by Grafana and killed on ClickHouse server", "result")
+	readRowsDesc           = newStatsDesc("read_rows_total", "Rows read by ClickHouse from progress headers")
+	readBytesDesc          = newStatsDesc("read_bytes_total", "Bytes read by ClickHouse from progress headers")
+	replicaHealthyDesc     = newStatsDesc("replica_healthy", "1 when replica passes health checks", "replica")
+	replicaOutstandingDesc = newStatsDesc("replica_outstanding_queries", "Queries sent to replica and not finished yet", "replica")
+	replicaLatencyDesc     = newStatsDesc("replica_latency_seconds", "Moving average of replica response latency", "replica")
+)
+
+// register replaces previous instance of the same datasource, it is disposed after new instance is created
+func (c *datasourceStatsCollector) register(settings *DatasourceSettings) {
+	c.mu.Lock()
+	defer c.mu.Unlock()
+	c.instances[settings.Instance.UID] = settings
+}
+
+func (c *datasourceStatsCollector) unregister(settings *DatasourceSettings) {
+	c.mu.Lock()
+	defer c.mu.Unlock()
+	if c.instances[settings.Instance.UID] == settings {
+		delete(c.instances, settings.Instance.UID)
+	}
+}
+
+func (c *datasourceStatsCollector) Describe(ch chan<- *prometheus.Desc) {
+	for _, desc := range []*prometheus.Desc{
+		cacheLookupsDesc, cacheEvictionsDesc, cacheSizeDesc, queuedQueriesDesc, activeQueriesDesc, deduplicatedDesc,
+		canceledQueriesDesc, readRowsDesc, readBytesDesc, replicaHealthyDesc, replicaOutstandingDesc, replicaLatencyDesc,
+	} {
+		ch <- desc
+	}
+}
+
+func (c *datasourceStatsCollector) Collect(ch chan<- prometheus.Metric) {
+	c.mu.Lock()
+	defer c.mu.Unlock()
+	for uid, s := range c.instances {
+		counter := func(desc *prometheus.Desc, value uint64, labels ...string) {
+			ch <- prometheus.MustNewConstMetric(desc, prometheus.CounterValue, float64(value), append([]string{uid}, labels...)...)
+		}
+		gauge := func(desc *prometheus.Desc, value float64, labels ...string) {
+			ch <- prometheus.MustNewConstMetric(desc, prometheus.GaugeValue, value, append([]string{uid}, labels...)...)
+		}
+
+		timeZone := s.serverTimeZone.stats()
+		counter(cacheLookupsDesc, timeZone.Hits, "timezone", "hit")
+		counter(cacheLookupsDesc, timeZone.Misses, "timezone", "miss")
+		if s.evalQueryCache != nil {
+			evalQueryCache := s.evalQueryCache.stats()
+			counter(cacheLookupsDesc, evalQueryCache.Hits, "eval_query", "hit")
+			counter(cacheLookupsDesc, evalQueryCache.Misses, "eval_query", "miss")
+			counter(cacheEvictionsDesc, evalQueryCache.Evictions, "eval_query")
+			gauge(cacheSizeDesc, float64(evalQueryCache.Bytes), "eval_query")
+		}
+		if s.resultCache != nil {
+			resultCache := s.resultCache.stats()
+			counter(cacheLookupsDesc, resultCache.Hits, "result", "hit")
+			counter(cacheLookupsDesc, resultCache.Misses, "result", "miss")
+			counter(cacheEvictionsDesc, resultCache.Evictions, "result")
+			gauge(cacheSizeDesc, float64(resultCache.Bytes), "result")
+		}
+		if s.queryLimiter != nil {
+			limiter := s.queryLimiter.stats()
+			gauge(queuedQueriesDesc, float64(limiter.Waiting))
+			gauge(activeQueriesDesc, float64(limiter.Active))
+		}
+		if s.queryFlights != nil {
+			flights := s.queryFlights.stats()
+			counter(deduplicatedDesc, flights.Executed, "executed")
+			counter(deduplicatedDesc, flights.Collapsed, "collapsed")
+		}
+		cancels := s.queryCancels.stats()
+		counter(canceledQueriesDesc, cancels.Canceled, "canceled")
+		counter(canceledQueriesDesc, cancels.Killed, "killed")
+		counter(canceledQueriesDesc, cancels.KillErrors, "kill_error")
+		progress := s.queryProgress.stats()
+		counter(readRowsDesc, progress.ReadRows)
+		counter(readBytesDesc, progress.ReadBytes)
+		for _, replica := range s.replicas.stats() {
+			healthy := 0.0
+			if replica.Healthy {
+				healthy = 1
+			}
+			gauge(replicaHealthyDesc, healthy, replica.URL)
+			gauge(replicaOutstandingDesc, float64(replica.Outstanding), replica.URL)
+			gauge(replicaLatencyDesc, replica.LatencyMs/1000, replica.URL)
+		}
+	}
+}
@@ -0,0 +1,80 @@
+package main
+
+import (
+	"context"
+	"errors"
+	"fmt"
+	"io"
+	"net"
+	"testing"
+
+	"github.com/grafana/grafana-plugin-sdk-go/backend"
+	"github.com/prometheus/client_golang/prometheus"
+	"github.com/stretchr/testify/require"
+)
+
+func TestQueryErrorClass(t *testing.T) {
+	r := require.New(t)
+	r.Equal("canceled", queryErrorClass(fmt.Errorf("query canceled after waiting 1s in queue: %w", context.Canceled)))
+	r.Equal("timeout", queryErrorClass(context.DeadlineExceeded))
+	r.Equal("connection", queryErrorClass(&net.OpError{Op: "dial", Err: errors.New("connection refused")}))
+	r.Equal("connection", queryErrorClass(io.ErrUnexpectedEOF))
+	r.Equal("clickhouse", queryErrorClass(errors.New("Code: 62. DB::Exception: Syntax error")))
+	r.Equal("decode", queryErrorClass(errors.New("unable to parse json")))
+}
+
+// collectDatasourceStats returns values of datasource metrics by name and other labels
+func collectDatasourceStats(t *testing.T, uid string) map[string]float64 {
+	registry := prometheus.NewPedanticRegistry()
+	registry.MustRegister(datasourceStats)
+	families, err := registry.Gather()
+	require.NoError(t, err)
+	values := map[string]float64{}
+	for _, family := range families {
+		for _, metric := range family.GetMetric() {
+			key := family.GetName()
+			isDatasource := false
+			for _, label := range metric.GetLabel() {
+				if label.GetName() == "datasource" {
+					isDatasource = label.GetValue() == uid
+					continue
+				}
+				key += "," + label.GetName() + "=" + label.GetValue()
+			}
+			if isDatasource {
+				values[key] = metric.GetCounter().GetValue() + metric.GetGauge().GetValue()
+			}
+		}
+	}
+	return values
+}
+
+func TestDatasourceStatsCollector(t *testing.T) {
+	r := require.New(t)
+	instance, err := NewDatasourceSettings(context.Background(), backend.DataSourceInstanceSettings{
+		UID:      "metrics-test",
+		URL:      "http://localhost:8123",
+		JSONData: []byte(`{"deduplicateQueries": true, "resultCacheSize": 1}`),
+	})
+	r.NoError(err)
+	settings := instance.(*DatasourceSettings)
+	settings.evalQueryCache.get("missing")
+	settings.serverTimeZone.get()
+
+	values := collectDatasourceStats(t, "metrics-test")
+	r.Equal(float64(1), values["grafana_plugin_clickhouse_cache_lookups_total,cache=eval_query,result=miss"])
+	r.Equal(float64(1), values["grafana_plugin_clickhouse_cache_lookups_total,cache=timezone,result=miss"])
+	r.Equal(float64(0), values["grafana_plugin_clickhouse_deduplicated_queries_total,result=collapsed"])
+	r.Equal(float64(0), values["grafana_plugin_clickhouse_active_queries"])
+	r.Contains(values, "grafana_plugin_clickhouse_cache_size_bytes,cache=result")
+
+	// new instance created after settings change replaces old one, old instance is disposed after that
+	newInstance, err := NewDatasourceSettings(context.Background(), backend.DataSourceInstanceSettings{UID: "metrics-test"})
+	r.NoError(err)
+	settings.Dispose()
+	values = collectDatasourceStats(t, "metrics-test")
+	r.Equal(float64(0), values["grafana_plugin_clickhouse_cache_lookups_total,cache=eval_query,result=miss"])
+
+	newInstance.(*DatasourceSettings).Dispose()
+	r.Empty(collectDatasourceStats(t, "metrics-test"))
+}
@@ -75,8 +75,11 @@ func NewDataFieldByType(fieldName, fieldType string) *data.Field {
 		fieldType = strings.TrimSuffix(strings.TrimPrefix(fieldType, "LowCardinality("), ")")
 	}
 
-	isNullable := strings.Contains(fieldType, "Nullable")
-	fieldType = strings.TrimSuffix(strings.TrimPrefix(fieldType, "Nullable("), ")")
+	// Nullable inside Array, Tuple or Map doesn't make field nullable, the same as ParseValue
+	isNullable := strings.HasPrefix(fieldType, "Nullable(")
+	if isNullable {
+		fieldType = strings.TrimSuffix(strings.TrimPrefix(fieldType, "Nullable("), ")")
+	}
 
 	switch fieldType {
 	case "String", "UUID", "IPv6", "IPv4":
@@ -85,9 +88,9 @@ func NewDataFieldByType(fieldName, fieldType string) *data.Field {
 		return newFloat64Field(fieldName, isNullable)
 	case "UInt64":
 		// This can be a time or uint64 value
-		// Assume that t is the field name used for timestamp
-		if fieldName == "t" && !isNullable {
-			return data.NewField(fieldName, nil, []time.Time{})
+		// Assume that t is the field name used for timestamp, the same as ParseValue
+		if fieldName == "t" {
+			return newTimeField(fieldName, isNullable)
 		}
 
 		if isNullable {
@@ -96,6 +99,9 @@ func NewDataFieldByType(fieldName, fieldType string) *data.Field {
 			return data.NewField(fieldName, nil, []uint64{})
 		}
 	case "Int64":
+		if fieldName == "t" {
+			return newTimeField(fieldName, isNullable)
+		}
 		if isNullable {
 			return data.NewField(fieldName, nil, []*int64{})
 		} else {
@@ -138,9 +144,110 @@ func newStringField(fieldName string, isNullable bool) *data.Field {
 	}
 }
 
+// toFloat64 converts number decoded from JSON, ClickHouse can quote it or return as string
+func toFloat64(value interface{}) (float64, bool) {
+	switch v := value.(type) {
+	case nil:
+		return 0, false
+	case float64:
+		return v, true
+	case string:
+		fv, err := strconv.ParseFloat(v, 64)
+		return fv, err == nil
+	case json.Number:
+		fv, err := v.Float64()
+		return fv, err == nil
+	default:
+		rv := reflect.ValueOf(value)
+		if rv.CanFloat() {
+			return rv.Float(), true
+		}
+		return 0, false
+	}
+}
+
+func toString(value interface{}) (string, bool) {
+	switch v := value.(type) {
+	case nil:
+		return "", false
+	case string:
+		return v, true
+	default:
+		return reflect.ValueOf(value).String(), true
+	}
+}
+
+func toUInt64(value interface{}) (uint64, bool) {
+	var err error
+	var ui64v uint64
+	switch v := value.(type) {
+	case nil:
+		return 0, false
+	case string:
+		ui64v, err = strconv.ParseUint(v, 10, 64)
+	default:
+		ui64v, err = strconv.ParseUint(fmt.Sprintf("%v", value), 10, 64)
+	}
+	return ui64v, err == nil
+}
+
+func toInt64(value interface{}) (int64, bool) {
+	var err error
+	var i64v int64
+	switch v := value.(type) {
+	case nil:
+		return 0, false
+	case string:
+		i64v, err = strconv.ParseInt(v, 10, 64)
+	default:
+		i64v, err = strconv.ParseInt(fmt.Sprintf("%v", value), 10, 64)
+	}
+	return i64v, err == nil
+}
+
+// toTimestamp converts millisecond timestamp
+func toTimestamp(value interface{}) (time.Time, bool) {
+	i64v, ok := toInt64(value)
+	if !ok {
+		return time.Unix(0, 0), false
+	}
+	// Convert millisecond timestamp to nanosecond timestamp for parsing
+	return time.Unix(0, i64v*int64(time.Millisecond)), true
+}
+
+func toDateTime(value interface{}, layout string, timezone *time.Location) (time.Time, bool) {
+	var strValue string
+	switch v := value.(type) {
+	case nil:
+		return time.Unix(0, 0), false
+	case string:
+		strValue = v
+	default:
+		strValue = fmt.Sprintf("%v", value)
+	}
+	t, err := time.ParseInLocation(layout, strValue, timezone)
+	if err != nil {
+		return time.Unix(0, 0), false
+	}
+	return t, true
+}
+
+// dateTimeLayoutByFieldType returns layout used by ClickHouse to format values of Date, DateTime and DateTime64 types
+func dateTimeLayoutByFieldType(fieldType string) (string, bool) {
+	if strings.HasPrefix(fieldType, dateTime64Prefix) && strings.Contains(fieldType, "3") {
+		return dateTime64Layout3, true
+	} else if strings.HasPrefix(fieldType, dateTime64Prefix) && strings.Contains(fieldType, "6") {
+		return dateTime64Layout6, true
+	} else if strings.HasPrefix(fieldType, dateTimePrefix) {
+		return dateTimeLayout, true
+	} else if strings.HasPrefix(fieldType, datePrefix) {
+		return dateLayout, true
+	}
+	return "", false
+}
+
 func parseFloatValue(value interface{}, isNullable bool) Value {
-	if value != nil {
-		fv := reflect.ValueOf(value).Float()
+	if fv, ok := toFloat64(value); ok {
 		if isNullable {
 			return &fv
 		} else {
@@ -156,8 +263,7 @@ func parseFloatValue(value interface{}, isNullable bool) Value {
 }
 
 func parseStringValue(value interface{}, isNullable bool) Value {
-	if value != nil {
-		str := reflect.ValueOf(value).String()
+	if str, ok := toString(value); ok {
 		if isNullable {
 			return &str
 		} else {
@@ -193,15 +299,11 @@ func parseMapValue(value interface{}, isNullable bool) Value {
 }
 
 func parseUInt64Value(value interface{}, isNullable bool) Value {
-	if value != nil {
-		ui64v, err := strconv.ParseUint(fmt.Sprintf("%v", value), 10, 64)
-
-		if err == nil {
-			if isNullable {
-				return &ui64v
-			} else {
-				return ui64v
-			}
+	if ui64v, ok := toUInt64(value); ok {
+		if isNullable {
+			return &ui64v
+		} else {
+			return ui64v
 		}
 	}
 	if isNullable {
@@ -212,15 +314,11 @@ func parseUInt64Value(value interface{}, isNullable bool) Value {
 }
 
 func parseInt64Value(value interface{}, isNullable bool) Value {
-	if value != nil {
-		i64v, err := strconv.ParseInt(fmt.Sprintf("%v", value), 10, 64)
-
-		if err == nil {
-			if isNullable {
-				return &i64v
-			} else {
-				return i64v
-			}
+	if i64v, ok := toInt64(value); ok {
+		if isNullable {
+			return &i64v
+		} else {
+			return i64v
 		}
 	}
 
@@ -232,18 +330,11 @@ func parseInt64Value(value interface{}, isNullable bool) Value {
 }
 
 func parseTimestampValue(value interface{}, isNullable bool) Value {
-	if value != nil {
-		strValue := fmt.Sprintf("%v", value)
-		i64v, err := strconv.ParseInt(strValue, 10, 64)
-
-		if err == nil {
-			// Convert millisecond timestamp to nanosecond timestamp for parsing
-			timeValue := time.Unix(0, i64v*int64(time.Millisecond))
-			if isNullable {
-				return &timeValue
-			} else {
-				return timeValue
-			}
+	if timeValue, ok := toTimestamp(value); ok {
+		if isNullable {
+			return &timeValue
+		} else {
+			return timeValue
 		}
 	}
 
@@ -255,16 +346,11 @@ func parseTimestampValue(value interface{}, isNullable bool) Value {
 }
 
 func parseDateTimeValue(value interface{}, layout string, timezone *time.Location, isNullable bool) Value {
-	if value != nil {
-		strValue := fmt.Sprintf("%v", value)
-		t, err := time.ParseInLocation(layout, strValue, timezone)
-
-		if err == nil {
-			if isNullable {
-				return &t
-			} else {
-				return t
-			}
+	if t, ok := toDateTime(value, layout, timezone); ok {
+		if isNullable {
+			return &t
+		} else {
+			return t
 		}
 	}
 	if isNullable {
@@ -305,14 +391,8 @@ func ParseValue(fieldName string, fieldType string, tz *time.Location, value int
 				return parseFloatValue(value, isNullable)
 			} else if strings.HasPrefix(fieldType, "FixedString") || strings.HasPrefix(fieldType, "Enum") {
 				return parseStringValue(value, isNullable)
-			} else if strings.HasPrefix(fieldType, dateTime64Prefix) && strings.Contains(fieldType, "3") {
-				return parseDateTimeValue(value, dateTime64Layout3, tz, isNullable)
-			} else if strings.HasPrefix(fieldType, dateTime64Prefix) && strings.Contains(fieldType, "6") {
-				return parseDateTimeValue(value, dateTime64Layout6, tz, isNullable)
-			} else if strings.HasPrefix(fieldType, dateTimePrefix) {
-				return parseDateTimeValue(value, dateTimeLayout, tz, isNullable)
-			} else if strings.HasPrefix(fieldType, datePrefix) {
-				return parseDateTimeValue(value, dateLayout, tz, isNullable)
+			} else if layout, isDate := dateTimeLayoutByFieldType(fieldType); isDate {
+				return parseDateTimeValue(value, layout, tz, isNullable)
 			} else {
 				backend.Logger.Warn(fmt.Sprintf(
 					"Value [%v] has compound type [%v] and will be returned as string", value, fieldType,
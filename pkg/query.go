@@ -49,6 +49,14 @@ func (q *Query) ApplyTimeRangeToQuery() string {
 	return fmtQuery
 }
 
+// applyResponseFormat replaces default FORMAT JSON to format configured in datasource settings
+func applyResponseFormat(sql, responseFormat string) string {
+	if responseFormat == "" || responseFormat == ResponseFormatJSON || !strings.HasSuffix(sql, FormatJson) {
+		return sql
+	}
+	return strings.TrimSuffix(sql, FormatJson) + "FORMAT " + responseFormat
+}
+
 func (q *Query) formatTimeValue(fmtQuery string, fmtTime time.Time, fmtRE *regexp.Regexp, isMs bool) string {
 	matches := fmtRE.FindStringSubmatch(fmtQuery)
 	numericRE := regexp.MustCompile(`\d+`)
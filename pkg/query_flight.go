@@ -0,0 +1,92 @@
+package main
+
+import (
+	"context"
+	"sync"
+	"sync/atomic"
+)
+
+// queryFlightGroup coalesces identical in-flight queries of one datasource, one ClickHouse request feeds all waiters,
+// Response is shared and shall be used read-only after fn returned it
+type queryFlightGroup struct {
+	mu      sync.Mutex
+	flights map[string]*queryFlight
+
+	executed  atomic.Uint64
+	collapsed atomic.Uint64
+}
+
+type queryFlight struct {
+	done     chan struct{}
+	response *Response
+	err      error
+	// waiters count requests which still wait result, ClickHouse query is canceled when all of them are canceled
+	waiters int
+	cancel  context.CancelFunc
+}
+
+type queryFlightStats struct {
+	Executed  uint64 `json:"executed"`
+	Collapsed uint64 `json:"collapsed"`
+}
+
+func newQueryFlightGroup() *queryFlightGroup {
+	return &queryFlightGroup{flights: map[string]*queryFlight{}}
+}
+
+// do executes fn once for all concurrent calls with the same key, returns true when result of other call was shared
+func (g *queryFlightGroup) do(ctx context.Context, key string, fn func(ctx context.Context) (*Response, error)) (*Response, bool, error) {
+	if g == nil {
+		response, err := fn(ctx)
+		return response, false, err
+	}
+	g.mu.Lock()
+	flight, isShared := g.flights[key]
+	if isShared {
+		flight.waiters++
+		g.collapsed.Add(1)
+	} else {
+		// flight doesn't depend on cancellation of the first caller, but keeps its values
+		flightCtx, cancel := context.WithCancel(context.WithoutCancel(ctx))
+		flight = &queryFlight{done: make(chan struct{}), waiters: 1, cancel: cancel}
+		g.flights[key] = flight
+		g.executed.Add(1)
+		go g.run(flightCtx, key, flight, fn)
+	}
+	g.mu.Unlock()
+
+	select {
+	case <-flight.done:
+		return flight.response, isShared, flight.err
+	case <-ctx.Done():
+		g.mu.Lock()
+		flight.waiters--
+		if flight.waiters == 0 {
+			flight.cancel()
+			// next calls shall not join canceled flight
+			if g.flights[key] == flight {
+				delete(g.flights, key)
+			}
+		}
+		g.mu.Unlock()
+		return nil, isShared, ctx.Err()
+	}
+}
+
+func (g *queryFlightGroup) run(ctx context.Context, key string, flight *queryFlight, fn func(ctx context.Context) (*Response, error)) {
+	defer flight.cancel()
+	flight.response, flight.err = fn(ctx)
+	g.mu.Lock()
+	if g.flights[key] == flight {
+		delete(g.flights, key)
+	}
+	g.mu.Unlock()
+	close(flight.done)
+}
+
+func (g *queryFlightGroup) stats() queryFlightStats {
+	if g == nil {
+		return queryFlightStats{}
+	}
+	return queryFlightStats{Executed: g.executed.Load(), Collapsed: g.collapsed.Load()}
+}
@@ -0,0 +1,101 @@
+package main
+
+import (
+	"context"
+	"sync"
+	"sync/atomic"
+	"testing"
+	"time"
+
+	"github.com/stretchr/testify/require"
+)
+
+func TestQueryFlightGroupCollapsesIdenticalQueries(t *testing.T) {
+	r := require.New(t)
+	group := newQueryFlightGroup()
+	var calls atomic.Int32
+	unblock := make(chan struct{})
+	shared := &Response{Rows: 1}
+	fn := func(ctx context.Context) (*Response, error) {
+		calls.Add(1)
+		<-unblock
+		return shared, nil
+	}
+
+	const waiters = 10
+	var wg sync.WaitGroup
+	var sharedCount atomic.Int32
+	for i := 0; i < waiters; i++ {
+		wg.Add(1)
+		go func() {
+			defer wg.Done()
+			response, isShared, err := group.do(context.Background(), "SELECT 1", fn)
+			if err != nil || response != shared {
+				t.Errorf("unexpected result %v %v", response, err)
+			}
+			if isShared {
+				sharedCount.Add(1)
+			}
+		}()
+	}
+	r.Eventually(func() bool { return group.stats().Collapsed == waiters-1 }, time.Second, time.Millisecond)
+	close(unblock)
+	wg.Wait()
+
+	r.Equal(int32(1), calls.Load())
+	r.Equal(int32(waiters-1), sharedCount.Load())
+	r.Equal(queryFlightStats{Executed: 1, Collapsed: waiters - 1}, group.stats())
+
+	_, isShared, err := group.do(context.Background(), "SELECT 1", fn)
+	r.NoError(err)
+	r.False(isShared, "finished query shall not be reused")
+	r.Equal(int32(2), calls.Load())
+}
+
+func TestQueryFlightGroupCancel(t *testing.T) {
+	r := require.New(t)
+	group := newQueryFlightGroup()
+	flightCanceled := make(chan struct{})
+	fn := func(ctx context.Context) (*Response, error) {
+		<-ctx.Done()
+		close(flightCanceled)
+		return nil, ctx.Err()
+	}
+
+	firstCtx, cancelFirst := context.WithCancel(context.Background())
+	secondCtx, cancelSecond := context.WithCancel(context.Background())
+	firstErr := make(chan error)
+	go func() {
+		_, _, err := group.do(firstCtx, "SELECT 1", fn)
+		firstErr <- err
+	}()
+	r.Eventually(func() bool { return group.stats().Executed == 1 }, time.Second, time.Millisecond)
+	secondErr := make(chan error)
+	go func() {
+		_, _, err := group.do(secondCtx, "SELECT 1", fn)
+		secondErr <- err
+	}()
+	r.Eventually(func() bool { return group.stats().Collapsed == 1 }, time.Second, time.Millisecond)
+
+	cancelFirst()
+	r.ErrorIs(<-firstErr, context.Canceled)
+	select {
+	case <-flightCanceled:
+		t.Fatal("query shall run while other request waits result")
+	case <-time.After(10 * time.Millisecond):
+	}
+
+	cancelSecond()
+	r.ErrorIs(<-secondErr, context.Canceled)
+	<-flightCanceled
+}
+
+func TestQueryFlightGroupNil(t *testing.T) {
+	var group *queryFlightGroup
+	response, isShared, err := group.do(context.Background(), "SELECT 1", func(ctx context.Context) (*Response, error) {
+		return &Response{Rows: 1}, nil
+	})
+	require.NoError(t, err)
+	require.False(t, isShared)
+	require.Equal(t, 1, response.Rows)
+}
@@ -0,0 +1,135 @@
+package main
+
+import (
+	"container/list"
+	"context"
+	"sync"
+	"time"
+)
+
+// queryLimiter limits in-flight ClickHouse queries of one datasource,
+// waiting queries are queued per user and freed slots are given to users in round-robin order,
+// so one big dashboard doesn't delay queries of other users, queries of one user are served in FIFO order
+type queryLimiter struct {
+	mu     sync.Mutex
+	limit  int
+	active int
+	queues map[string]*list.List
+	// users contains users with waiting queries in round-robin order
+	users *list.List
+}
+
+type queryWaiter struct {
+	user    string
+	ready   chan struct{}
+	granted bool
+}
+
+func newQueryLimiter(limit int) *queryLimiter {
+	return &queryLimiter{
+		limit:  limit,
+		queues: map[string]*list.List{},
+		users:  list.New(),
+	}
+}
+
+// acquire blocks until query of user can be executed, returns release func and time spent in queue
+func (l *queryLimiter) acquire(ctx context.Context, user string) (func(), time.Duration, error) {
+	if l == nil {
+		return func() {}, 0, nil
+	}
+	start := time.Now()
+	l.mu.Lock()
+	if l.active < l.limit && l.users.Len() == 0 {
+		l.active++
+		l.mu.Unlock()
+		return l.releaseOnce(), 0, nil
+	}
+	waiter := &queryWaiter{user: user, ready: make(chan struct{})}
+	queue, exists := l.queues[user]
+	if !exists {
+		queue = list.New()
+		l.queues[user] = queue
+		l.users.PushBack(user)
+	}
+	element := queue.PushBack(waiter)
+	l.mu.Unlock()
+
+	select {
+	case <-waiter.ready:
+		return l.releaseOnce(), time.Since(start), nil
+	case <-ctx.Done():
+		l.mu.Lock()
+		defer l.mu.Unlock()
+		if waiter.granted {
+			// slot was given concurrently with cancellation, pass it to the next waiter
+			l.releaseLocked()
+		} else {
+			l.removeLocked(user, queue, element)
+		}
+		return nil, time.Since(start), ctx.Err()
+	}
+}
+
+func (l *queryLimiter) releaseOnce() func() {
+	var once sync.Once
+	return func() {
+		once.Do(func() {
+			l.mu.Lock()
+			defer l.mu.Unlock()
+			l.releaseLocked()
+		})
+	}
+}
+
+// releaseLocked passes slot to the first query of the next user or frees it
+func (l *queryLimiter) releaseLocked() {
+	front := l.users.Front()
+	if front == nil {
+		l.active--
+		return
+	}
+	user := l.users.Remove(front).(string)
+	queue := l.queues[user]
+	waiter := queue.Remove(queue.Front()).(*queryWaiter)
+	if queue.Len() > 0 {
+		l.users.PushBack(user)
+	} else {
+		delete(l.queues, user)
+	}
+	waiter.granted = true
+	close(waiter.ready)
+}
+
+func (l *queryLimiter) removeLocked(user string, queue *list.List, element *list.Element) {
+	queue.Remove(element)
+	if queue.Len() > 0 {
+		return
+	}
+	delete(l.queues, user)
+	for e := l.users.Front(); e != nil; e = e.Next() {
+		if e.Value.(string) == user {
+			l.users.Remove(e)
+			return
+		}
+	}
+}
+
+type queryLimiterStats struct {
+	Limit   int `json:"limit"`
+	Active  int `json:"active"`
+	Waiting int `json:"waiting"`
+}
+
+func (l *queryLimiter) stats() queryLimiterStats {
+	if l == nil {
+		return queryLimiterStats{}
+	}
+	l.mu.Lock()
+	defer l.mu.Unlock()
+	waiting := 0
+	for _, queue := range l.queues {
+		waiting += queue.Len()
+	}
+	return queryLimiterStats{Limit: l.limit, Active: l.active, Waiting: waiting}
+}
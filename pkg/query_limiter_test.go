@@ -0,0 +1,76 @@
+package main
+
+import (
+	"context"
+	"sync"
+	"testing"
+	"time"
+
+	"github.com/stretchr/testify/require"
+)
+
+func TestQueryLimiterRoundRobinBetweenUsers(t *testing.T) {
+	r := require.New(t)
+	limiter := newQueryLimiter(1)
+	ctx := context.Background()
+	release, queueWait, err := limiter.acquire(ctx, "alice")
+	r.NoError(err)
+	r.Zero(queueWait)
+
+	var mu sync.Mutex
+	var order []string
+	var wg sync.WaitGroup
+	enqueue := func(user string) {
+		wg.Add(1)
+		waiting := limiter.stats().Waiting
+		go func() {
+			defer wg.Done()
+			releaseNext, _, err := limiter.acquire(ctx, user)
+			if err != nil {
+				t.Error(err)
+				return
+			}
+			mu.Lock()
+			order = append(order, user)
+			mu.Unlock()
+			releaseNext()
+		}()
+		r.Eventually(func() bool { return limiter.stats().Waiting == waiting+1 }, time.Second, time.Millisecond)
+	}
+	enqueue("alice")
+	enqueue("alice")
+	enqueue("alice")
+	enqueue("bob")
+	r.Equal(queryLimiterStats{Limit: 1, Active: 1, Waiting: 4}, limiter.stats())
+
+	release()
+	release()
+	wg.Wait()
+	r.Equal([]string{"alice", "bob", "alice", "alice"}, order)
+	r.Equal(queryLimiterStats{Limit: 1, Active: 0, Waiting: 0}, limiter.stats())
+}
+
+func TestQueryLimiterCanceledWhileWaiting(t *testing.T) {
+	r := require.New(t)
+	limiter := newQueryLimiter(1)
+	release, _, err := limiter.acquire(context.Background(), "alice")
+	r.NoError(err)
+
+	ctx, cancel := context.WithTimeout(context.Background(), 10*time.Millisecond)
+	defer cancel()
+	_, queueWait, err := limiter.acquire(ctx, "bob")
+	r.ErrorIs(err, context.DeadlineExceeded)
+	r.GreaterOrEqual(queueWait, 10*time.Millisecond)
+	r.Equal(queryLimiterStats{Limit: 1, Active: 1, Waiting: 0}, limiter.stats())
+
+	release()
+	r.Equal(queryLimiterStats{Limit: 1, Active: 0, Waiting: 0}, limiter.stats())
+}
+
+func TestQueryLimiterNil(t *testing.T) {
+	var limiter *queryLimiter
+	release, queueWait, err := limiter.acquire(context.Background(), "alice")
+	require.NoError(t, err)
+	require.Zero(t, queueWait)
+	release()
+}
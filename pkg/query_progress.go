@@ -0,0 +1,89 @@
+package main
+
+import (
+	"encoding/json"
+	"fmt"
+	"net/http"
+	"sync/atomic"
+	"time"
+
+	"github.com/grafana/grafana-plugin-sdk-go/backend"
+	"github.com/grafana/grafana-plugin-sdk-go/data"
+)
+
+// DefaultProgressHeadersInterval ClickHouse sends progress header each 100ms by default, long queries would produce huge headers
+const DefaultProgressHeadersInterval = time.Second
+
+// queryProgress is value of X-ClickHouse-Progress and X-ClickHouse-Summary headers, ClickHouse sends numbers as strings
+type queryProgress struct {
+	ReadRows        uint64 `json:"read_rows,string"`
+	ReadBytes       uint64 `json:"read_bytes,string"`
+	TotalRowsToRead uint64 `json:"total_rows_to_read,string"`
+	ResultRows      uint64 `json:"result_rows,string"`
+	ElapsedNs       uint64 `json:"elapsed_ns,string"`
+}
+
+// parseQueryProgress reads the last progress header, headers are received by http client together before response body,
+// X-ClickHouse-Summary is used when progress headers are not enabled
+func parseQueryProgress(header http.Header) *queryProgress {
+	values := header.Values("X-ClickHouse-Progress")
+	if len(values) == 0 {
+		values = header.Values("X-ClickHouse-Summary")
+	}
+	if len(values) == 0 {
+		return nil
+	}
+	progress := &queryProgress{}
+	if err := json.Unmarshal([]byte(values[len(values)-1]), progress); err != nil {
+		backend.Logger.Debug(fmt.Sprintf("unable to parse ClickHouse progress header %s: %v", values[len(values)-1], err))
+		return nil
+	}
+	return progress
+}
+
+// addQueryProgressStats shows rows and bytes read by ClickHouse in query inspector
+func addQueryProgressStats(frames data.Frames, progress *queryProgress) {
+	if progress == nil {
+		return
+	}
+	for _, frame := range frames {
+		if frame.Meta == nil {
+			frame.Meta = &data.FrameMeta{}
+		}
+		frame.Meta.Stats = append(frame.Meta.Stats,
+			data.QueryStat{FieldConfig: data.FieldConfig{DisplayName: "Rows read"}, Value: float64(progress.ReadRows)},
+			data.QueryStat{FieldConfig: data.FieldConfig{DisplayName: "Bytes read", Unit: "decbytes"}, Value: float64(progress.ReadBytes)},
+		)
+		if progress.ElapsedNs > 0 {
+			frame.Meta.Stats = append(frame.Meta.Stats,
+				data.QueryStat{FieldConfig: data.FieldConfig{DisplayName: "ClickHouse elapsed time", Unit: "ms"}, Value: float64(progress.ElapsedNs) / 1e6},
+			)
+		}
+	}
+}
+
+// queryProgressCounters sums progress of all queries of datasource
+type queryProgressCounters struct {
+	readRows  atomic.Uint64
+	readBytes atomic.Uint64
+	elapsedNs atomic.Uint64
+}
+
+type queryProgressStats struct {
+	ReadRows  uint64 `json:"readRows"`
+	ReadBytes uint64 `json:"readBytes"`
+	ElapsedMs uint64 `json:"elapsedMs"`
+}
+
+func (c *queryProgressCounters) add(progress *queryProgress) {
+	if progress == nil {
+		return
+	}
+	c.readRows.Add(progress.ReadRows)
+	c.readBytes.Add(progress.ReadBytes)
+	c.elapsedNs.Add(progress.ElapsedNs)
+}
+
+func (c *queryProgressCounters) stats() queryProgressStats {
+	return queryProgressStats{ReadRows: c.readRows.Load(), ReadBytes: c.readBytes.Load(), ElapsedMs: c.elapsedNs.Load() / 1e6}
+}
@@ -0,0 +1,82 @@
+package main
+
+import (
+	"context"
+	"net/http"
+	"net/http/httptest"
+	"testing"
+
+	"github.com/grafana/grafana-plugin-sdk-go/backend"
+	"github.com/grafana/grafana-plugin-sdk-go/data"
+	"github.com/stretchr/testify/require"
+)
+
+func TestParseQueryProgress(t *testing.T) {
+	r := require.New(t)
+	header := http.Header{}
+	r.Nil(parseQueryProgress(header))
+
+	header.Add("X-ClickHouse-Summary", `{"read_rows":"1","read_bytes":"8","written_rows":"0","written_bytes":"0","total_rows_to_read":"1","result_rows":"0","result_bytes":"0"}`)
+	r.Equal(&queryProgress{ReadRows: 1, ReadBytes: 8, TotalRowsToRead: 1}, parseQueryProgress(header))
+
+	header.Add("X-ClickHouse-Progress", `{"read_rows":"100","read_bytes":"800","total_rows_to_read":"1000","elapsed_ns":"1000000"}`)
+	header.Add("X-ClickHouse-Progress", `{"read_rows":"1000","read_bytes":"8000","total_rows_to_read":"1000","elapsed_ns":"5000000"}`)
+	progress := parseQueryProgress(header)
+	r.Equal(&queryProgress{ReadRows: 1000, ReadBytes: 8000, TotalRowsToRead: 1000, ElapsedNs: 5000000}, progress)
+
+	frames := data.Frames{data.NewFrame("")}
+	addQueryProgressStats(frames, progress)
+	r.Len(frames[0].Meta.Stats, 3)
+	r.Equal(float64(1000), frames[0].Meta.Stats[0].Value)
+	r.Equal(float64(8000), frames[0].Meta.Stats[1].Value)
+	r.Equal(float64(5), frames[0].Meta.Stats[2].Value)
+
+	header.Set("X-ClickHouse-Progress", "not json")
+	r.Nil(parseQueryProgress(header))
+}
+
+func TestQueryProgressFromHeaders(t *testing.T) {
+	r := require.New(t)
+	var params map[string][]string
+	server := httptest.NewServer(http.HandlerFunc(func(w http.ResponseWriter, req *http.Request) {
+		params = req.URL.Query()
+		w.Header().Add("X-ClickHouse-Progress", `{"read_rows":"10","read_bytes":"80","total_rows_to_read":"10"}`)
+		_, _ = w.Write([]byte(`{"meta":[{"name":"1","type":"UInt8"}],"data":[{"1":1}],"rows":1}`))
+	}))
+	defer server.Close()
+
+	instance, err := NewDatasourceSettings(context.Background(), backend.DataSourceInstanceSettings{
+		URL:      server.URL,
+		JSONData: []byte(`{"sendProgress": true, "maxRowsToRead": 1000000, "querySettings": {"read_overflow_mode": "break"}}`),
+	})
+	r.NoError(err)
+	settings := instance.(*DatasourceSettings)
+	defer settings.Dispose()
+
+	client := &ClickHouseClient{settings: settings, userQuery: true}
+	response, err := client.Query(context.Background(), DefaultQuery)
+	r.NoError(err)
+	r.Equal(&queryProgress{ReadRows: 10, ReadBytes: 80, TotalRowsToRead: 10}, response.progress)
+	r.Equal(queryProgressStats{ReadRows: 10, ReadBytes: 80}, settings.queryProgress.stats())
+
+	r.Equal([]string{"1"}, params["send_progress_in_http_headers"])
+	r.Equal([]string{"1000"}, params["http_headers_progress_interval_ms"])
+	r.Equal([]string{"1000000"}, params["max_rows_to_read"])
+	r.Equal([]string{"break"}, params["read_overflow_mode"])
+
+	// timezone, schema and health check queries are sent without option settings
+	internal := &ClickHouseClient{settings: settings}
+	_, err = internal.Query(context.Background(), DefaultQuery)
+	r.NoError(err)
+	r.NotContains(params, "send_progress_in_http_headers")
+	r.NotContains(params, "max_rows_to_read")
+	r.Equal([]string{"break"}, params["read_overflow_mode"])
+	alert := &ClickHouseClient{settings: settings, userQuery: true, isAlert: true}
+	alert.FetchTimeZone(context.Background())
+	r.Equal([]string{TimeZoneQuery}, params["query"])
+	r.NotContains(params, "send_progress_in_http_headers")
+	r.NotContains(params, "max_rows_to_read")
+	_, err = settings.schemaCache.get(context.Background())
+	r.NoError(err)
+	r.NotContains(params, "max_rows_to_read")
+}
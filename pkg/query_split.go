@@ -0,0 +1,105 @@
+package main
+
+import (
+	"regexp"
+	"time"
+
+	"github.com/grafana/grafana-plugin-sdk-go/data"
+)
+
+// maxQueryParts limits parallel queries of one panel, split interval is increased for longer time ranges
+const maxQueryParts = 64
+
+// splitQueryUnsafeRE matches clauses which can't be applied to each part of time range separately
+var splitQueryUnsafeRE = regexp.MustCompile(`(?i)\bover\s*\(|\bwith\s+fill\b|\blimit\b`)
+
+var splitQueryFilterRE = regexp.MustCompile(`\$(timeFilter|timeFilterMs)\b`)
+
+// queryPart is part of time range fetched by separate query, rows with time in [keepFrom, keepUntil) are used,
+// zero keepFrom or keepUntil means without bound
+type queryPart struct {
+	from      time.Time
+	to        time.Time
+	keepFrom  time.Time
+	keepUntil time.Time
+}
+
+// splitTimeRange splits rounded time range to parts aligned to buckets of $timeSeries macros, replace shall be called before,
+// each part except the first one also fetches previous bucket, so runningDifference in $rate, $perSecond, $delta
+// and $increase macros calculates the first row of part the same way as for whole range, this row is dropped after that
+func splitTimeRange(q *EvalQuery, from, to time.Time) ([]queryPart, bool, error) {
+	if q.SplitInterval == "" || !splitQueryFilterRE.MatchString(q.template) || splitQueryUnsafeRE.MatchString(q.template) ||
+		fromMacroRegexp.MatchString(q.template) || toMacroRegexp.MatchString(q.template) ||
+		fromMsMacroRegexp.MatchString(q.template) || toMsMacroRegexp.MatchString(q.template) {
+		return nil, false, nil
+	}
+	splitInterval, err := time.ParseDuration(q.SplitInterval)
+	if err != nil {
+		return nil, false, err
+	}
+	stepMs, isBucketed := q.timeSeriesStepMs(q.template, q.convertTimestamp(from), q.convertTimestamp(to))
+	if !isBucketed || splitInterval <= 0 {
+		return nil, false, nil
+	}
+	step := time.Duration(stepMs) * time.Millisecond
+	duration := to.Sub(from)
+	if duration/splitInterval >= maxQueryParts {
+		splitInterval = duration / (maxQueryParts - 1)
+	}
+	// part boundaries shall not split buckets
+	splitInterval = (splitInterval + step - 1) / step * step
+
+	var parts []queryPart
+	partFrom := from
+	for {
+		partTo := time.UnixMilli((partFrom.Add(splitInterval).UnixMilli() + stepMs - 1) / stepMs * stepMs)
+		part := queryPart{from: partFrom, to: partTo, keepFrom: partFrom, keepUntil: partTo}
+		if len(parts) == 0 {
+			part.keepFrom = time.Time{}
+		} else {
+			part.from = partFrom.Add(-step)
+		}
+		if !partTo.Before(to) {
+			part.to = to
+			part.keepUntil = time.Time{}
+			parts = append(parts, part)
+			break
+		}
+		parts = append(parts, part)
+		partFrom = partTo
+	}
+	return parts, len(parts) > 1, nil
+}
+
+// concatTimeSeriesFrames joins frames of time range parts in time order, the same time series is identified by frameKey
+func concatTimeSeriesFrames(parts []queryPart, partFrames []data.Frames) (data.Frames, bool) {
+	var concatenated data.Frames
+	framesByKey := map[string]*data.Frame{}
+	for i, frames := range partFrames {
+		for _, frame := range frames {
+			if _, hasTime := timeFieldIdx(frame); !hasTime {
+				return nil, false
+			}
+			key := frameKey(frame)
+			concatenatedFrame, exists := framesByKey[key]
+			if !exists {
+				concatenatedFrame = emptyFrameLike(frame)
+				concatenatedFrame.Meta = frame.Meta
+				framesByKey[key] = concatenatedFrame
+				concatenated = append(concatenated, concatenatedFrame)
+			}
+			appendFrameRows(concatenatedFrame, frame, parts[i].keepFrom, parts[i].keepUntil)
+		}
+	}
+	// time series which have rows only in dropped boundary buckets
+	result := make(data.Frames, 0, len(concatenated))
+	for _, frame := range concatenated {
+		if frame.Rows() > 0 {
+			result = append(result, frame)
+		}
+	}
+	if len(result) == 0 && len(concatenated) > 0 {
+		return concatenated[:1], true
+	}
+	return result, true
+}
@@ -0,0 +1,77 @@
+package main
+
+import (
+	"testing"
+	"time"
+
+	"github.com/grafana/grafana-plugin-sdk-go/data"
+	"github.com/stretchr/testify/require"
+)
+
+func TestSplitTimeRange(t *testing.T) {
+	r := require.New(t)
+	from := time.Date(2024, 1, 1, 0, 0, 0, 0, time.UTC)
+	to := from.Add(60 * time.Hour)
+	newQuery := func(query, splitInterval string) *EvalQuery {
+		q := &EvalQuery{Query: query, Table: "requests", DateTimeCol: "EventTime", Interval: "1h", SplitInterval: splitInterval, From: from, To: to}
+		_, err := q.ApplyMacrosAndTimeRangeToQuery()
+		r.NoError(err)
+		return q
+	}
+
+	for _, query := range []string{
+		"SELECT $timeSeries AS t, count() FROM $table WHERE $timeFilter GROUP BY t ORDER BY t",
+		"$rate(count() AS c) FROM $table WHERE $timeFilter",
+	} {
+		parts, isSplit, err := splitTimeRange(newQuery(query, "24h"), from, to)
+		r.NoError(err)
+		r.True(isSplit, query)
+		r.Equal([]queryPart{
+			{from: from, to: from.Add(24 * time.Hour), keepUntil: from.Add(24 * time.Hour)},
+			{from: from.Add(23 * time.Hour), to: from.Add(48 * time.Hour), keepFrom: from.Add(24 * time.Hour), keepUntil: from.Add(48 * time.Hour)},
+			{from: from.Add(47 * time.Hour), to: to, keepFrom: from.Add(48 * time.Hour)},
+		}, parts, query)
+	}
+
+	parts, isSplit, err := splitTimeRange(newQuery("SELECT $timeSeries AS t, count() FROM $table WHERE $timeFilter GROUP BY t ORDER BY t", "1m"), from, to)
+	r.NoError(err)
+	r.True(isSplit)
+	r.LessOrEqual(len(parts), maxQueryParts+1, "split interval shall be increased for long time range")
+
+	for _, query := range []string{
+		"SELECT $timeSeries AS t, count() FROM $table WHERE $timeFilter GROUP BY t ORDER BY t LIMIT 10",
+		"SELECT $timeSeries AS t, count() FROM $table WHERE EventTime BETWEEN $from AND $to GROUP BY t",
+		"SELECT EventTime AS t, value FROM $table WHERE $timeFilter",
+	} {
+		_, isSplit, err = splitTimeRange(newQuery(query, "24h"), from, to)
+		r.NoError(err)
+		r.False(isSplit, query)
+	}
+	_, isSplit, err = splitTimeRange(newQuery("SELECT $timeSeries AS t, count() FROM $table WHERE $timeFilter GROUP BY t", ""), from, to)
+	r.NoError(err)
+	r.False(isSplit, "split shall be enabled explicitly")
+}
+
+func TestConcatTimeSeriesFrames(t *testing.T) {
+	r := require.New(t)
+	hour := func(h int) time.Time {
+		return time.Date(2024, 1, 1, h, 0, 0, 0, time.UTC)
+	}
+	newSeries := func(name string, hours []int, values []float64) *data.Frame {
+		times := make([]time.Time, len(hours))
+		for i, h := range hours {
+			times[i] = hour(h)
+		}
+		return data.NewFrame(name, data.NewField("t", nil, times), data.NewField(name, nil, values))
+	}
+	parts := []queryPart{
+		{from: hour(0), to: hour(2), keepUntil: hour(2)},
+		{from: hour(1), to: hour(4), keepFrom: hour(2)},
+	}
+	frames, isJoined := concatTimeSeriesFrames(parts, []data.Frames{
+		{newSeries("a", []int{0, 1, 2}, []float64{1, 2, 0})},
+		{newSeries("b", []int{1}, []float64{7}), newSeries("a", []int{1, 2, 3}, []float64{0, 3, 4})},
+	})
+	r.True(isJoined)
+	r.Equal(data.Frames{newSeries("a", []int{0, 1, 2, 3}, []float64{1, 2, 3, 4})}, frames, "boundary rows of the previous bucket shall be dropped")
+}
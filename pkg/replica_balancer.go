@@ -0,0 +1,180 @@
+package main
+
+import (
+	"context"
+	"fmt"
+	"regexp"
+	"strings"
+	"sync"
+	"time"
+
+	"github.com/grafana/grafana-plugin-sdk-go/backend"
+)
+
+// replicaLatencyDecay weight of previous latency in exponentially weighted moving average
+const replicaLatencyDecay = 0.7
+
+// replicaBalancer spreads queries of one datasource over ClickHouse replicas,
+// replica with the lowest (outstanding requests + 1) * latency EWMA is picked, failed replicas are skipped
+// until background health check with DefaultQuery succeeds
+type replicaBalancer struct {
+	mu       sync.Mutex
+	replicas []*replica
+	interval time.Duration
+	check    func(ctx context.Context, replicaUrl string) error
+	stopCh   chan struct{}
+	stopOnce sync.Once
+}
+
+type replica struct {
+	url         string
+	outstanding int
+	latency     time.Duration
+	healthy     bool
+}
+
+type replicaStats struct {
+	URL         string  `json:"url"`
+	Healthy     bool    `json:"healthy"`
+	Outstanding int     `json:"outstanding"`
+	LatencyMs   float64 `json:"latencyMs"`
+}
+
+func newReplicaBalancer(urls []string, interval time.Duration, check func(ctx context.Context, replicaUrl string) error) *replicaBalancer {
+	b := &replicaBalancer{interval: interval, check: check, stopCh: make(chan struct{})}
+	for _, replicaUrl := range urls {
+		b.replicas = append(b.replicas, &replica{url: replicaUrl, healthy: true})
+	}
+	return b
+}
+
+// pick returns replica for next request excluding already tried ones, nil means datasource URL shall be used
+func (b *replicaBalancer) pick(tried []*replica) *replica {
+	if b == nil {
+		return nil
+	}
+	b.mu.Lock()
+	defer b.mu.Unlock()
+	var picked *replica
+	var pickedScore time.Duration
+	for _, r := range b.replicas {
+		isTried := false
+		for _, t := range tried {
+			isTried = isTried || t == r
+		}
+		if isTried {
+			continue
+		}
+		score := time.Duration(r.outstanding+1) * (r.latency + time.Millisecond)
+		// unhealthy replica is used only when all other replicas are unhealthy too
+		if picked == nil || (r.healthy && !picked.healthy) || (r.healthy == picked.healthy && score < pickedScore) {
+			picked, pickedScore = r, score
+		}
+	}
+	if picked != nil {
+		picked.outstanding++
+	}
+	return picked
+}
+
+// release finishes request to replica, latency of successful requests updates EWMA, failed replica is marked unhealthy
+func (b *replicaBalancer) release(r *replica, latency time.Duration, failed bool) {
+	if b == nil || r == nil {
+		return
+	}
+	b.mu.Lock()
+	defer b.mu.Unlock()
+	r.outstanding--
+	if failed {
+		r.healthy = false
+		return
+	}
+	if r.latency == 0 {
+		r.latency = latency
+	} else {
+		r.latency = time.Duration(replicaLatencyDecay*float64(r.latency) + (1-replicaLatencyDecay)*float64(latency))
+	}
+}
+
+func (b *replicaBalancer) len() int {
+	if b == nil {
+		return 0
+	}
+	return len(b.replicas)
+}
+
+// run checks health of all replicas each interval until stop is called
+func (b *replicaBalancer) run() {
+	ticker := time.NewTicker(b.interval)
+	defer ticker.Stop()
+	for {
+		select {
+		case <-b.stopCh:
+			return
+		case <-ticker.C:
+			b.checkReplicas()
+		}
+	}
+}
+
+func (b *replicaBalancer) checkReplicas() {
+	ctx, cancel := context.WithTimeout(context.Background(), b.interval)
+	defer cancel()
+	var wg sync.WaitGroup
+	for _, r := range b.replicas {
+		wg.Add(1)
+		go func() {
+			defer wg.Done()
+			err := b.check(ctx, r.url)
+			b.mu.Lock()
+			defer b.mu.Unlock()
+			if err != nil && r.healthy {
+				backend.Logger.Warn(fmt.Sprintf("clickhouse replica %s is unhealthy: %v", r.url, err))
+			}
+			r.healthy = err == nil
+		}()
+	}
+	wg.Wait()
+}
+
+func (b *replicaBalancer) stop() {
+	if b == nil {
+		return
+	}
+	b.stopOnce.Do(func() {
+		close(b.stopCh)
+	})
+}
+
+func (b *replicaBalancer) stats() []replicaStats {
+	if b == nil {
+		return nil
+	}
+	b.mu.Lock()
+	defer b.mu.Unlock()
+	stats := make([]replicaStats, len(b.replicas))
+	for i, r := range b.replicas {
+		stats[i] = replicaStats{
+			URL:         r.url,
+			Healthy:     r.healthy,
+			Outstanding: r.outstanding,
+			LatencyMs:   float64(r.latency) / float64(time.Millisecond),
+		}
+	}
+	return stats
+}
+
+var leadingCommentsRE = regexp.MustCompile(`^(\s+|--[^\n]*\n|/\*(?s:.*?)\*/)*`)
+
+var idempotentQueryPrefixes = []string{"SELECT", "WITH", "SHOW", "DESC", "EXISTS", "EXPLAIN"}
+
+// isIdempotentQuery true when query can be safely retried on other replica
+func isIdempotentQuery(query string) bool {
+	query = strings.ToUpper(leadingCommentsRE.ReplaceAllString(query, ""))
+	for _, prefix := range idempotentQueryPrefixes {
+		if strings.HasPrefix(query, prefix) {
+			return true
+		}
+	}
+	return false
+}
@@ -0,0 +1,116 @@
+package main
+
+import (
+	"context"
+	"errors"
+	"net/http"
+	"net/http/httptest"
+	"sync/atomic"
+	"testing"
+	"time"
+
+	"github.com/grafana/grafana-plugin-sdk-go/backend"
+	"github.com/stretchr/testify/require"
+)
+
+func TestReplicaBalancerPick(t *testing.T) {
+	r := require.New(t)
+	b := newReplicaBalancer([]string{"http://a", "http://b", "http://c"}, time.Second, nil)
+
+	// not measured replicas are picked by outstanding requests
+	a := b.pick(nil)
+	r.Equal("http://a", a.url)
+	bReplica := b.pick(nil)
+	r.Equal("http://b", bReplica.url)
+	c := b.pick(nil)
+	r.Equal("http://c", c.url)
+
+	b.release(a, 100*time.Millisecond, false)
+	b.release(bReplica, 10*time.Millisecond, false)
+	b.release(c, 0, true)
+
+	// c is unhealthy, b is faster
+	r.Equal("http://b", b.pick(nil).url)
+	r.Equal("http://b", b.pick(nil).url)
+	// b with 2 outstanding requests still has lower score than a
+	r.Equal("http://b", b.pick(nil).url)
+	r.Equal("http://a", b.pick([]*replica{bReplica}).url)
+	r.Equal("http://c", b.pick([]*replica{a, bReplica}).url)
+	r.Nil(b.pick([]*replica{a, bReplica, c}))
+
+	var nilBalancer *replicaBalancer
+	r.Nil(nilBalancer.pick(nil))
+	r.Equal(0, nilBalancer.len())
+}
+
+func TestReplicaBalancerHealthCheck(t *testing.T) {
+	r := require.New(t)
+	var isDown atomic.Bool
+	isDown.Store(true)
+	b := newReplicaBalancer([]string{"http://a", "http://b"}, time.Second, func(ctx context.Context, replicaUrl string) error {
+		if replicaUrl == "http://a" && isDown.Load() {
+			return errors.New("connection refused")
+		}
+		return nil
+	})
+	b.checkReplicas()
+	r.Equal([]replicaStats{{URL: "http://a"}, {URL: "http://b", Healthy: true}}, b.stats())
+
+	isDown.Store(false)
+	b.checkReplicas()
+	r.True(b.stats()[0].Healthy)
+}
+
+func newTestReplica(t *testing.T, status int, requests *atomic.Int32) *httptest.Server {
+	server := httptest.NewServer(http.HandlerFunc(func(w http.ResponseWriter, req *http.Request) {
+		requests.Add(1)
+		w.WriteHeader(status)
+		if status == http.StatusOK {
+			_, _ = w.Write([]byte(`{"meta":[{"name":"1","type":"UInt8"}],"data":[{"1":1}],"rows":1}`))
+		}
+	}))
+	t.Cleanup(server.Close)
+	return server
+}
+
+func TestQueryRetriedOnOtherReplica(t *testing.T) {
+	r := require.New(t)
+	var downRequests, upRequests atomic.Int32
+	down := newTestReplica(t, http.StatusServiceUnavailable, &downRequests)
+	up := newTestReplica(t, http.StatusOK, &upRequests)
+	settings := &DatasourceSettings{
+		Instance:   backend.DataSourceInstanceSettings{URL: down.URL},
+		httpClient: up.Client(),
+	}
+	settings.replicas = newReplicaBalancer([]string{down.URL, up.URL}, time.Second, nil)
+	client := &ClickHouseClient{settings: settings}
+
+	response, err := client.Query(context.Background(), DefaultQuery)
+	r.NoError(err)
+	r.Len(response.Data, 1)
+	r.Equal(int32(1), downRequests.Load())
+	r.Equal(int32(1), upRequests.Load())
+	r.False(settings.replicas.stats()[0].Healthy)
+
+	// unhealthy replica is skipped
+	_, err = client.Query(context.Background(), DefaultQuery)
+	r.NoError(err)
+	r.Equal(int32(1), downRequests.Load())
+	r.Equal(int32(2), upRequests.Load())
+
+	// not idempotent query is not retried
+	settings.replicas = newReplicaBalancer([]string{down.URL, up.URL}, time.Second, nil)
+	_, err = client.Query(context.Background(), "INSERT INTO t VALUES (1)")
+	r.Error(err)
+	r.Equal(int32(2), downRequests.Load())
+	r.Equal(int32(2), upRequests.Load())
+}
+
+func TestIsIdempotentQuery(t *testing.T) {
+	r := require.New(t)
+	r.True(isIdempotentQuery("SELECT 1"))
+	r.True(isIdempotentQuery("/* grafana dashboard=1 */ with x AS (SELECT 1) SELECT * FROM x"))
+	r.True(isIdempotentQuery("-- comment\n  SHOW TABLES"))
+	r.False(isIdempotentQuery("INSERT INTO t SELECT 1"))
+	r.False(isIdempotentQuery("KILL QUERY WHERE query_id = '1'"))
+}
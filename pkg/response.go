@@ -19,7 +19,89 @@ type FieldMeta struct {
 type Response struct {
 	Meta []*FieldMeta             `json:"meta"`
 	Data []map[string]interface{} `json:"data"`
+	Rows int                      `json:"rows"`
 	ctx  context.Context
+	// columns contains already parsed typed values in Meta order, filled by streaming decoders instead of Data
+	columns []*data.Field
+	// rawColumns contains raw values for Array(Tuple(...)) fields, filled by streaming decoders
+	rawColumns map[int][]interface{}
+	// progress of query on ClickHouse server, nil when server didn't send progress headers
+	progress *queryProgress
+}
+
+func (r *Response) rowsCount() int {
+	if len(r.columns) == 0 {
+		return 0
+	}
+	return r.columns[0].Len()
+}
+
+// initColumns creates empty typed vectors in Meta order for decoders which append already parsed values
+func (r *Response) initColumns() {
+	r.columns = make([]*data.Field, len(r.Meta))
+	for i, meta := range r.Meta {
+		r.columns[i] = NewDataFieldByType(meta.Name, meta.Type)
+	}
+	r.initRawColumns(0)
+}
+
+// initRawColumns keeps raw values for Array(Tuple(label, value)) fields produced by $columns macros, they split to multiple time series
+func (r *Response) initRawColumns(rows int) {
+	for i, meta := range r.Meta {
+		if seriesFromMacrosRE.MatchString(meta.Type) {
+			if r.rawColumns == nil {
+				r.rawColumns = map[int][]interface{}{}
+			}
+			r.rawColumns[i] = make([]interface{}, 0, rows)
+		}
+	}
+}
+
+// newColumnBuilders resolves typed builder for each field in Meta order, rows is used to pre-allocate vectors
+func (r *Response) newColumnBuilders(fetchTZ FetchTZFunc, rows int) []columnBuilder {
+	timeZonesMap, _ := r.analyzeResponseMeta(fetchTZ)
+	builders := make([]columnBuilder, len(r.Meta))
+	for i, meta := range r.Meta {
+		builders[i] = newColumnBuilder(meta.Name, meta.Type, timeZonesMap[meta.Name], rows)
+	}
+	r.initRawColumns(rows)
+	return builders
+}
+
+func (r *Response) finishColumns(builders []columnBuilder) {
+	r.columns = make([]*data.Field, len(builders))
+	for i, builder := range builders {
+		r.columns[i] = builder.field()
+	}
+}
+
+// buildColumns converts rows decoded from FORMAT JSON to typed columns, Data is released after that
+func (r *Response) buildColumns(fetchTZ FetchTZFunc) {
+	if r.columns != nil {
+		return
+	}
+	builders := r.newColumnBuilders(fetchTZ, len(r.Data))
+	for _, row := range r.Data {
+		for i, meta := range r.Meta {
+			value := row[meta.Name]
+			builders[i].append(value)
+			if raw, isRaw := r.rawColumns[i]; isRaw {
+				r.rawColumns[i] = append(raw, value)
+			}
+		}
+	}
+	r.finishColumns(builders)
+	r.Data = nil
+}
+
+// valueAt returns parsed value of field fieldIdx in row rowIdx
+func (r *Response) valueAt(rowIdx, fieldIdx int) Value {
+	return r.columns[fieldIdx].At(rowIdx)
+}
+
+// rawValueAt returns value of field fieldIdx in row rowIdx as it was decoded from JSON
+func (r *Response) rawValueAt(rowIdx, fieldIdx int) interface{} {
+	return r.rawColumns[fieldIdx][rowIdx]
 }
 
 var complexTypeRE = regexp.MustCompile("Array|Tuple|Map")
@@ -27,6 +109,7 @@ var labelTypeRE = regexp.MustCompile("String|UUID|Enum|IPv4|IPv6")
 var seriesFromMacrosRE = regexp.MustCompile(`Array\(Tuple\(([^,]+), ([^)]+)\)\)`)
 
 func (r *Response) toFrames(query *Query, fetchTZ FetchTZFunc) (data.Frames, error) {
+	r.buildColumns(fetchTZ)
 
 	labelFieldsMap, hasLabelFields := r.prepareLabelFieldsMap()
 	timeStampFieldIdx, hasTimeStamp := r.getTimestampFieldIdx()
@@ -34,7 +117,7 @@ func (r *Response) toFrames(query *Query, fetchTZ FetchTZFunc) (data.Frames, err
 	if hasTimeStamp {
 		return r.toFramesWithTimeStamp(query, fetchTZ, hasLabelFields, labelFieldsMap, timeStampFieldIdx)
 	} else {
-		return r.toFramesTable(query, fetchTZ)
+		return r.toFramesTable(query)
 	}
 
 }
@@ -64,179 +147,237 @@ func (r *Response) getTimestampFieldIdx() (int, bool) {
 
 }
 
-func (r *Response) toFramesWithTimeStamp(query *Query, fetchTZ FetchTZFunc, hasLabelFields bool, labelFieldsMap map[string]int, timeStampFieldIdx int) (data.Frames, error) {
-	frames := data.Frames{}
-	framesMap := map[string]*data.Frame{}
+// timeSeriesFrames collects frames of time series in order of appearance
+type timeSeriesFrames struct {
+	query              *Query
+	timestampFieldName string
+	frames             data.Frames
+	framesMap          map[string]*data.Frame
+}
+
+func (s *timeSeriesFrames) addFrame(frame *data.Frame) {
+	frame.RefID = s.query.RefId
+	s.frames = append(s.frames, frame)
+}
+
+// newFrame creates frame with empty timestamp and value fields, labels are assigned once per series
+func (s *timeSeriesFrames) newFrame(frameName string, fieldType string, labels data.Labels) *data.Frame {
+	valueField := NewDataFieldByType(frameName, fieldType)
+	valueField.Labels = labels
+	frame := data.NewFrame(frameName, data.NewField(s.timestampFieldName, nil, []time.Time{}), valueField)
+	s.addFrame(frame)
+	return frame
+}
 
+func (s *timeSeriesFrames) addPoint(frameName string, fieldType string, timestampValue time.Time, fieldValue Value) {
+	frame, frameExists := s.framesMap[frameName]
+	if !frameExists {
+		frame = s.newFrame(frameName, fieldType, nil)
+		s.framesMap[frameName] = frame
+	}
+	frame.Fields[0].Append(timestampValue)
+	frame.Fields[1].Append(fieldValue)
+}
+
+func (r *Response) toFramesWithTimeStamp(query *Query, fetchTZ FetchTZFunc, hasLabelFields bool, labelFieldsMap map[string]int, timeStampFieldIdx int) (data.Frames, error) {
 	timestampFieldName := r.Meta[timeStampFieldIdx].Name
-	timestampFieldType := r.Meta[timeStampFieldIdx].Type
+	timestampField := r.columns[timeStampFieldIdx]
+	if timestampField.Type() != data.FieldTypeTime {
+		return nil, fmt.Errorf("Unexpected type of field %s. Expected time.Time, got %s ", timestampFieldName, timestampField.Type().ItemTypeString())
+	}
+	series := &timeSeriesFrames{query: query, timestampFieldName: timestampFieldName, frames: data.Frames{}, framesMap: map[string]*data.Frame{}}
 
-	timeZonesMap, metaTypes := r.analyzeResponseMeta(fetchTZ)
+	timeZonesMap, _ := r.analyzeResponseMeta(fetchTZ)
 	// 1 value field + 1 timestamp field
 	hasMultipleTimeSeries := (len(r.Meta) - len(labelFieldsMap)) > 2
 
-	// frameName -> timeStampDataField
-	timeStampDataFieldMap := map[string]*data.Field{}
-	// frameName -> valueDataFieldMap
-	valueDataFieldMap := map[string]*data.Field{}
+	valueFieldsIdx := make([]int, 0, len(r.Meta))
+	macrosFieldsIdx := make([]int, 0)
+	for fieldIdx, meta := range r.Meta {
+		if _, isLabel := labelFieldsMap[meta.Name]; fieldIdx == timeStampFieldIdx || (hasLabelFields && isLabel) {
+			continue
+		}
+		if !hasLabelFields && seriesFromMacrosRE.MatchString(meta.Type) {
+			macrosFieldsIdx = append(macrosFieldsIdx, fieldIdx)
+			continue
+		}
+		valueFieldsIdx = append(valueFieldsIdx, fieldIdx)
+	}
 
-	for _, row := range r.Data {
-		value := ParseValue(timestampFieldName, timestampFieldType, timeZonesMap[timestampFieldName], row[timestampFieldName], false)
-		timestampValue, ok := value.(time.Time)
-		if !ok {
-			return nil, fmt.Errorf("Unexpected type from ParseValue of field %s. Expected time.Time, got %T ", timestampFieldName, value)
+	if !hasLabelFields {
+		// each value column is a time series as is, all frames share read-only timestamp column
+		for _, fieldIdx := range valueFieldsIdx {
+			series.addFrame(data.NewFrame(r.Meta[fieldIdx].Name, timestampField, r.columns[fieldIdx]))
+		}
+		if len(macrosFieldsIdx) == 0 {
+			return series.frames, nil
 		}
+	}
 
-		if hasLabelFields {
-			framePrefix := r.generateFrameNameByLabels(row, metaTypes, labelFieldsMap)
-			frameLabels := r.generateFrameLabelsByLabels(row, metaTypes, labelFieldsMap)
+	labelIndex := r.newLabelSeriesIndex(labelFieldsMap, len(valueFieldsIdx))
+	rowsCount := r.rowsCount()
+	for rowIdx := 0; rowIdx < rowsCount; rowIdx++ {
+		timestampValue := timestampField.At(rowIdx).(time.Time)
 
-			for fieldName, fieldValue := range row {
-				_, isLabel := labelFieldsMap[fieldName]
-				if fieldName != timestampFieldName && !isLabel {
-					frameName := framePrefix
+		if hasLabelFields {
+			rowSeries := labelIndex.seriesAt(rowIdx)
+			for slot, fieldIdx := range valueFieldsIdx {
+				frame := rowSeries.frames[slot]
+				if frame == nil {
+					meta := r.Meta[fieldIdx]
+					frameName := rowSeries.name
 					if hasMultipleTimeSeries {
-						frameName += ", " + fieldName
+						frameName += ", " + meta.Name
 					}
-					r.createFrameIfNotExistsAndAddPoint(query, framesMap, frameName, timeStampDataFieldMap, timestampFieldName, valueDataFieldMap, fieldName, metaTypes[fieldName], timestampValue, timeZonesMap, fieldValue)
-					valueDataFieldMap[frameName].Labels = frameLabels
+					frame = series.newFrame(frameName, meta.Type, rowSeries.labels)
+					rowSeries.frames[slot] = frame
 				}
+				frame.Fields[0].Append(timestampValue)
+				frame.Fields[1].Append(r.valueAt(rowIdx, fieldIdx))
 			}
-		} else {
-			for fieldName, fieldValue := range row {
-				if fieldName != timestampFieldName {
-					if seriesFromMacrosRE.MatchString(metaTypes[fieldName]) {
-						for _, match := range seriesFromMacrosRE.FindAllStringSubmatch(metaTypes[fieldName], -1) {
-							labelType := match[1]
-							valueType := match[2]
-
-							switch arrays := fieldValue.(type) {
-							case []interface{}:
-								for _, array := range arrays {
-									switch tuple := array.(type) {
-									case []interface{}:
-										tsName := ParseValue(fieldName, labelType, timeZonesMap[fieldName], tuple[0], true)
-										tsNameString := "null"
-										switch tsName.(type) {
-										case *string:
-											if tsName.(*string) != nil {
-												tsNameString = *tsName.(*string)
-											} else {
-												tsNameString = "null"
-											}
-										case string:
-											tsNameString = tsName.(string)
-											if tsNameString == "" {
-												tsNameString = "null"
-											}
-										}
-										r.createFrameIfNotExistsAndAddPoint(
-											query, framesMap, tsNameString, timeStampDataFieldMap, timestampFieldName, valueDataFieldMap,
-											fieldName, valueType, timestampValue, timeZonesMap, tuple[1],
-										)
-
-									default:
-										return nil, fmt.Errorf("unable to parse data section type=%T in response json: %s", tuple, tuple)
-									}
+			continue
+		}
+
+		for _, fieldIdx := range macrosFieldsIdx {
+			fieldName := r.Meta[fieldIdx].Name
+			fieldType := r.Meta[fieldIdx].Type
+			fieldValue := r.rawValueAt(rowIdx, fieldIdx)
+			for _, match := range seriesFromMacrosRE.FindAllStringSubmatch(fieldType, -1) {
+				labelType := match[1]
+				valueType := match[2]
+
+				switch arrays := fieldValue.(type) {
+				case []interface{}:
+					for _, array := range arrays {
+						switch tuple := array.(type) {
+						case []interface{}:
+							tsName := ParseValue(fieldName, labelType, timeZonesMap[fieldName], tuple[0], true)
+							tsNameString := "null"
+							switch tsName.(type) {
+							case *string:
+								if tsName.(*string) != nil {
+									tsNameString = *tsName.(*string)
+								} else {
+									tsNameString = "null"
+								}
+							case string:
+								tsNameString = tsName.(string)
+								if tsNameString == "" {
+									tsNameString = "null"
 								}
-							default:
-								return nil, fmt.Errorf("unable to parse data section name=%s type=%T in response json: %s", fieldName, fieldValue, fieldValue)
 							}
+							series.addPoint(
+								tsNameString, valueType, timestampValue,
+								ParseValue(fieldName, valueType, timeZonesMap[fieldName], tuple[1], false),
+							)
 
+						default:
+							return nil, fmt.Errorf("unable to parse data section type=%T in response json: %s", tuple, tuple)
 						}
-
-					} else {
-						frameName := fieldName
-						r.createFrameIfNotExistsAndAddPoint(query, framesMap, frameName, timeStampDataFieldMap, timestampFieldName, valueDataFieldMap, fieldName, metaTypes[fieldName], timestampValue, timeZonesMap, fieldValue)
 					}
+				default:
+					return nil, fmt.Errorf("unable to parse data section name=%s type=%T in response json: %s", fieldName, fieldValue, fieldValue)
 				}
 			}
 		}
 	}
-	for _, frame := range framesMap {
-		frames = append(frames, frame)
-	}
-	return frames, nil
+	return series.frames, nil
 }
 
 func (r *Response) analyzeResponseMeta(fetchTZ FetchTZFunc) (map[string]*time.Location, map[string]string) {
-	ServerTZ := fetchTZ(r.ctx)
+	var serverTZ *time.Location
 	timeZonesMap := map[string]*time.Location{}
 	metaTypes := map[string]string{}
 
 	for _, meta := range r.Meta {
 		metaTypes[meta.Name] = meta.Type
 		if strings.Contains(meta.Type, "Date") {
-			timeZonesMap[meta.Name] = fetchTimeZoneFromFieldType(meta.Type, ServerTZ)
+			if serverTZ == nil && extractTimeZoneNameFromFieldType(meta.Type) == "" {
+				serverTZ = fetchTZ(r.ctx)
+			}
+			timeZonesMap[meta.Name] = fetchTimeZoneFromFieldType(meta.Type, serverTZ)
 		}
 	}
 	return timeZonesMap, metaTypes
 }
 
-func (r *Response) createFrameIfNotExistsAndAddPoint(query *Query, framesMap map[string]*data.Frame, frameName string, timeStampDataFieldMap map[string]*data.Field, timestampFieldName string, valueDataFieldMap map[string]*data.Field, fieldName string, fieldType string, timestampValue time.Time, timeZonesMap map[string]*time.Location, fieldValue interface{}) {
-	if _, frameExists := framesMap[frameName]; !frameExists {
-		timeStampDataFieldMap[frameName] = data.NewField(timestampFieldName, nil, []time.Time{})
-		valueDataFieldMap[frameName] = NewDataFieldByType(frameName, fieldType)
-		framesMap[frameName] = data.NewFrame(
-			frameName,
-			timeStampDataFieldMap[frameName],
-			valueDataFieldMap[frameName],
-		)
+// labelSeries is a unique combination of label values, frames contains one frame per value field
+type labelSeries struct {
+	name   string
+	labels data.Labels
+	frames []*data.Frame
+}
 
-		framesMap[frameName].RefID = query.RefId
-	}
-	timeStampDataFieldMap[frameName].Append(timestampValue)
-	valueDataFieldMap[frameName].Append(ParseValue(fieldName, fieldType, timeZonesMap[fieldName], fieldValue, false))
+// labelSeriesIndex interns label values of each row to labelSeries, label columns are resolved once per response
+type labelSeriesIndex struct {
+	labelNames   []string
+	labelColumns []*data.Field
+	valuesCount  int
+	series       map[string]*labelSeries
+	key          []byte
+	values       []string
 }
 
-func (r *Response) generateFrameNameByLabels(row map[string]interface{}, metaTypes map[string]string, labelFieldsMap map[string]int) string {
-	frameName := ""
-	srow := make([]string, 0, len(row))
-	for k := range row {
-		srow = append(srow, k)
+func (r *Response) newLabelSeriesIndex(labelFieldsMap map[string]int, valuesCount int) *labelSeriesIndex {
+	labelNames := make([]string, 0, len(labelFieldsMap))
+	for fieldName := range labelFieldsMap {
+		labelNames = append(labelNames, fieldName)
 	}
-	sort.Strings(srow)
-	for _, fieldName := range srow {
-		if _, isLabel := labelFieldsMap[fieldName]; isLabel {
-			fieldType := metaTypes[fieldName]
-			frameName += fmt.Sprintf("%v", ParseValue(fieldName, fieldType, nil, row[fieldName], false)) + ", "
-		}
+	sort.Strings(labelNames)
+	labelColumns := make([]*data.Field, len(labelNames))
+	for i, fieldName := range labelNames {
+		labelColumns[i] = r.columns[labelFieldsMap[fieldName]]
 	}
-	if frameName != "" {
-		frameName = frameName[0 : len(frameName)-2]
+	return &labelSeriesIndex{
+		labelNames:   labelNames,
+		labelColumns: labelColumns,
+		valuesCount:  valuesCount,
+		series:       map[string]*labelSeries{},
+		values:       make([]string, len(labelNames)),
 	}
-	return frameName
 }
 
-func (r *Response) generateFrameLabelsByLabels(row map[string]interface{}, metaTypes map[string]string, labelFieldsMap map[string]int) map[string]string {
-	labels := map[string]string{}
-	for fieldName, fieldValue := range row {
-		if _, isLabel := labelFieldsMap[fieldName]; isLabel {
-			fieldType := metaTypes[fieldName]
-			labels[fieldName] = fmt.Sprintf("%v", ParseValue(fieldName, fieldType, nil, fieldValue, false))
-		}
+// seriesAt returns series of row, name and labels are formatted only when combination of label values is met first time
+func (idx *labelSeriesIndex) seriesAt(rowIdx int) *labelSeries {
+	idx.key = idx.key[:0]
+	for i, column := range idx.labelColumns {
+		idx.values[i] = labelValueAt(column, rowIdx)
+		idx.key = append(idx.key, idx.values[i]...)
+		idx.key = append(idx.key, 0)
 	}
-
-	return labels
+	if s, exists := idx.series[string(idx.key)]; exists {
+		return s
+	}
+	s := &labelSeries{
+		name:   strings.Join(idx.values, ", "),
+		labels: make(data.Labels, len(idx.labelNames)),
+		frames: make([]*data.Frame, idx.valuesCount),
+	}
+	for i, labelName := range idx.labelNames {
+		s.labels[labelName] = idx.values[i]
+	}
+	idx.series[string(idx.key)] = s
+	return s
 }
 
-func (r *Response) toFramesTable(query *Query, fetchTZ FetchTZFunc) (data.Frames, error) {
-	timeZonesMap, metaTypes := r.analyzeResponseMeta(fetchTZ)
-	framesMap := map[string]*data.Frame{}
-	frames := data.Frames{}
-	for _, field := range r.Meta {
-		framesMap[field.Name] = data.NewFrame(field.Name, NewDataFieldByType(field.Name, field.Type))
-		framesMap[field.Name].RefID = query.RefId
-	}
-	for _, row := range r.Data {
-		for fieldName, fieldValue := range row {
-			framesMap[fieldName].Fields[0].Append(ParseValue(
-				fieldName, metaTypes[fieldName], timeZonesMap[fieldName], fieldValue, false,
-			))
+// labelValueAt formats label value, NULL is formatted as null the same way as series name from $columns macros
+func labelValueAt(field *data.Field, rowIdx int) string {
+	switch v := field.At(rowIdx).(type) {
+	case string:
+		return v
+	case *string:
+		if v == nil {
+			return "null"
 		}
+		return *v
+	default:
+		return fmt.Sprintf("%v", v)
 	}
-	for _, frame := range framesMap {
-		frames = append(frames, frame)
-	}
-	return frames, nil
+}
+
+// toFramesTable returns one frame with field per column in Meta order
+func (r *Response) toFramesTable(query *Query) (data.Frames, error) {
+	frame := data.NewFrame(query.RefId, r.columns...)
+	frame.RefID = query.RefId
+	return data.Frames{frame}, nil
 }
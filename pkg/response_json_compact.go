@@ -0,0 +1,98 @@
+package main
+
+import (
+	"context"
+	"encoding/json"
+	"fmt"
+	"io"
+)
+
+// decodeJSONCompact reads FORMAT JSONCompact response token by token and appends each cell directly
+// to typed data.Field vectors in Meta order, without buffering the whole body and without per-row maps
+func decodeJSONCompact(ctx context.Context, reader io.Reader, fetchTZ FetchTZFunc) (*Response, error) {
+	r := &Response{ctx: ctx}
+	dec := json.NewDecoder(reader)
+
+	if err := expectJSONDelim(dec, '{'); err != nil {
+		return nil, err
+	}
+	for dec.More() {
+		keyToken, err := dec.Token()
+		if err != nil {
+			return nil, err
+		}
+		key, isKey := keyToken.(string)
+		if !isKey {
+			return nil, fmt.Errorf("unexpected token %v, expect object key", keyToken)
+		}
+		switch key {
+		case "meta":
+			if err = dec.Decode(&r.Meta); err != nil {
+				return nil, fmt.Errorf("unable to decode meta section: %w", err)
+			}
+		case "data":
+			if r.Meta == nil {
+				return nil, fmt.Errorf("data section found before meta section")
+			}
+			if err = r.decodeJSONCompactData(dec, fetchTZ); err != nil {
+				return nil, fmt.Errorf("unable to decode data section: %w", err)
+			}
+		case "rows":
+			if err = dec.Decode(&r.Rows); err != nil {
+				return nil, fmt.Errorf("unable to decode rows section: %w", err)
+			}
+		default:
+			var skip json.RawMessage
+			if err = dec.Decode(&skip); err != nil {
+				return nil, fmt.Errorf("unable to decode %s section: %w", key, err)
+			}
+		}
+	}
+	if err := expectJSONDelim(dec, '}'); err != nil {
+		return nil, err
+	}
+	return r, nil
+}
+
+func (r *Response) decodeJSONCompactData(dec *json.Decoder, fetchTZ FetchTZFunc) error {
+	// rows section usually follows data, so rows count is known here only when it is sent first
+	builders := r.newColumnBuilders(fetchTZ, r.Rows)
+
+	if err := expectJSONDelim(dec, '['); err != nil {
+		return err
+	}
+	for dec.More() {
+		if err := expectJSONDelim(dec, '['); err != nil {
+			return err
+		}
+		for i, meta := range r.Meta {
+			var value interface{}
+			if err := dec.Decode(&value); err != nil {
+				return fmt.Errorf("unable to decode field %s: %w", meta.Name, err)
+			}
+			builders[i].append(value)
+			if raw, isRaw := r.rawColumns[i]; isRaw {
+				r.rawColumns[i] = append(raw, value)
+			}
+		}
+		if err := expectJSONDelim(dec, ']'); err != nil {
+			return err
+		}
+	}
+	if err := expectJSONDelim(dec, ']'); err != nil {
+		return err
+	}
+	r.finishColumns(builders)
+	return nil
+}
+
+func expectJSONDelim(dec *json.Decoder, delim json.Delim) error {
+	token, err := dec.Token()
+	if err != nil {
+		return err
+	}
+	if d, isDelim := token.(json.Delim); !isDelim || d != delim {
+		return fmt.Errorf("unexpected token %v, expect %v", token, delim)
+	}
+	return nil
+}
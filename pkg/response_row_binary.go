@@ -0,0 +1,701 @@
+package main
+
+import (
+	"bufio"
+	"context"
+	"encoding/binary"
+	"fmt"
+	"io"
+	"math"
+	"math/big"
+	"net/netip"
+	"strconv"
+	"strings"
+	"time"
+)
+
+const maxRowBinaryStringLen = 1 << 30
+
+// rowBinaryDecodeFunc reads one value from RowBinary stream
+type rowBinaryDecodeFunc func(rb *rowBinaryReader) (interface{}, error)
+
+type rowBinaryReader struct {
+	r   *bufio.Reader
+	buf [32]byte
+}
+
+func (rb *rowBinaryReader) read(n int) ([]byte, error) {
+	var b []byte
+	if n <= len(rb.buf) {
+		b = rb.buf[:n]
+	} else {
+		b = make([]byte, n)
+	}
+	_, err := io.ReadFull(rb.r, b)
+	return b, err
+}
+
+func (rb *rowBinaryReader) uvarint() (uint64, error) {
+	return binary.ReadUvarint(rb.r)
+}
+
+func (rb *rowBinaryReader) uint8() (uint8, error) {
+	return rb.r.ReadByte()
+}
+
+func (rb *rowBinaryReader) uint16() (uint16, error) {
+	b, err := rb.read(2)
+	if err != nil {
+		return 0, err
+	}
+	return binary.LittleEndian.Uint16(b), nil
+}
+
+func (rb *rowBinaryReader) uint32() (uint32, error) {
+	b, err := rb.read(4)
+	if err != nil {
+		return 0, err
+	}
+	return binary.LittleEndian.Uint32(b), nil
+}
+
+func (rb *rowBinaryReader) uint64() (uint64, error) {
+	b, err := rb.read(8)
+	if err != nil {
+		return 0, err
+	}
+	return binary.LittleEndian.Uint64(b), nil
+}
+
+// bigInt reads little-endian two's complement integer with size bytes
+func (rb *rowBinaryReader) bigInt(size int, signed bool) (*big.Int, error) {
+	b, err := rb.read(size)
+	if err != nil {
+		return nil, err
+	}
+	be := make([]byte, size)
+	for i := range b {
+		be[size-1-i] = b[i]
+	}
+	v := new(big.Int).SetBytes(be)
+	if signed && be[0]&0x80 != 0 {
+		v.Sub(v, new(big.Int).Lsh(big.NewInt(1), uint(size*8)))
+	}
+	return v, nil
+}
+
+func (rb *rowBinaryReader) string() (string, error) {
+	n, err := rb.uvarint()
+	if err != nil {
+		return "", err
+	}
+	if n > maxRowBinaryStringLen {
+		return "", fmt.Errorf("string length %d is too big", n)
+	}
+	b := make([]byte, n)
+	if _, err = io.ReadFull(rb.r, b); err != nil {
+		return "", err
+	}
+	return string(b), nil
+}
+
+// decodeRowBinary reads FORMAT RowBinaryWithNamesAndTypes response and appends each value directly
+// to typed data.Field vectors in Meta order, numbers and dates don't require text formatting and ParseValue
+func decodeRowBinary(ctx context.Context, reader io.Reader, fetchTZ FetchTZFunc) (*Response, error) {
+	rb := &rowBinaryReader{r: bufio.NewReaderSize(reader, 64*1024)}
+	columnsCount, err := rb.uvarint()
+	if err != nil {
+		return nil, fmt.Errorf("unable to read columns count: %w", err)
+	}
+	r := &Response{ctx: ctx, Meta: make([]*FieldMeta, columnsCount)}
+	for i := range r.Meta {
+		r.Meta[i] = &FieldMeta{}
+		if r.Meta[i].Name, err = rb.string(); err != nil {
+			return nil, fmt.Errorf("unable to read column name: %w", err)
+		}
+	}
+	for i := range r.Meta {
+		if r.Meta[i].Type, err = rb.string(); err != nil {
+			return nil, fmt.Errorf("unable to read column type: %w", err)
+		}
+	}
+
+	timeZonesMap, _ := r.analyzeResponseMeta(fetchTZ)
+	r.initColumns()
+	decoders := make([]rowBinaryDecodeFunc, len(r.Meta))
+	isTyped := make([]bool, len(r.Meta))
+	for i, meta := range r.Meta {
+		tz := timeZonesMap[meta.Name]
+		if decoders[i], isTyped[i] = newRowBinaryTypedDecoder(meta.Name, meta.Type, tz); !isTyped[i] {
+			if decoders[i], err = newRowBinaryGenericDecoder(meta.Type, tz); err != nil {
+				return nil, fmt.Errorf("unable to decode field %s: %w", meta.Name, err)
+			}
+		}
+	}
+
+	for {
+		// EOF between rows means the end of result
+		if _, err = rb.r.Peek(1); err == io.EOF {
+			break
+		} else if err != nil {
+			return nil, err
+		}
+		for i, meta := range r.Meta {
+			value, err := decoders[i](rb)
+			if err != nil {
+				return nil, fmt.Errorf("unable to decode field %s with type %s: %w", meta.Name, meta.Type, err)
+			}
+			if isTyped[i] {
+				r.columns[i].Append(value)
+				continue
+			}
+			// compound types are converted the same way as JSON values
+			r.columns[i].Append(ParseValue(meta.Name, meta.Type, timeZonesMap[meta.Name], value, false))
+			if raw, isRaw := r.rawColumns[i]; isRaw {
+				r.rawColumns[i] = append(raw, value)
+			}
+		}
+	}
+	r.Rows = r.rowsCount()
+	return r, nil
+}
+
+func typedRowBinaryDecoder[T any](read func(rb *rowBinaryReader) (T, error), isNullable bool) rowBinaryDecodeFunc {
+	if isNullable {
+		return func(rb *rowBinaryReader) (interface{}, error) {
+			isNull, err := rb.uint8()
+			if err != nil {
+				return nil, err
+			}
+			if isNull != 0 {
+				return nil, nil
+			}
+			v, err := read(rb)
+			if err != nil {
+				return nil, err
+			}
+			return &v, nil
+		}
+	}
+	return func(rb *rowBinaryReader) (interface{}, error) {
+		v, err := read(rb)
+		if err != nil {
+			return nil, err
+		}
+		return v, nil
+	}
+}
+
+// newRowBinaryTypedDecoder returns decoder which values can be appended directly to field created by NewDataFieldByType,
+// returns false for compound types which shall be processed by newRowBinaryGenericDecoder
+func newRowBinaryTypedDecoder(fieldName, fieldType string, tz *time.Location) (rowBinaryDecodeFunc, bool) {
+	if strings.HasPrefix(fieldType, "LowCardinality(") {
+		fieldType = strings.TrimSuffix(strings.TrimPrefix(fieldType, "LowCardinality("), ")")
+	}
+	isNullable := strings.HasPrefix(fieldType, "Nullable(")
+	if isNullable {
+		fieldType = strings.TrimSuffix(strings.TrimPrefix(fieldType, "Nullable("), ")")
+	}
+
+	switch fieldType {
+	case "UInt8", "UInt16", "UInt32", "Int8", "Int16", "Int32", "Float32", "Float64":
+		read := rowBinaryNumberReader(fieldType)
+		return typedRowBinaryDecoder(read, isNullable), true
+	case "UInt64", "Int64":
+		isSigned := fieldType == "Int64"
+		// Plugin specific corner case, t contains timestamp in milliseconds, see ParseValue
+		if fieldName == "t" {
+			return typedRowBinaryDecoder(func(rb *rowBinaryReader) (time.Time, error) {
+				v, err := rb.uint64()
+				return time.Unix(0, int64(v)*int64(time.Millisecond)), err
+			}, isNullable), true
+		}
+		if isSigned {
+			return typedRowBinaryDecoder(func(rb *rowBinaryReader) (int64, error) {
+				v, err := rb.uint64()
+				return int64(v), err
+			}, isNullable), true
+		}
+		return typedRowBinaryDecoder(func(rb *rowBinaryReader) (uint64, error) {
+			return rb.uint64()
+		}, isNullable), true
+	case "Bool":
+		return typedRowBinaryDecoder(func(rb *rowBinaryReader) (string, error) {
+			v, err := rb.uint8()
+			return strconv.FormatBool(v != 0), err
+		}, isNullable), true
+	}
+
+	if strings.HasPrefix(fieldType, "Decimal") {
+		read, err := rowBinaryDecimalReader(fieldType)
+		if err != nil {
+			return nil, false
+		}
+		return typedRowBinaryDecoder(read, isNullable), true
+	}
+	if read, ok := rowBinaryStringReader(fieldType); ok {
+		return typedRowBinaryDecoder(read, isNullable), true
+	}
+	if read, ok := rowBinaryTimeReader(fieldType, tz); ok {
+		return typedRowBinaryDecoder(read, isNullable), true
+	}
+	return nil, false
+}
+
+func rowBinaryNumberReader(fieldType string) func(rb *rowBinaryReader) (float64, error) {
+	switch fieldType {
+	case "UInt8":
+		return func(rb *rowBinaryReader) (float64, error) {
+			v, err := rb.uint8()
+			return float64(v), err
+		}
+	case "Int8":
+		return func(rb *rowBinaryReader) (float64, error) {
+			v, err := rb.uint8()
+			return float64(int8(v)), err
+		}
+	case "UInt16":
+		return func(rb *rowBinaryReader) (float64, error) {
+			v, err := rb.uint16()
+			return float64(v), err
+		}
+	case "Int16":
+		return func(rb *rowBinaryReader) (float64, error) {
+			v, err := rb.uint16()
+			return float64(int16(v)), err
+		}
+	case "UInt32":
+		return func(rb *rowBinaryReader) (float64, error) {
+			v, err := rb.uint32()
+			return float64(v), err
+		}
+	case "Int32":
+		return func(rb *rowBinaryReader) (float64, error) {
+			v, err := rb.uint32()
+			return float64(int32(v)), err
+		}
+	case "Float32":
+		return func(rb *rowBinaryReader) (float64, error) {
+			v, err := rb.uint32()
+			return float64(math.Float32frombits(v)), err
+		}
+	default:
+		return func(rb *rowBinaryReader) (float64, error) {
+			v, err := rb.uint64()
+			return math.Float64frombits(v), err
+		}
+	}
+}
+
+func rowBinaryDecimalReader(fieldType string) (func(rb *rowBinaryReader) (float64, error), error) {
+	size, scale, err := parseDecimalType(fieldType)
+	if err != nil {
+		return nil, err
+	}
+	divider := math.Pow10(scale)
+	switch size {
+	case 4:
+		return func(rb *rowBinaryReader) (float64, error) {
+			v, err := rb.uint32()
+			return float64(int32(v)) / divider, err
+		}, nil
+	case 8:
+		return func(rb *rowBinaryReader) (float64, error) {
+			v, err := rb.uint64()
+			return float64(int64(v)) / divider, err
+		}, nil
+	default:
+		bigDivider := new(big.Float).SetInt(new(big.Int).Exp(big.NewInt(10), big.NewInt(int64(scale)), nil))
+		return func(rb *rowBinaryReader) (float64, error) {
+			v, err := rb.bigInt(size, true)
+			if err != nil {
+				return 0, err
+			}
+			f, _ := new(big.Float).Quo(new(big.Float).SetInt(v), bigDivider).Float64()
+			return f, nil
+		}, nil
+	}
+}
+
+// parseDecimalType returns size in bytes and scale for Decimal(P, S), Decimal32(S), Decimal64(S), Decimal128(S), Decimal256(S)
+func parseDecimalType(fieldType string) (int, int, error) {
+	sizes := map[string]int{"Decimal32": 4, "Decimal64": 8, "Decimal128": 16, "Decimal256": 32}
+	prefix := fieldType[:strings.Index(fieldType+"(", "(")]
+	args := rowBinaryTypeArgs(fieldType, prefix)
+	if size, isSized := sizes[prefix]; isSized && len(args) == 1 {
+		scale, err := strconv.Atoi(args[0])
+		return size, scale, err
+	}
+	if prefix != "Decimal" || len(args) != 2 {
+		return 0, 0, fmt.Errorf("unexpected decimal type %s", fieldType)
+	}
+	precision, err := strconv.Atoi(args[0])
+	if err != nil {
+		return 0, 0, err
+	}
+	scale, err := strconv.Atoi(args[1])
+	if err != nil {
+		return 0, 0, err
+	}
+	switch {
+	case precision <= 9:
+		return 4, scale, nil
+	case precision <= 18:
+		return 8, scale, nil
+	case precision <= 38:
+		return 16, scale, nil
+	default:
+		return 32, scale, nil
+	}
+}
+
+func rowBinaryStringReader(fieldType string) (func(rb *rowBinaryReader) (string, error), bool) {
+	switch fieldType {
+	case "String":
+		return (*rowBinaryReader).string, true
+	case "UUID":
+		return func(rb *rowBinaryReader) (string, error) {
+			hi, err := rb.uint64()
+			if err != nil {
+				return "", err
+			}
+			lo, err := rb.uint64()
+			if err != nil {
+				return "", err
+			}
+			s := fmt.Sprintf("%016x%016x", hi, lo)
+			return s[0:8] + "-" + s[8:12] + "-" + s[12:16] + "-" + s[16:20] + "-" + s[20:32], nil
+		}, true
+	case "IPv4":
+		return func(rb *rowBinaryReader) (string, error) {
+			v, err := rb.uint32()
+			return fmt.Sprintf("%d.%d.%d.%d", byte(v>>24), byte(v>>16), byte(v>>8), byte(v)), err
+		}, true
+	case "IPv6":
+		return func(rb *rowBinaryReader) (string, error) {
+			b, err := rb.read(16)
+			if err != nil {
+				return "", err
+			}
+			return netip.AddrFrom16([16]byte(b)).String(), nil
+		}, true
+	}
+	if strings.HasPrefix(fieldType, "FixedString(") {
+		size, err := strconv.Atoi(strings.TrimSpace(rowBinaryTypeArgs(fieldType, "FixedString")[0]))
+		if err != nil {
+			return nil, false
+		}
+		return func(rb *rowBinaryReader) (string, error) {
+			b, err := rb.read(size)
+			return string(b), err
+		}, true
+	}
+	if strings.HasPrefix(fieldType, "Enum8(") || strings.HasPrefix(fieldType, "Enum16(") {
+		is16 := strings.HasPrefix(fieldType, "Enum16(")
+		values := parseEnumValues(fieldType)
+		return func(rb *rowBinaryReader) (string, error) {
+			var v int64
+			if is16 {
+				u, err := rb.uint16()
+				if err != nil {
+					return "", err
+				}
+				v = int64(int16(u))
+			} else {
+				u, err := rb.uint8()
+				if err != nil {
+					return "", err
+				}
+				v = int64(int8(u))
+			}
+			if name, exists := values[v]; exists {
+				return name, nil
+			}
+			return strconv.FormatInt(v, 10), nil
+		}, true
+	}
+	return nil, false
+}
+
+func parseEnumValues(fieldType string) map[int64]string {
+	prefix := "Enum8"
+	if strings.HasPrefix(fieldType, "Enum16") {
+		prefix = "Enum16"
+	}
+	values := map[int64]string{}
+	for _, item := range rowBinaryTypeArgs(fieldType, prefix) {
+		eqPos := strings.LastIndex(item, "=")
+		if eqPos == -1 {
+			continue
+		}
+		v, err := strconv.ParseInt(strings.TrimSpace(item[eqPos+1:]), 10, 64)
+		if err != nil {
+			continue
+		}
+		name := strings.TrimSpace(item[:eqPos])
+		name = strings.TrimSuffix(strings.TrimPrefix(name, "'"), "'")
+		values[v] = strings.NewReplacer(`\'`, `'`, `\\`, `\`).Replace(name)
+	}
+	return values
+}
+
+func rowBinaryTimeReader(fieldType string, tz *time.Location) (func(rb *rowBinaryReader) (time.Time, error), bool) {
+	if tz == nil {
+		tz = time.UTC
+	}
+	switch {
+	case strings.HasPrefix(fieldType, dateTime64Prefix):
+		precision, err := strconv.Atoi(strings.TrimSpace(rowBinaryTypeArgs(fieldType, dateTime64Prefix)[0]))
+		if err != nil {
+			return nil, false
+		}
+		multiplier := int64(math.Pow10(9 - precision))
+		return func(rb *rowBinaryReader) (time.Time, error) {
+			v, err := rb.uint64()
+			return time.Unix(0, int64(v)*multiplier).In(tz), err
+		}, true
+	case strings.HasPrefix(fieldType, dateTimePrefix):
+		return func(rb *rowBinaryReader) (time.Time, error) {
+			v, err := rb.uint32()
+			return time.Unix(int64(v), 0).In(tz), err
+		}, true
+	case strings.HasPrefix(fieldType, "Date32"):
+		return func(rb *rowBinaryReader) (time.Time, error) {
+			v, err := rb.uint32()
+			return rowBinaryDate(int64(int32(v)), tz), err
+		}, true
+	case strings.HasPrefix(fieldType, datePrefix):
+		return func(rb *rowBinaryReader) (time.Time, error) {
+			v, err := rb.uint16()
+			return rowBinaryDate(int64(v), tz), err
+		}, true
+	}
+	return nil, false
+}
+
+// rowBinaryDate Date is calendar day, the same as text value parsed in field timezone
+func rowBinaryDate(days int64, tz *time.Location) time.Time {
+	y, m, d := time.Unix(days*86400, 0).UTC().Date()
+	return time.Date(y, m, d, 0, 0, 0, 0, tz)
+}
+
+// newRowBinaryGenericDecoder returns decoder which produces the same values as encoding/json for FORMAT JSON
+func newRowBinaryGenericDecoder(fieldType string, tz *time.Location) (rowBinaryDecodeFunc, error) {
+	fieldType = strings.TrimSpace(fieldType)
+	if tzName := extractTimeZoneNameFromFieldType(fieldType); tzName != "" && !complexTypeRE.MatchString(fieldType) {
+		tz = ParseTimeZone(tzName)
+	}
+	if tz == nil {
+		tz = time.UTC
+	}
+	prefix := fieldType
+	if pos := strings.Index(fieldType, "("); pos != -1 {
+		prefix = fieldType[:pos]
+	}
+
+	switch prefix {
+	case "LowCardinality":
+		return newRowBinaryGenericDecoder(rowBinaryTypeArgs(fieldType, prefix)[0], tz)
+	case "Nullable":
+		inner, err := newRowBinaryGenericDecoder(rowBinaryTypeArgs(fieldType, prefix)[0], tz)
+		if err != nil {
+			return nil, err
+		}
+		return func(rb *rowBinaryReader) (interface{}, error) {
+			isNull, err := rb.uint8()
+			if err != nil || isNull != 0 {
+				return nil, err
+			}
+			return inner(rb)
+		}, nil
+	case "Array":
+		inner, err := newRowBinaryGenericDecoder(rowBinaryTypeArgs(fieldType, prefix)[0], tz)
+		if err != nil {
+			return nil, err
+		}
+		return func(rb *rowBinaryReader) (interface{}, error) {
+			n, err := rb.uvarint()
+			if err != nil {
+				return nil, err
+			}
+			items := make([]interface{}, n)
+			for i := range items {
+				if items[i], err = inner(rb); err != nil {
+					return nil, err
+				}
+			}
+			return items, nil
+		}, nil
+	case "Tuple":
+		args := rowBinaryTypeArgs(fieldType, prefix)
+		names := make([]string, len(args))
+		decoders := make([]rowBinaryDecodeFunc, len(args))
+		isNamed := true
+		for i, arg := range args {
+			// named tuple elements look like `name Type`
+			if spacePos, bracePos := strings.Index(arg, " "), strings.Index(arg+"(", "("); spacePos != -1 && spacePos < bracePos {
+				names[i] = arg[:spacePos]
+				arg = arg[spacePos+1:]
+			} else {
+				isNamed = false
+			}
+			inner, err := newRowBinaryGenericDecoder(arg, tz)
+			if err != nil {
+				return nil, err
+			}
+			decoders[i] = inner
+		}
+		return func(rb *rowBinaryReader) (interface{}, error) {
+			items := make([]interface{}, len(decoders))
+			for i, decode := range decoders {
+				var err error
+				if items[i], err = decode(rb); err != nil {
+					return nil, err
+				}
+			}
+			if !isNamed {
+				return items, nil
+			}
+			obj := make(map[string]interface{}, len(items))
+			for i, item := range items {
+				obj[names[i]] = item
+			}
+			return obj, nil
+		}, nil
+	case "Map":
+		args := rowBinaryTypeArgs(fieldType, prefix)
+		if len(args) != 2 {
+			return nil, fmt.Errorf("unexpected map type %s", fieldType)
+		}
+		keyDecoder, err := newRowBinaryGenericDecoder(args[0], tz)
+		if err != nil {
+			return nil, err
+		}
+		valueDecoder, err := newRowBinaryGenericDecoder(args[1], tz)
+		if err != nil {
+			return nil, err
+		}
+		return func(rb *rowBinaryReader) (interface{}, error) {
+			n, err := rb.uvarint()
+			if err != nil {
+				return nil, err
+			}
+			obj := make(map[string]interface{}, n)
+			for i := uint64(0); i < n; i++ {
+				key, err := keyDecoder(rb)
+				if err != nil {
+					return nil, err
+				}
+				value, err := valueDecoder(rb)
+				if err != nil {
+					return nil, err
+				}
+				obj[fmt.Sprintf("%v", key)] = value
+			}
+			return obj, nil
+		}, nil
+	case "UInt8", "UInt16", "UInt32", "Int8", "Int16", "Int32", "Float32", "Float64":
+		read := rowBinaryNumberReader(prefix)
+		return func(rb *rowBinaryReader) (interface{}, error) {
+			v, err := read(rb)
+			// FORMAT JSON returns null for nan and inf
+			if err != nil || math.IsNaN(v) || math.IsInf(v, 0) {
+				return nil, err
+			}
+			return v, nil
+		}, nil
+	case "UInt64", "Int64":
+		// FORMAT JSON quotes 64bit integers by default
+		return func(rb *rowBinaryReader) (interface{}, error) {
+			v, err := rb.uint64()
+			if prefix == "Int64" {
+				return strconv.FormatInt(int64(v), 10), err
+			}
+			return strconv.FormatUint(v, 10), err
+		}, nil
+	case "UInt128", "Int128", "UInt256", "Int256":
+		size := 16
+		if strings.HasSuffix(prefix, "256") {
+			size = 32
+		}
+		signed := strings.HasPrefix(prefix, "Int")
+		return func(rb *rowBinaryReader) (interface{}, error) {
+			v, err := rb.bigInt(size, signed)
+			if err != nil {
+				return nil, err
+			}
+			return v.String(), nil
+		}, nil
+	case "Bool":
+		return func(rb *rowBinaryReader) (interface{}, error) {
+			v, err := rb.uint8()
+			return v != 0, err
+		}, nil
+	case "Nothing":
+		return func(rb *rowBinaryReader) (interface{}, error) {
+			return nil, nil
+		}, nil
+	}
+
+	if strings.HasPrefix(prefix, "Decimal") {
+		read, err := rowBinaryDecimalReader(fieldType)
+		if err != nil {
+			return nil, err
+		}
+		return func(rb *rowBinaryReader) (interface{}, error) {
+			return read(rb)
+		}, nil
+	}
+	if read, ok := rowBinaryStringReader(fieldType); ok {
+		return func(rb *rowBinaryReader) (interface{}, error) {
+			return read(rb)
+		}, nil
+	}
+	if read, ok := rowBinaryTimeReader(fieldType, tz); ok {
+		layout := dateTimeLayout
+		if prefix == "Date" || prefix == "Date32" {
+			layout = dateLayout
+		} else if prefix == dateTime64Prefix {
+			if precision, err := strconv.Atoi(strings.TrimSpace(rowBinaryTypeArgs(fieldType, prefix)[0])); err == nil && precision > 0 {
+				layout += "." + strings.Repeat("0", precision)
+			}
+		}
+		return func(rb *rowBinaryReader) (interface{}, error) {
+			v, err := read(rb)
+			if err != nil {
+				return nil, err
+			}
+			return v.Format(layout), nil
+		}, nil
+	}
+	return nil, fmt.Errorf("unsupported RowBinary type %s", fieldType)
+}
+
+// rowBinaryTypeArgs splits arguments of `prefix(arg1, arg2(x, y), 'a,b')` at top level commas
+func rowBinaryTypeArgs(fieldType, prefix string) []string {
+	if !strings.HasPrefix(fieldType, prefix+"(") || !strings.HasSuffix(fieldType, ")") {
+		return []string{""}
+	}
+	inner := fieldType[len(prefix)+1 : len(fieldType)-1]
+	var args []string
+	depth := 0
+	inQuotes := false
+	start := 0
+	for i := 0; i < len(inner); i++ {
+		switch c := inner[i]; {
+		case c == '\\' && inQuotes:
+			i++
+		case c == '\'':
+			inQuotes = !inQuotes
+		case inQuotes:
+		case c == '(':
+			depth++
+		case c == ')':
+			depth--
+		case c == ',' && depth == 0:
+			args = append(args, strings.TrimSpace(inner[start:i]))
+			start = i + 1
+		}
+	}
+	return append(args, strings.TrimSpace(inner[start:]))
+}
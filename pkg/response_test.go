@@ -0,0 +1,649 @@
+package main
+
+import (
+	"bytes"
+	"context"
+	"encoding/binary"
+	"encoding/json"
+	"fmt"
+	"net/netip"
+	"runtime"
+	"runtime/metrics"
+	"sort"
+	"strconv"
+	"strings"
+	"testing"
+	"time"
+
+	"github.com/grafana/grafana-plugin-sdk-go/data"
+	"github.com/stretchr/testify/require"
+)
+
+func TestAnalyzeResponseMetaFetchServerTimeZoneOnlyWhenRequired(t *testing.T) {
+	fetchCount := 0
+	fetchTZ := func(ctx context.Context) *time.Location {
+		fetchCount++
+		return time.UTC
+	}
+
+	r := &Response{
+		ctx: context.Background(),
+		Meta: []*FieldMeta{
+			{Name: "event_time", Type: "DateTime('Europe/Moscow')"},
+			{Name: "event_time64", Type: "DateTime64(3, 'Europe/Moscow')"},
+			{Name: "value", Type: "Float64"},
+		},
+	}
+	timeZonesMap, _ := r.analyzeResponseMeta(fetchTZ)
+	require.Equal(t, 0, fetchCount, "explicit timezones shall not require server timezone")
+	require.Equal(t, "Europe/Moscow", timeZonesMap["event_time"].String())
+	require.Equal(t, "Europe/Moscow", timeZonesMap["event_time64"].String())
+
+	r.Meta = append(r.Meta, &FieldMeta{Name: "d", Type: "Date"}, &FieldMeta{Name: "dt", Type: "Nullable(DateTime)"})
+	timeZonesMap, _ = r.analyzeResponseMeta(fetchTZ)
+	require.Equal(t, 1, fetchCount, "server timezone shall be fetched once per response")
+	require.Equal(t, time.UTC, timeZonesMap["d"])
+	require.Equal(t, time.UTC, timeZonesMap["dt"])
+}
+
+func TestServerTimeZoneCache(t *testing.T) {
+	cache := newServerTimeZoneCache(time.Minute)
+	_, ok := cache.get()
+	require.False(t, ok)
+
+	location := ParseTimeZone("Europe/Berlin")
+	cache.set(location)
+	cached, ok := cache.get()
+	require.True(t, ok)
+	require.Equal(t, location, cached)
+
+	cache.invalidate()
+	_, ok = cache.get()
+	require.False(t, ok)
+
+	expired := newServerTimeZoneCache(0)
+	expired.set(location)
+	time.Sleep(time.Millisecond)
+	_, ok = expired.get()
+	require.False(t, ok)
+}
+
+// generateResponseBodies returns the same result set in FORMAT JSON and FORMAT JSONCompact
+func generateResponseBodies(rows int, hosts int) ([]byte, []byte) {
+	meta := `"meta":[{"name":"t","type":"UInt64"},{"name":"host","type":"String"},{"name":"event_time","type":"DateTime"},{"name":"requests","type":"UInt64"},{"name":"latency","type":"Float64"}]`
+	var jsonBody, compactBody strings.Builder
+	jsonBody.WriteString("{" + meta + `,"data":[`)
+	compactBody.WriteString("{" + meta + `,"data":[`)
+	for i := 0; i < rows; i++ {
+		if i > 0 {
+			jsonBody.WriteString(",")
+			compactBody.WriteString(",")
+		}
+		ts := int64(1700000000000) + int64(i/hosts)*1000
+		host := fmt.Sprintf("host-%d", i%hosts)
+		eventTime := time.UnixMilli(ts).UTC().Format(dateTimeLayout)
+		latency := float64(i%1000) / 10
+		fmt.Fprintf(&jsonBody, `{"t":"%d","host":"%s","event_time":"%s","requests":"%d","latency":%g}`, ts, host, eventTime, i, latency)
+		fmt.Fprintf(&compactBody, `["%d","%s","%s","%d",%g]`, ts, host, eventTime, i, latency)
+	}
+	fmt.Fprintf(&jsonBody, `],"rows":%d,"statistics":{"elapsed":0.001,"rows_read":%d,"bytes_read":1}}`, rows, rows)
+	fmt.Fprintf(&compactBody, `],"rows":%d,"statistics":{"elapsed":0.001,"rows_read":%d,"bytes_read":1}}`, rows, rows)
+	return []byte(jsonBody.String()), []byte(compactBody.String())
+}
+
+func utcFetchTZ(ctx context.Context) *time.Location {
+	return time.UTC
+}
+
+func decodeJSONResponse(body []byte) (*Response, error) {
+	r := &Response{ctx: context.Background()}
+	err := json.Unmarshal(body, r)
+	return r, err
+}
+
+func sortFramesByName(frames data.Frames) data.Frames {
+	sort.Slice(frames, func(i, j int) bool {
+		return frames[i].Name < frames[j].Name
+	})
+	return frames
+}
+
+func requireFramesEqual(t *testing.T, expected, actual data.Frames) {
+	expected = sortFramesByName(expected)
+	actual = sortFramesByName(actual)
+	require.Equal(t, len(expected), len(actual))
+	for i := range expected {
+		require.Equal(t, expected[i].Name, actual[i].Name)
+		require.Equal(t, expected[i].RefID, actual[i].RefID)
+		require.Equal(t, len(expected[i].Fields), len(actual[i].Fields))
+		for j := range expected[i].Fields {
+			expectedField, actualField := expected[i].Fields[j], actual[i].Fields[j]
+			require.Equal(t, expectedField.Name, actualField.Name)
+			require.Equal(t, expectedField.Labels, actualField.Labels)
+			require.Equal(t, expectedField.Type(), actualField.Type())
+			require.Equal(t, expectedField.Len(), actualField.Len(), "field %s of frame %s", expectedField.Name, expected[i].Name)
+			for k := 0; k < expectedField.Len(); k++ {
+				requireValuesEqual(t, expectedField.At(k), actualField.At(k))
+			}
+		}
+	}
+}
+
+// requireValuesEqual compare time values as instants, *time.Location can be loaded twice
+func requireValuesEqual(t *testing.T, expected, actual interface{}) {
+	switch e := expected.(type) {
+	case time.Time:
+		a, ok := actual.(time.Time)
+		require.True(t, ok, "expected time.Time, got %T", actual)
+		require.True(t, e.Equal(a), "expected %v, got %v", e, a)
+	case *time.Time:
+		a, ok := actual.(*time.Time)
+		require.True(t, ok, "expected *time.Time, got %T", actual)
+		if e == nil || a == nil {
+			require.True(t, e == nil && a == nil, "expected %v, got %v", e, a)
+			return
+		}
+		require.True(t, e.Equal(*a), "expected %v, got %v", *e, *a)
+	default:
+		require.Equal(t, expected, actual)
+	}
+}
+
+func TestDecodeJSONCompactTheSameAsJSON(t *testing.T) {
+	jsonBody, compactBody := generateResponseBodies(100, 3)
+	query := &Query{RefId: "A"}
+
+	jsonResp, err := decodeJSONResponse(jsonBody)
+	require.NoError(t, err)
+	compactResp, err := decodeJSONCompact(context.Background(), bytes.NewReader(compactBody), utcFetchTZ)
+	require.NoError(t, err)
+	require.Equal(t, 100, compactResp.Rows)
+	require.Nil(t, compactResp.Data)
+
+	expected, err := jsonResp.toFrames(query, utcFetchTZ)
+	require.NoError(t, err)
+	actual, err := compactResp.toFrames(query, utcFetchTZ)
+	require.NoError(t, err)
+	requireFramesEqual(t, expected, actual)
+
+	// table without timestamp fields
+	tableMeta := []*FieldMeta{{Name: "host", Type: "LowCardinality(String)"}, {Name: "requests", Type: "Nullable(Int64)"}, {Name: "tags", Type: "Array(Nullable(String))"}}
+	jsonResp = &Response{ctx: context.Background(), Meta: tableMeta, Data: []map[string]interface{}{
+		{"host": "a", "requests": "1", "tags": []interface{}{"x", nil}},
+		{"host": "b", "requests": nil, "tags": []interface{}{}},
+	}}
+	compactResp, err = decodeJSONCompact(context.Background(), strings.NewReader(
+		`{"meta":[{"name":"host","type":"LowCardinality(String)"},{"name":"requests","type":"Nullable(Int64)"},{"name":"tags","type":"Array(Nullable(String))"}],`+
+			`"data":[["a","1",["x",null]],["b",null,[]]],"rows":2}`,
+	), utcFetchTZ)
+	require.NoError(t, err)
+	expected, err = jsonResp.toFrames(query, utcFetchTZ)
+	require.NoError(t, err)
+	actual, err = compactResp.toFrames(query, utcFetchTZ)
+	require.NoError(t, err)
+	requireFramesEqual(t, expected, actual)
+}
+
+func TestDecodeJSONCompactColumnsMacros(t *testing.T) {
+	query := &Query{RefId: "A"}
+	jsonResp, err := decodeJSONResponse([]byte(`{"meta":[{"name":"t","type":"UInt64"},{"name":"groupArr","type":"Array(Tuple(String, UInt64))"}],` +
+		`"data":[{"t":"1000","groupArr":[["a","1"],["b","2"]]},{"t":"2000","groupArr":[["a","3"]]}],"rows":2}`))
+	require.NoError(t, err)
+	compactResp, err := decodeJSONCompact(context.Background(), strings.NewReader(`{"meta":[{"name":"t","type":"UInt64"},{"name":"groupArr","type":"Array(Tuple(String, UInt64))"}],`+
+		`"data":[["1000",[["a","1"],["b","2"]]],["2000",[["a","3"]]]],"rows":2}`), utcFetchTZ)
+	require.NoError(t, err)
+
+	expected, err := jsonResp.toFrames(query, utcFetchTZ)
+	require.NoError(t, err)
+	actual, err := compactResp.toFrames(query, utcFetchTZ)
+	require.NoError(t, err)
+	require.Equal(t, 2, len(actual))
+	requireFramesEqual(t, expected, actual)
+}
+
+func TestDecodeJSONCompactErrors(t *testing.T) {
+	_, err := decodeJSONCompact(context.Background(), strings.NewReader(`{"data":[["1"]],"meta":[]}`), utcFetchTZ)
+	require.Error(t, err)
+	_, err = decodeJSONCompact(context.Background(), strings.NewReader(`{"meta":[{"name":"x","type":"UInt8"}],"data":[[1],[2`), utcFetchTZ)
+	require.Error(t, err)
+}
+
+func TestApplyResponseFormat(t *testing.T) {
+	require.Equal(t, "SELECT 1 FORMAT JSON", applyResponseFormat("SELECT 1 FORMAT JSON", ""))
+	require.Equal(t, "SELECT 1 FORMAT JSON", applyResponseFormat("SELECT 1 FORMAT JSON", ResponseFormatJSON))
+	require.Equal(t, "SELECT 1 FORMAT JSONCompact", applyResponseFormat("SELECT 1 FORMAT JSON", ResponseFormatJSONCompact))
+	require.Equal(t, "SELECT 1 FORMAT CSV", applyResponseFormat("SELECT 1 FORMAT CSV", ResponseFormatJSONCompact))
+}
+
+// reportPeakHeap samples live heap size while fn is running and reports maximum as peak-heap-MB metric
+func reportPeakHeap(b *testing.B, fn func()) {
+	samples := []metrics.Sample{{Name: "/memory/classes/heap/objects:bytes"}}
+	runtime.GC()
+	metrics.Read(samples)
+	baseline := samples[0].Value.Uint64()
+	peak := baseline
+	done := make(chan struct{})
+	finished := make(chan struct{})
+	go func() {
+		defer close(finished)
+		ticker := time.NewTicker(time.Millisecond)
+		defer ticker.Stop()
+		local := []metrics.Sample{{Name: "/memory/classes/heap/objects:bytes"}}
+		for {
+			select {
+			case <-done:
+				return
+			case <-ticker.C:
+				metrics.Read(local)
+				if v := local[0].Value.Uint64(); v > peak {
+					peak = v
+				}
+			}
+		}
+	}()
+	fn()
+	close(done)
+	<-finished
+	b.ReportMetric(float64(peak-baseline)/1024/1024, "peak-heap-MB")
+}
+
+func benchmarkDecode(b *testing.B, rows int, compact bool) {
+	jsonBody, compactBody := generateResponseBodies(rows, 10)
+	query := &Query{RefId: "A"}
+	b.ReportAllocs()
+	b.ResetTimer()
+	reportPeakHeap(b, func() {
+		for i := 0; i < b.N; i++ {
+			var r *Response
+			var err error
+			if compact {
+				r, err = decodeJSONCompact(context.Background(), bytes.NewReader(compactBody), utcFetchTZ)
+			} else {
+				r, err = decodeJSONResponse(jsonBody)
+			}
+			if err != nil {
+				b.Fatal(err)
+			}
+			if _, err = r.toFrames(query, utcFetchTZ); err != nil {
+				b.Fatal(err)
+			}
+		}
+	})
+}
+
+func BenchmarkDecodeJSON100k(b *testing.B)        { benchmarkDecode(b, 100000, false) }
+func BenchmarkDecodeJSONCompact100k(b *testing.B) { benchmarkDecode(b, 100000, true) }
+func BenchmarkDecodeJSON1M(b *testing.B)          { benchmarkDecode(b, 1000000, false) }
+func BenchmarkDecodeJSONCompact1M(b *testing.B)   { benchmarkDecode(b, 1000000, true) }
+
+func TestColumnBuilderTheSameAsParseValue(t *testing.T) {
+	tz := ParseTimeZone("Europe/Moscow")
+	testCases := []struct {
+		name   string
+		typ    string
+		values []interface{}
+	}{
+		{"s", "String", []interface{}{"a", ""}},
+		{"s", "LowCardinality(Nullable(String))", []interface{}{"a", nil}},
+		{"n", "UInt8", []interface{}{float64(1), float64(255)}},
+		{"n", "Nullable(Float64)", []interface{}{1.5, nil}},
+		{"n", "Decimal(9, 2)", []interface{}{1.25, "2.5"}},
+		{"n", "UInt64", []interface{}{"18446744073709551615", "x"}},
+		{"n", "Nullable(Int64)", []interface{}{"-1", nil}},
+		{"t", "UInt64", []interface{}{"1700000000000", nil}},
+		{"t", "Int64", []interface{}{"1700000000000"}},
+		{"e", "Enum8('a' = 1)", []interface{}{"a"}},
+		{"d", "Date", []interface{}{"2024-01-02", "bad"}},
+		{"d", "Nullable(DateTime('Europe/Moscow'))", []interface{}{"2024-01-02 03:04:05", nil}},
+		{"d", "DateTime64(3)", []interface{}{"2024-01-02 03:04:05.123"}},
+		{"d", "DateTime64(6, 'UTC')", []interface{}{"2024-01-02 03:04:05.123456"}},
+		{"m", "Map(String, UInt64)", []interface{}{map[string]interface{}{"a": "1"}, nil}},
+		{"a", "Array(String)", []interface{}{[]interface{}{"a", "b"}}},
+	}
+	for _, tc := range testCases {
+		builder := newColumnBuilder(tc.name, tc.typ, tz, len(tc.values))
+		for _, value := range tc.values {
+			builder.append(value)
+		}
+		field := builder.field()
+		require.Equal(t, NewDataFieldByType(tc.name, tc.typ).Type(), field.Type(), tc.typ)
+		require.Equal(t, len(tc.values), field.Len())
+		for i, value := range tc.values {
+			requireValuesEqual(t, ParseValue(tc.name, tc.typ, tz, value, false), field.At(i))
+		}
+	}
+}
+
+func TestToFramesTableOneFrameInMetaOrder(t *testing.T) {
+	r, err := decodeJSONResponse([]byte(`{"meta":[{"name":"z","type":"String"},{"name":"a","type":"UInt64"},{"name":"m","type":"Nullable(Float64)"}],` +
+		`"data":[{"z":"x","a":"1","m":null},{"z":"y","a":"2","m":1.5}],"rows":2}`))
+	require.NoError(t, err)
+	frames, err := r.toFrames(&Query{RefId: "A"}, utcFetchTZ)
+	require.NoError(t, err)
+	require.Equal(t, 1, len(frames))
+	require.Equal(t, "A", frames[0].RefID)
+	require.Equal(t, 3, len(frames[0].Fields))
+	for i, name := range []string{"z", "a", "m"} {
+		require.Equal(t, name, frames[0].Fields[i].Name)
+		require.Equal(t, 2, frames[0].Fields[i].Len())
+	}
+	require.Equal(t, uint64(2), frames[0].Fields[1].At(1))
+	require.Nil(t, r.Data, "raw rows shall be released after conversion")
+}
+
+func TestToFramesWithTimeStampDeterministicOrder(t *testing.T) {
+	jsonBody, _ := generateResponseBodies(30, 3)
+	for i := 0; i < 5; i++ {
+		r, err := decodeJSONResponse(jsonBody)
+		require.NoError(t, err)
+		frames, err := r.toFrames(&Query{RefId: "A"}, utcFetchTZ)
+		require.NoError(t, err)
+		names := make([]string, len(frames))
+		for j, frame := range frames {
+			names[j] = frame.Name
+			require.Equal(t, 10, frame.Fields[0].Len())
+		}
+		require.Equal(t, []string{
+			"host-0, event_time", "host-0, requests", "host-0, latency",
+			"host-1, event_time", "host-1, requests", "host-1, latency",
+			"host-2, event_time", "host-2, requests", "host-2, latency",
+		}, names)
+		require.Equal(t, data.Labels{"host": "host-1"}, frames[3].Fields[1].Labels)
+	}
+
+	r, err := decodeJSONResponse([]byte(`{"meta":[{"name":"t","type":"UInt64"},{"name":"b","type":"UInt64"},{"name":"a","type":"Float64"}],` +
+		`"data":[{"t":"1000","b":"1","a":0.5},{"t":"2000","b":"2","a":1.5}],"rows":2}`))
+	require.NoError(t, err)
+	frames, err := r.toFrames(&Query{RefId: "A"}, utcFetchTZ)
+	require.NoError(t, err)
+	require.Equal(t, 2, len(frames))
+	require.Equal(t, "b", frames[0].Name)
+	require.Equal(t, "a", frames[1].Name)
+	require.Equal(t, "A", frames[1].RefID)
+	requireValuesEqual(t, time.UnixMilli(2000), frames[1].Fields[0].At(1))
+	require.Equal(t, 1.5, frames[1].Fields[1].At(1))
+}
+
+func TestToFramesNullableTimestampError(t *testing.T) {
+	r, err := decodeJSONResponse([]byte(`{"meta":[{"name":"t","type":"Nullable(UInt64)"},{"name":"v","type":"Float64"}],` +
+		`"data":[{"t":null,"v":1}],"rows":1}`))
+	require.NoError(t, err)
+	_, err = r.toFrames(&Query{RefId: "A"}, utcFetchTZ)
+	require.Error(t, err)
+}
+
+// generateTableResponse returns result without timestamp fields the same way as encoding/json decodes FORMAT JSON
+func generateTableResponse(rows int) *Response {
+	r := &Response{ctx: context.Background(), Rows: rows, Meta: []*FieldMeta{
+		{Name: "host", Type: "LowCardinality(String)"},
+		{Name: "requests", Type: "UInt64"},
+		{Name: "latency", Type: "Float64"},
+		{Name: "status", Type: "Nullable(String)"},
+		{Name: "day", Type: "Date"},
+	}}
+	r.Data = make([]map[string]interface{}, rows)
+	for i := range r.Data {
+		var status interface{}
+		if i%10 != 0 {
+			status = "ok"
+		}
+		r.Data[i] = map[string]interface{}{
+			"host":     fmt.Sprintf("host-%d", i%10),
+			"requests": strconv.Itoa(i),
+			"latency":  float64(i%1000) / 10,
+			"status":   status,
+			"day":      "2024-01-02",
+		}
+	}
+	return r
+}
+
+func benchmarkToFrames(b *testing.B, decoded *Response) {
+	query := &Query{RefId: "A"}
+	b.ReportAllocs()
+	b.ResetTimer()
+	reportPeakHeap(b, func() {
+		for i := 0; i < b.N; i++ {
+			// toFrames releases Data of converted response
+			r := &Response{ctx: decoded.ctx, Meta: decoded.Meta, Data: decoded.Data, Rows: decoded.Rows}
+			if _, err := r.toFrames(query, utcFetchTZ); err != nil {
+				b.Fatal(err)
+			}
+		}
+	})
+}
+
+func benchmarkToFramesTable(b *testing.B, rows int) {
+	benchmarkToFrames(b, generateTableResponse(rows))
+}
+
+func benchmarkToFramesWithTimeStamp(b *testing.B, rows int) {
+	jsonBody, _ := generateResponseBodies(rows, 10)
+	decoded, err := decodeJSONResponse(jsonBody)
+	if err != nil {
+		b.Fatal(err)
+	}
+	benchmarkToFrames(b, decoded)
+}
+
+func BenchmarkToFramesTable10k(b *testing.B)          { benchmarkToFramesTable(b, 10000) }
+func BenchmarkToFramesTable100k(b *testing.B)         { benchmarkToFramesTable(b, 100000) }
+func BenchmarkToFramesTable1M(b *testing.B)           { benchmarkToFramesTable(b, 1000000) }
+func BenchmarkToFramesWithTimeStamp10k(b *testing.B)  { benchmarkToFramesWithTimeStamp(b, 10000) }
+func BenchmarkToFramesWithTimeStamp100k(b *testing.B) { benchmarkToFramesWithTimeStamp(b, 100000) }
+func BenchmarkToFramesWithTimeStamp1M(b *testing.B)   { benchmarkToFramesWithTimeStamp(b, 1000000) }
+
+func TestToFramesLabelSeries(t *testing.T) {
+	r, err := decodeJSONResponse([]byte(`{"meta":[{"name":"t","type":"UInt64"},{"name":"region","type":"Nullable(String)"},{"name":"host","type":"LowCardinality(String)"},{"name":"v","type":"Float64"}],` +
+		`"data":[{"t":"1000","region":"eu","host":"a","v":1},{"t":"1000","region":null,"host":"a","v":2},{"t":"2000","region":"eu","host":"a","v":3},{"t":"2000","region":"eu","host":"b","v":4}],"rows":4}`))
+	require.NoError(t, err)
+	frames, err := r.toFrames(&Query{RefId: "A"}, utcFetchTZ)
+	require.NoError(t, err)
+	require.Equal(t, 3, len(frames))
+	// label values are sorted by label name
+	require.Equal(t, "a, eu", frames[0].Name)
+	require.Equal(t, "a, null", frames[1].Name)
+	require.Equal(t, "b, eu", frames[2].Name)
+	require.Equal(t, data.Labels{"host": "a", "region": "eu"}, frames[0].Fields[1].Labels)
+	require.Equal(t, data.Labels{"host": "a", "region": "null"}, frames[1].Fields[1].Labels)
+	require.Equal(t, 2, frames[0].Fields[1].Len())
+	require.Equal(t, 3.0, frames[0].Fields[1].At(1))
+}
+
+// generateLabelsResponse returns time series with two label columns and seriesCount unique label combinations
+func generateLabelsResponse(rows int, seriesCount int) *Response {
+	r := &Response{ctx: context.Background(), Rows: rows, Meta: []*FieldMeta{
+		{Name: "t", Type: "UInt64"},
+		{Name: "host", Type: "LowCardinality(String)"},
+		{Name: "region", Type: "Nullable(String)"},
+		{Name: "requests", Type: "Float64"},
+	}}
+	r.Data = make([]map[string]interface{}, rows)
+	for i := range r.Data {
+		seriesIdx := i % seriesCount
+		r.Data[i] = map[string]interface{}{
+			"t":        strconv.FormatInt(int64(1700000000000)+int64(i/seriesCount)*1000, 10),
+			"host":     fmt.Sprintf("host-%d", seriesIdx/10),
+			"region":   fmt.Sprintf("region-%d", seriesIdx%10),
+			"requests": float64(i),
+		}
+	}
+	return r
+}
+
+func BenchmarkToFramesLabels50kRows100Series(b *testing.B) {
+	benchmarkToFrames(b, generateLabelsResponse(50000, 100))
+}
+
+func BenchmarkToFramesLabels50kRows10kSeries(b *testing.B) {
+	benchmarkToFrames(b, generateLabelsResponse(50000, 10000))
+}
+
+func BenchmarkToFramesLabels500kRows50kSeries(b *testing.B) {
+	benchmarkToFrames(b, generateLabelsResponse(500000, 50000))
+}
+
+type rowBinaryWriter struct {
+	bytes.Buffer
+}
+
+func (w *rowBinaryWriter) uvarint(v uint64) *rowBinaryWriter {
+	w.Write(binary.AppendUvarint(nil, v))
+	return w
+}
+
+func (w *rowBinaryWriter) str(s string) *rowBinaryWriter {
+	w.uvarint(uint64(len(s)))
+	w.WriteString(s)
+	return w
+}
+
+func (w *rowBinaryWriter) le(v interface{}) *rowBinaryWriter {
+	_ = binary.Write(&w.Buffer, binary.LittleEndian, v)
+	return w
+}
+
+func (w *rowBinaryWriter) header(meta []*FieldMeta) *rowBinaryWriter {
+	w.uvarint(uint64(len(meta)))
+	for _, m := range meta {
+		w.str(m.Name)
+	}
+	for _, m := range meta {
+		w.str(m.Type)
+	}
+	return w
+}
+
+func TestDecodeRowBinaryTableTheSameAsJSON(t *testing.T) {
+	query := &Query{RefId: "A"}
+	meta := []*FieldMeta{
+		{Name: "host", Type: "LowCardinality(String)"},
+		{Name: "requests", Type: "Nullable(Int64)"},
+		{Name: "total", Type: "UInt64"},
+		{Name: "price", Type: "Decimal(10, 2)"},
+		{Name: "big_price", Type: "Decimal(38, 3)"},
+		{Name: "status", Type: `Enum8('ok' = 1, 'it\'s bad' = -2)`},
+		{Name: "id", Type: "UUID"},
+		{Name: "ip", Type: "IPv4"},
+		{Name: "ip6", Type: "IPv6"},
+		{Name: "code", Type: "FixedString(2)"},
+		{Name: "ratio", Type: "Float32"},
+		{Name: "flag", Type: "Bool"},
+		{Name: "tags", Type: "Array(UInt8)"},
+		{Name: "attrs", Type: "Map(String, UInt64)"},
+	}
+	jsonResp := &Response{ctx: context.Background(), Meta: meta, Data: []map[string]interface{}{
+		{
+			"host": "a", "requests": "-5", "total": "18446744073709551615", "price": 12.34, "big_price": 1.5, "status": "it's bad",
+			"id": "61f0c404-5cb3-11e7-907b-a6006ad3dba0", "ip": "1.2.3.4", "ip6": "::ffff:1.2.3.4", "code": "ru", "ratio": 1.5, "flag": true,
+			"tags": []interface{}{float64(1), float64(2)}, "attrs": map[string]interface{}{"k": "5"},
+		},
+		{
+			"host": "b", "requests": nil, "total": "0", "price": -0.5, "big_price": -2.0, "status": "ok",
+			"id": "00000000-0000-0000-0000-000000000000", "ip": "0.0.0.0", "ip6": "2001:db8::1", "code": "en", "ratio": float64(0), "flag": false,
+			"tags": []interface{}{}, "attrs": map[string]interface{}{},
+		},
+	}}
+
+	w := &rowBinaryWriter{}
+	w.header(meta)
+	ip6 := netip.MustParseAddr("2001:db8::1").As16()
+	mapped := netip.MustParseAddr("::ffff:1.2.3.4").As16()
+	// first row
+	w.str("a").le(uint8(0)).le(int64(-5)).le(uint64(18446744073709551615)).le(int64(1234))
+	w.le(uint64(1500)).le(uint64(0)).le(int8(-2))
+	w.le(uint64(0x61f0c4045cb311e7)).le(uint64(0x907ba6006ad3dba0)).le(uint32(0x01020304)).le(mapped)
+	w.WriteString("ru")
+	w.le(float32(1.5)).le(uint8(1))
+	w.uvarint(2).le(uint8(1)).le(uint8(2))
+	w.uvarint(1).str("k").le(uint64(5))
+	// second row
+	w.str("b").le(uint8(1)).le(uint64(0)).le(int64(-50))
+	w.le(int64(-2000)).le(int64(-1)).le(int8(1))
+	w.le(uint64(0)).le(uint64(0)).le(uint32(0)).le(ip6)
+	w.WriteString("en")
+	w.le(float32(0)).le(uint8(0))
+	w.uvarint(0)
+	w.uvarint(0)
+
+	binaryResp, err := decodeRowBinary(context.Background(), bytes.NewReader(w.Bytes()), utcFetchTZ)
+	require.NoError(t, err)
+	require.Equal(t, 2, binaryResp.Rows)
+
+	expected, err := jsonResp.toFrames(query, utcFetchTZ)
+	require.NoError(t, err)
+	actual, err := binaryResp.toFrames(query, utcFetchTZ)
+	require.NoError(t, err)
+	requireFramesEqual(t, expected, actual)
+}
+
+func TestDecodeRowBinaryTimeSeriesTheSameAsJSON(t *testing.T) {
+	query := &Query{RefId: "A"}
+	meta := []*FieldMeta{
+		{Name: "t", Type: "UInt64"},
+		{Name: "host", Type: "String"},
+		{Name: "value", Type: "Nullable(Float64)"},
+		{Name: "dt", Type: "DateTime('Europe/Moscow')"},
+		{Name: "dt64", Type: "DateTime64(3, 'Europe/Moscow')"},
+		{Name: "d", Type: "Date"},
+		{Name: "d32", Type: "Date32"},
+	}
+	jsonResp := &Response{ctx: context.Background(), Meta: meta, Data: []map[string]interface{}{
+		{"t": "1704153845000", "host": "a", "value": 1.5, "dt": "2024-01-02 03:04:05", "dt64": "2024-01-02 03:04:05.123", "d": "2024-01-02", "d32": "1960-01-02"},
+		{"t": "1704153846000", "host": "b", "value": nil, "dt": "2024-01-02 03:04:06", "dt64": "2024-01-02 03:04:06.000", "d": "2024-01-03", "d32": "2024-01-03"},
+	}}
+
+	moscow := ParseTimeZone("Europe/Moscow")
+	dt := time.Date(2024, 1, 2, 3, 4, 5, 0, moscow)
+	w := &rowBinaryWriter{}
+	w.header(meta)
+	w.le(uint64(1704153845000)).str("a").le(uint8(0)).le(1.5).le(uint32(dt.Unix())).le(dt.UnixMilli() + 123)
+	w.le(uint16(19724)).le(int32(-3652))
+	w.le(uint64(1704153846000)).str("b").le(uint8(1)).le(uint32(dt.Unix() + 1)).le(dt.UnixMilli() + 1000)
+	w.le(uint16(19725)).le(int32(19725))
+
+	binaryResp, err := decodeRowBinary(context.Background(), bytes.NewReader(w.Bytes()), utcFetchTZ)
+	require.NoError(t, err)
+
+	expected, err := jsonResp.toFrames(query, utcFetchTZ)
+	require.NoError(t, err)
+	actual, err := binaryResp.toFrames(query, utcFetchTZ)
+	require.NoError(t, err)
+	requireFramesEqual(t, expected, actual)
+
+	// Array(Tuple(label, value)) produced by $columns macros
+	meta = []*FieldMeta{{Name: "t", Type: "UInt64"}, {Name: "groupArr", Type: "Array(Tuple(String, UInt64))"}}
+	jsonResp, err = decodeJSONResponse([]byte(`{"meta":[{"name":"t","type":"UInt64"},{"name":"groupArr","type":"Array(Tuple(String, UInt64))"}],` +
+		`"data":[{"t":"1000","groupArr":[["a","1"],["b","2"]]},{"t":"2000","groupArr":[["a","3"]]}],"rows":2}`))
+	require.NoError(t, err)
+	w = &rowBinaryWriter{}
+	w.header(meta)
+	w.le(uint64(1000)).uvarint(2).str("a").le(uint64(1)).str("b").le(uint64(2))
+	w.le(uint64(2000)).uvarint(1).str("a").le(uint64(3))
+	binaryResp, err = decodeRowBinary(context.Background(), bytes.NewReader(w.Bytes()), utcFetchTZ)
+	require.NoError(t, err)
+	expected, err = jsonResp.toFrames(query, utcFetchTZ)
+	require.NoError(t, err)
+	actual, err = binaryResp.toFrames(query, utcFetchTZ)
+	require.NoError(t, err)
+	requireFramesEqual(t, expected, actual)
+}
+
+func TestDecodeRowBinaryErrors(t *testing.T) {
+	w := &rowBinaryWriter{}
+	w.header([]*FieldMeta{{Name: "x", Type: "UInt32"}}).le(uint16(1))
+	_, err := decodeRowBinary(context.Background(), bytes.NewReader(w.Bytes()), utcFetchTZ)
+	require.Error(t, err)
+
+	w = &rowBinaryWriter{}
+	w.header([]*FieldMeta{{Name: "x", Type: "AggregateFunction(uniq, UInt64)"}})
+	_, err = decodeRowBinary(context.Background(), bytes.NewReader(w.Bytes()), utcFetchTZ)
+	require.Error(t, err)
+}
+
+func TestRowBinaryTypeArgs(t *testing.T) {
+	require.Equal(t, []string{"3", "'Europe/Moscow'"}, rowBinaryTypeArgs("DateTime64(3, 'Europe/Moscow')", "DateTime64"))
+	require.Equal(t, []string{"a String", "b Array(Tuple(UInt8, String))"}, rowBinaryTypeArgs("Tuple(a String, b Array(Tuple(UInt8, String)))", "Tuple"))
+	require.Equal(t, []string{"'a,b' = 1", "'c)' = 2"}, rowBinaryTypeArgs("Enum8('a,b' = 1, 'c)' = 2)", "Enum8"))
+	require.Equal(t, map[int64]string{1: "a,b", -2: "it's"}, parseEnumValues(`Enum8('a,b' = 1, 'it\'s' = -2)`))
+}
@@ -0,0 +1,286 @@
+package main
+
+import (
+	"container/list"
+	"regexp"
+	"strings"
+	"sync"
+	"sync/atomic"
+	"time"
+
+	"github.com/grafana/grafana-plugin-sdk-go/data"
+)
+
+// resultCacheUnsafeRE matches functions which depend on previous rows or limit result, their values can't be fetched only for tail of range
+var resultCacheUnsafeRE = regexp.MustCompile(`(?i)\b(runningDifference\w*|runningAccumulate|neighbor|lagInFrame|leadInFrame)\s*\(|\bover\s*\(|\bwith\s+fill\b|\blimit\b`)
+
+// resultCacheFilterRE at least one time filter shall be used, otherwise query result doesn't depend on time range
+var resultCacheFilterRE = regexp.MustCompile(`\$(timeFilter|timeFilterMs|timeFilterByColumn|timeFilter64ByColumn)\b`)
+
+// resultCache keeps frames of time series queries bucketed by $timeSeries macros,
+// on dashboard refresh only tail of time range after cached buckets and unsettled window is fetched and merged with cached frames
+type resultCache struct {
+	mu        sync.Mutex
+	maxBytes  int
+	bytes     int
+	unsettled time.Duration
+	lru       *list.List
+	items     map[string]*list.Element
+
+	hits      atomic.Uint64
+	misses    atomic.Uint64
+	evictions atomic.Uint64
+}
+
+type resultCacheEntry struct {
+	key    string
+	from   time.Time
+	to     time.Time
+	frames data.Frames
+	size   int
+}
+
+type resultCacheStats struct {
+	Hits      uint64 `json:"hits"`
+	Misses    uint64 `json:"misses"`
+	Evictions uint64 `json:"evictions"`
+	Entries   int    `json:"entries"`
+	Bytes     int    `json:"bytes"`
+}
+
+// resultCachePlan describes which part of query time range shall be fetched from ClickHouse
+type resultCachePlan struct {
+	key    string
+	from   time.Time
+	to     time.Time
+	stepMs int64
+	// cached is nil when whole range shall be fetched
+	cached   *resultCacheEntry
+	tailFrom time.Time
+}
+
+func newResultCache(maxBytes int, unsettled time.Duration) *resultCache {
+	return &resultCache{
+		maxBytes:  maxBytes,
+		unsettled: unsettled,
+		lru:       list.New(),
+		items:     map[string]*list.Element{},
+	}
+}
+
+// newResultCachePlan returns false when query can't be cached, replace shall be called before
+func (c *resultCache) newResultCachePlan(q *EvalQuery) (*resultCachePlan, bool, error) {
+	if c == nil || resultCacheUnsafeRE.MatchString(q.template) || !resultCacheFilterRE.MatchString(q.template) ||
+		fromMacroRegexp.MatchString(q.template) || toMacroRegexp.MatchString(q.template) ||
+		fromMsMacroRegexp.MatchString(q.template) || toMsMacroRegexp.MatchString(q.template) {
+		return nil, false, nil
+	}
+	from, to, err := q.roundedTimeRange()
+	if err != nil {
+		return nil, false, err
+	}
+	stepMs, isBucketed := q.timeSeriesStepMs(q.template, q.convertTimestamp(from), q.convertTimestamp(to))
+	// first bucket shall be complete, otherwise it contains different rows after time range moved
+	if !isBucketed || from.UnixMilli()%stepMs != 0 || !to.After(from) {
+		return nil, false, nil
+	}
+
+	// key is query with the same macros and interval applied to empty time range
+	keyQuery := *q
+	keyQuery.From = time.Unix(0, 0)
+	keyQuery.To = time.Unix(0, 0)
+	keyQuery.naturalTimeSeriesDuration = q.convertTimestamp(to) - q.convertTimestamp(from)
+	key, err := keyQuery.ApplyMacrosAndTimeRangeToQuery()
+	if err != nil {
+		return nil, false, err
+	}
+
+	plan := &resultCachePlan{key: key, from: from, to: to, stepMs: stepMs, tailFrom: from}
+	if cached, isCached := c.get(key); isCached && !from.Before(cached.from) && !to.Before(cached.to) {
+		// buckets after cached.to - unsettled can still receive rows, they are fetched again
+		tailFrom := time.UnixMilli(cached.to.Add(-c.unsettled).UnixMilli() / stepMs * stepMs)
+		if tailFrom.After(from) {
+			plan.cached = cached
+			plan.tailFrom = tailFrom
+		}
+	}
+	if plan.cached != nil {
+		c.hits.Add(1)
+	} else {
+		c.misses.Add(1)
+	}
+	return plan, true, nil
+}
+
+func (c *resultCache) get(key string) (*resultCacheEntry, bool) {
+	c.mu.Lock()
+	defer c.mu.Unlock()
+	element, exists := c.items[key]
+	if !exists {
+		return nil, false
+	}
+	c.lru.MoveToFront(element)
+	return element.Value.(*resultCacheEntry), true
+}
+
+// set stores frames, they shall not be changed after that
+func (c *resultCache) set(key string, from, to time.Time, frames data.Frames) {
+	entry := &resultCacheEntry{key: key, from: from, to: to, frames: frames}
+	entry.size = len(key) + framesSize(frames)
+	c.mu.Lock()
+	defer c.mu.Unlock()
+	if element, exists := c.items[key]; exists {
+		c.bytes -= element.Value.(*resultCacheEntry).size
+		c.lru.Remove(element)
+		delete(c.items, key)
+	}
+	if entry.size > c.maxBytes {
+		return
+	}
+	c.items[key] = c.lru.PushFront(entry)
+	c.bytes += entry.size
+	for c.bytes > c.maxBytes {
+		oldest := c.lru.Remove(c.lru.Back()).(*resultCacheEntry)
+		delete(c.items, oldest.key)
+		c.bytes -= oldest.size
+		c.evictions.Add(1)
+	}
+}
+
+func (c *resultCache) stats() resultCacheStats {
+	if c == nil {
+		return resultCacheStats{}
+	}
+	c.mu.Lock()
+	defer c.mu.Unlock()
+	return resultCacheStats{
+		Hits:      c.hits.Load(),
+		Misses:    c.misses.Load(),
+		Evictions: c.evictions.Load(),
+		Entries:   c.lru.Len(),
+		Bytes:     c.bytes,
+	}
+}
+
+// framesSize approximate memory used by values of frames
+func framesSize(frames data.Frames) int {
+	size := 0
+	for _, frame := range frames {
+		for _, field := range frame.Fields {
+			switch field.Type() {
+			case data.FieldTypeString:
+				for i := 0; i < field.Len(); i++ {
+					size += len(field.At(i).(string)) + 16
+				}
+			case data.FieldTypeNullableString:
+				for i := 0; i < field.Len(); i++ {
+					if value := field.At(i).(*string); value != nil {
+						size += len(*value) + 16
+					}
+					size += 8
+				}
+			case data.FieldTypeTime, data.FieldTypeNullableTime:
+				size += field.Len() * 24
+			default:
+				size += field.Len() * 8
+			}
+		}
+	}
+	return size
+}
+
+// timeFieldIdx returns first not nullable time field of frame
+func timeFieldIdx(frame *data.Frame) (int, bool) {
+	for i, field := range frame.Fields {
+		if field.Type() == data.FieldTypeTime {
+			return i, true
+		}
+	}
+	return 0, false
+}
+
+// frameKey identifies the same time series in cached and tail frames
+func frameKey(frame *data.Frame) string {
+	key := strings.Builder{}
+	key.WriteString(frame.Name)
+	for _, field := range frame.Fields {
+		key.WriteByte(0)
+		key.WriteString(field.Name)
+		key.WriteByte(0)
+		key.WriteString(field.Type().ItemTypeString())
+		key.WriteByte(0)
+		key.WriteString(field.Labels.String())
+	}
+	return key.String()
+}
+
+// mergeTimeSeriesFrames returns cached rows with time in [from, tailFrom) followed by tail rows with time after tailFrom,
+// cached frames are not changed, false means frames don't have time field and can't be merged
+func mergeTimeSeriesFrames(cached, tail data.Frames, from, tailFrom time.Time) (data.Frames, bool) {
+	tailByKey := make(map[string]*data.Frame, len(tail))
+	for _, frame := range tail {
+		if _, hasTime := timeFieldIdx(frame); !hasTime {
+			return nil, false
+		}
+		tailByKey[frameKey(frame)] = frame
+	}
+
+	merged := make(data.Frames, 0, len(cached)+len(tail))
+	for _, frame := range cached {
+		if _, hasTime := timeFieldIdx(frame); !hasTime {
+			return nil, false
+		}
+		key := frameKey(frame)
+		tailFrame, hasTail := tailByKey[key]
+		delete(tailByKey, key)
+
+		mergedFrame := emptyFrameLike(frame)
+		appendFrameRows(mergedFrame, frame, from, tailFrom)
+		if hasTail {
+			appendFrameRows(mergedFrame, tailFrame, tailFrom, time.Time{})
+			mergedFrame.Meta = tailFrame.Meta
+		} else if mergedFrame.Rows() == 0 {
+			// time series is not present in new time range
+			continue
+		}
+		merged = append(merged, mergedFrame)
+	}
+	// new time series appeared only in tail
+	for _, frame := range tail {
+		if _, isNew := tailByKey[frameKey(frame)]; isNew {
+			mergedFrame := emptyFrameLike(frame)
+			appendFrameRows(mergedFrame, frame, tailFrom, time.Time{})
+			mergedFrame.Meta = frame.Meta
+			merged = append(merged, mergedFrame)
+		}
+	}
+	return merged, true
+}
+
+func emptyFrameLike(frame *data.Frame) *data.Frame {
+	fields := make([]*data.Field, len(frame.Fields))
+	for i, field := range frame.Fields {
+		fields[i] = data.NewFieldFromFieldType(field.Type(), 0)
+		fields[i].Name = field.Name
+		fields[i].Labels = field.Labels
+		fields[i].Config = field.Config
+	}
+	emptyFrame := data.NewFrame(frame.Name, fields...)
+	emptyFrame.RefID = frame.RefID
+	return emptyFrame
+}
+
+// appendFrameRows appends rows of src with time in [from, until), zero until means without upper bound
+func appendFrameRows(dst, src *data.Frame, from, until time.Time) {
+	timeIdx, _ := timeFieldIdx(src)
+	timeField := src.Fields[timeIdx]
+	for rowIdx := 0; rowIdx < timeField.Len(); rowIdx++ {
+		t := timeField.At(rowIdx).(time.Time)
+		if t.Before(from) || (!until.IsZero() && !t.Before(until)) {
+			continue
+		}
+		for i, field := range src.Fields {
+			dst.Fields[i].Append(field.At(rowIdx))
+		}
+	}
+}
@@ -0,0 +1,128 @@
+package main
+
+import (
+	"testing"
+	"time"
+
+	"github.com/grafana/grafana-plugin-sdk-go/data"
+	"github.com/stretchr/testify/require"
+)
+
+func newResultCacheTestQuery(query string, from, to time.Time) *EvalQuery {
+	return &EvalQuery{
+		RefId:       "A",
+		Query:       query,
+		Table:       "requests",
+		DateTimeCol: "EventTime",
+		Interval:    "1m",
+		Round:       "$step",
+		From:        from,
+		To:          to,
+	}
+}
+
+func TestResultCachePlan(t *testing.T) {
+	r := require.New(t)
+	const query = "SELECT $timeSeries AS t, count() FROM $table WHERE $timeFilter GROUP BY t ORDER BY t"
+	cache := newResultCache(DefaultEvalQueryCacheSize, time.Minute)
+	from := time.Date(2024, 1, 1, 0, 0, 30, 0, time.UTC)
+
+	q := newResultCacheTestQuery(query, from, from.Add(24*time.Hour))
+	_, err := q.ApplyMacrosAndTimeRangeToQuery()
+	r.NoError(err)
+	plan, isCacheable, err := cache.newResultCachePlan(q)
+	r.NoError(err)
+	r.True(isCacheable)
+	r.Nil(plan.cached)
+	r.Equal(int64(60000), plan.stepMs)
+	r.Equal(time.Date(2024, 1, 1, 0, 0, 0, 0, time.UTC), plan.from, "from shall be rounded by $step")
+	cache.set(plan.key, plan.from, plan.to, data.Frames{})
+
+	// refresh after 10 seconds fetches only last buckets
+	q = newResultCacheTestQuery(query, from.Add(10*time.Second), from.Add(24*time.Hour+10*time.Second))
+	_, err = q.ApplyMacrosAndTimeRangeToQuery()
+	r.NoError(err)
+	refreshPlan, isCacheable, err := cache.newResultCachePlan(q)
+	r.NoError(err)
+	r.True(isCacheable)
+	r.Equal(plan.key, refreshPlan.key)
+	r.NotNil(refreshPlan.cached)
+	r.Equal(time.Date(2024, 1, 1, 23, 59, 0, 0, time.UTC), refreshPlan.tailFrom)
+	r.Equal(resultCacheStats{Hits: 1, Misses: 1, Entries: 1, Bytes: len(plan.key)}, cache.stats())
+
+	for _, notCacheable := range []string{
+		"$rate(count() AS c) FROM $table WHERE $timeFilter",
+		"SELECT $timeSeries AS t, count() FROM $table WHERE $timeFilter GROUP BY t ORDER BY t LIMIT 10",
+		"SELECT $timeSeries AS t, count() FROM $table WHERE EventTime > $from GROUP BY t",
+		"SELECT toStartOfHour(EventTime) AS t, count() FROM $table WHERE $timeFilter GROUP BY t",
+	} {
+		q = newResultCacheTestQuery(notCacheable, from, from.Add(24*time.Hour))
+		_, err = q.ApplyMacrosAndTimeRangeToQuery()
+		r.NoError(err)
+		_, isCacheable, err = cache.newResultCachePlan(q)
+		r.NoError(err)
+		r.False(isCacheable, notCacheable)
+	}
+
+	q = newResultCacheTestQuery(query, from, from.Add(24*time.Hour))
+	q.Round = ""
+	_, err = q.ApplyMacrosAndTimeRangeToQuery()
+	r.NoError(err)
+	_, isCacheable, err = cache.newResultCachePlan(q)
+	r.NoError(err)
+	r.False(isCacheable, "first bucket of not rounded range is incomplete")
+}
+
+func TestMergeTimeSeriesFrames(t *testing.T) {
+	r := require.New(t)
+	minute := func(m int) time.Time {
+		return time.Date(2024, 1, 1, 0, m, 0, 0, time.UTC)
+	}
+	newSeries := func(host string, minutes []int, values []float64) *data.Frame {
+		times := make([]time.Time, len(minutes))
+		for i, m := range minutes {
+			times[i] = minute(m)
+		}
+		frame := data.NewFrame(host,
+			data.NewField("t", nil, times),
+			data.NewField("count", data.Labels{"host": host}, values),
+		)
+		frame.RefID = "A"
+		return frame
+	}
+	cached := data.Frames{
+		newSeries("a", []int{0, 1, 2, 3}, []float64{1, 2, 3, 4}),
+		newSeries("b", []int{0}, []float64{5}),
+	}
+	tail := data.Frames{
+		newSeries("c", []int{2, 3, 4}, []float64{7, 8, 9}),
+		newSeries("a", []int{3, 4}, []float64{40, 50}),
+	}
+
+	merged, isMerged := mergeTimeSeriesFrames(cached, tail, minute(1), minute(3))
+	r.True(isMerged)
+	r.Len(merged, 2, "series b is outside of new time range")
+	r.Equal(data.Frames{
+		newSeries("a", []int{1, 2, 3, 4}, []float64{2, 3, 40, 50}),
+		newSeries("c", []int{3, 4}, []float64{8, 9}),
+	}, merged)
+	r.Equal(4, cached[0].Rows(), "cached frames shall not be changed")
+
+	_, isMerged = mergeTimeSeriesFrames(cached, data.Frames{data.NewFrame("x", data.NewField("v", nil, []float64{1}))}, minute(1), minute(3))
+	r.False(isMerged)
+}
+
+func TestResultCacheEviction(t *testing.T) {
+	r := require.New(t)
+	frames := data.Frames{data.NewFrame("", data.NewField("t", nil, []time.Time{time.Unix(0, 0)}))}
+	entrySize := len("a") + framesSize(frames)
+	cache := newResultCache(entrySize*2, time.Minute)
+	cache.set("a", time.Unix(0, 0), time.Unix(60, 0), frames)
+	cache.set("b", time.Unix(0, 0), time.Unix(60, 0), frames)
+	_, isCached := cache.get("a")
+	r.True(isCached)
+	cache.set("c", time.Unix(0, 0), time.Unix(60, 0), frames)
+	_, isCached = cache.get("b")
+	r.False(isCached)
+	r.Equal(resultCacheStats{Evictions: 1, Entries: 2, Bytes: entrySize * 2}, cache.stats())
+}
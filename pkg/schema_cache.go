@@ -0,0 +1,276 @@
+package main
+
+import (
+	"context"
+	"fmt"
+	"net/url"
+	"regexp"
+	"slices"
+	"strconv"
+	"strings"
+	"sync"
+	"time"
+
+	"github.com/grafana/grafana-plugin-sdk-go/backend"
+)
+
+const SchemaDatabasesQuery = "SELECT name FROM system.databases ORDER BY name FORMAT JSON"
+const SchemaColumnsQuery = "SELECT database, table, name, type FROM system.columns ORDER BY database, table FORMAT JSON"
+
+// SchemaRefreshTimeout limits background refresh of expired schema
+const SchemaRefreshTimeout = time.Minute
+
+// schemaResources are paths of CallResource served from schemaCache
+var schemaResources = []string{"databases", "tables", "columns"}
+
+var systemDatabases = []string{"system", "INFORMATION_SCHEMA", "information_schema"}
+
+var enumValueRE = regexp.MustCompile(`'((?:[^'\\]|\\.|'')*)'\s*=`)
+
+// schemaCache keeps databases and columns of ClickHouse server for ad-hoc filters and query builder of all dashboards,
+// expired schema is still served while one background query refreshes it
+type schemaCache struct {
+	mu         sync.Mutex
+	ttl        time.Duration
+	load       func(ctx context.Context) (*schema, error)
+	schema     *schema
+	fetchedAt  time.Time
+	refreshing bool
+	// loading is the first load which is awaited by all requests till schema is loaded
+	loading *schemaLoad
+}
+
+// schemaLoad is closed when load is finished, err is set before close
+type schemaLoad struct {
+	done chan struct{}
+	err  error
+}
+
+type schema struct {
+	databases []string
+	columns   []schemaColumn
+}
+
+type schemaColumn struct {
+	Database   string   `json:"database"`
+	Table      string   `json:"table"`
+	Name       string   `json:"name"`
+	Type       string   `json:"type"`
+	EnumValues []string `json:"enumValues,omitempty"`
+}
+
+type schemaTable struct {
+	Database string `json:"database"`
+	Name     string `json:"name"`
+}
+
+// schemaResourceResponse is one page of items matched by filter, total is count of all matched items
+type schemaResourceResponse struct {
+	Items interface{} `json:"items"`
+	Total int         `json:"total"`
+}
+
+func newSchemaCache(ttl time.Duration, load func(ctx context.Context) (*schema, error)) *schemaCache {
+	return &schemaCache{ttl: ttl, load: load}
+}
+
+func (c *schemaCache) get(ctx context.Context) (*schema, error) {
+	c.mu.Lock()
+	if c.schema == nil {
+		// the first load runs without lock, concurrent requests wait for it instead of sending the same query,
+		// and return when their own context is done
+		load := c.loading
+		if load == nil {
+			load = &schemaLoad{done: make(chan struct{})}
+			c.loading = load
+			go c.firstLoad(load)
+		}
+		c.mu.Unlock()
+		select {
+		case <-load.done:
+		case <-ctx.Done():
+			return nil, ctx.Err()
+		}
+		if load.err != nil {
+			return nil, load.err
+		}
+		c.mu.Lock()
+	}
+	defer c.mu.Unlock()
+	if time.Since(c.fetchedAt) > c.ttl && !c.refreshing {
+		c.refreshing = true
+		go c.refresh()
+	}
+	return c.schema, nil
+}
+
+// firstLoad is not bound to context of request which started it, so cancelled request doesn't fail other waiters
+func (c *schemaCache) firstLoad(load *schemaLoad) {
+	ctx, cancel := context.WithTimeout(context.Background(), SchemaRefreshTimeout)
+	defer cancel()
+	loaded, err := c.load(ctx)
+	c.mu.Lock()
+	if err == nil {
+		c.schema, c.fetchedAt = loaded, time.Now()
+	}
+	// failed load is repeated by the next request
+	c.loading = nil
+	c.mu.Unlock()
+	load.err = err
+	close(load.done)
+}
+
+func (c *schemaCache) refresh() {
+	ctx, cancel := context.WithTimeout(context.Background(), SchemaRefreshTimeout)
+	defer cancel()
+	loaded, err := c.load(ctx)
+	c.mu.Lock()
+	defer c.mu.Unlock()
+	c.refreshing = false
+	if err != nil {
+		// expired schema is served until the next attempt after ttl
+		backend.Logger.Warn(fmt.Sprintf("unable to refresh ClickHouse schema: %v", err))
+		c.fetchedAt = time.Now()
+		return
+	}
+	c.schema, c.fetchedAt = loaded, time.Now()
+}
+
+// FetchSchema reads databases and columns of all tables available for datasource user
+func (client *ClickHouseClient) FetchSchema(ctx context.Context) (*schema, error) {
+	databases, err := client.Query(ctx, SchemaDatabasesQuery)
+	if err != nil {
+		return nil, fmt.Errorf("unable to fetch databases: %w", err)
+	}
+	columns, err := client.Query(ctx, SchemaColumnsQuery)
+	if err != nil {
+		return nil, fmt.Errorf("unable to fetch columns: %w", err)
+	}
+	fetched := &schema{
+		databases: make([]string, 0, len(databases.Data)),
+		columns:   make([]schemaColumn, 0, len(columns.Data)),
+	}
+	for _, row := range databases.Data {
+		fetched.databases = append(fetched.databases, fmt.Sprint(row["name"]))
+	}
+	for _, row := range columns.Data {
+		column := schemaColumn{
+			Database: fmt.Sprint(row["database"]),
+			Table:    fmt.Sprint(row["table"]),
+			Name:     fmt.Sprint(row["name"]),
+			Type:     fmt.Sprint(row["type"]),
+		}
+		column.EnumValues = schemaEnumValues(column.Type)
+		fetched.columns = append(fetched.columns, column)
+	}
+	return fetched, nil
+}
+
+// schemaEnumValues returns values of Enum8, Enum16 and Enum types in declaration order,
+// including wrapped into Nullable or LowCardinality
+func schemaEnumValues(columnType string) []string {
+	if !strings.Contains(columnType, "Enum") {
+		return nil
+	}
+	matches := enumValueRE.FindAllStringSubmatch(columnType, -1)
+	if len(matches) == 0 {
+		return nil
+	}
+	values := make([]string, len(matches))
+	for i, match := range matches {
+		values[i] = strings.NewReplacer(`\'`, `'`, `''`, `'`, `\\`, `\`).Replace(match[1])
+	}
+	return values
+}
+
+// typeFamily returns type name without parameters, e.g. DateTime for DateTime('UTC')
+func typeFamily(columnType string) string {
+	family, _, _ := strings.Cut(columnType, "(")
+	return strings.TrimSpace(family)
+}
+
+// find returns page of databases, tables or columns matched by query params:
+// database, table, prefix (case-insensitive name prefix), types (comma separated type families),
+// excludeSystem, offset and limit (0 means all items)
+func (s *schema) find(resource string, params url.Values) (*schemaResourceResponse, error) {
+	database := params.Get("database")
+	table := params.Get("table")
+	prefix := strings.ToLower(params.Get("prefix"))
+	excludeSystem := params.Get("excludeSystem") == "true"
+	var types []string
+	if params.Get("types") != "" {
+		types = strings.Split(params.Get("types"), ",")
+	}
+	offset, err := parseNonNegativeParam(params, "offset")
+	if err != nil {
+		return nil, err
+	}
+	limit, err := parseNonNegativeParam(params, "limit")
+	if err != nil {
+		return nil, err
+	}
+	matchName := func(name string) bool {
+		return prefix == "" || strings.HasPrefix(strings.ToLower(name), prefix)
+	}
+	matchDatabase := func(name string) bool {
+		return (database == "" || name == database) && !(excludeSystem && slices.Contains(systemDatabases, name))
+	}
+
+	switch resource {
+	case "databases":
+		var items []string
+		for _, name := range s.databases {
+			if matchDatabase(name) && matchName(name) {
+				items = append(items, name)
+			}
+		}
+		return newSchemaResourceResponse(items, offset, limit), nil
+	case "tables":
+		var items []schemaTable
+		for _, column := range s.columns {
+			if !matchDatabase(column.Database) || !matchName(column.Table) {
+				continue
+			}
+			if n := len(items); n == 0 || items[n-1].Database != column.Database || items[n-1].Name != column.Table {
+				items = append(items, schemaTable{Database: column.Database, Name: column.Table})
+			}
+		}
+		return newSchemaResourceResponse(items, offset, limit), nil
+	case "columns":
+		var items []schemaColumn
+		for _, column := range s.columns {
+			if matchDatabase(column.Database) && (table == "" || column.Table == table) && matchName(column.Name) &&
+				(types == nil || slices.Contains(types, typeFamily(column.Type))) {
+				items = append(items, column)
+			}
+		}
+		return newSchemaResourceResponse(items, offset, limit), nil
+	default:
+		return nil, fmt.Errorf("unknown resource %s, allowed: databases, tables, columns", resource)
+	}
+}
+
+func newSchemaResourceResponse[T any](items []T, offset, limit int) *schemaResourceResponse {
+	total := len(items)
+	offset = min(offset, total)
+	end := total
+	if limit > 0 {
+		end = min(offset+limit, total)
+	}
+	page := items[offset:end]
+	if page == nil {
+		page = []T{}
+	}
+	return &schemaResourceResponse{Items: page, Total: total}
+}
+
+func parseNonNegativeParam(params url.Values, name string) (int, error) {
+	if params.Get(name) == "" {
+		return 0, nil
+	}
+	value, err := strconv.Atoi(params.Get(name))
+	if err != nil || value < 0 {
+		return 0, fmt.Errorf("invalid %s=%s, non negative integer expected", name, params.Get(name))
+	}
+	return value, nil
+}
@@ -0,0 +1,145 @@
+package main
+
+import (
+	"context"
+	"errors"
+	"net/url"
+	"sync/atomic"
+	"testing"
+	"time"
+
+	"github.com/stretchr/testify/require"
+)
+
+var testSchema = &schema{
+	databases: []string{"INFORMATION_SCHEMA", "default", "logs", "system"},
+	columns: []schemaColumn{
+		{Database: "default", Table: "requests", Name: "EventDate", Type: "Date"},
+		{Database: "default", Table: "requests", Name: "EventTime", Type: "DateTime('UTC')"},
+		{Database: "default", Table: "requests", Name: "Host", Type: "LowCardinality(String)"},
+		{Database: "default", Table: "requests", Name: "Method", Type: "Enum8('GET' = 1, 'POST' = 2)", EnumValues: []string{"GET", "POST"}},
+		{Database: "default", Table: "users", Name: "Name", Type: "String"},
+		{Database: "logs", Table: "events", Name: "Timestamp", Type: "DateTime64(3)"},
+		{Database: "system", Table: "tables", Name: "name", Type: "String"},
+	},
+}
+
+func TestSchemaFind(t *testing.T) {
+	r := require.New(t)
+	find := func(resource string, query string) *schemaResourceResponse {
+		params, err := url.ParseQuery(query)
+		r.NoError(err)
+		response, err := testSchema.find(resource, params)
+		r.NoError(err)
+		return response
+	}
+
+	r.Equal(&schemaResourceResponse{Items: []string{"default", "logs"}, Total: 2}, find("databases", "excludeSystem=true"))
+	r.Equal(&schemaResourceResponse{Items: []string{"logs"}, Total: 1}, find("databases", "prefix=LO"))
+
+	r.Equal(&schemaResourceResponse{
+		Items: []schemaTable{{Database: "default", Name: "requests"}, {Database: "default", Name: "users"}},
+		Total: 2,
+	}, find("tables", "database=default"))
+	r.Equal(&schemaResourceResponse{
+		Items: []schemaTable{{Database: "logs", Name: "events"}},
+		Total: 3,
+	}, find("tables", "excludeSystem=true&offset=2&limit=5"))
+
+	columns := find("columns", "database=default&table=requests&prefix=event")
+	r.Equal(2, columns.Total)
+	r.Equal("EventTime", columns.Items.([]schemaColumn)[1].Name)
+	r.Equal(3, find("columns", "types=Date,DateTime,DateTime64").Total)
+	r.Equal(&schemaResourceResponse{Items: []schemaColumn{}, Total: 6}, find("columns", "excludeSystem=true&offset=10&limit=1"))
+
+	_, err := testSchema.find("columns", url.Values{"limit": {"-1"}})
+	r.ErrorContains(err, "invalid limit=-1")
+	_, err = testSchema.find("dictionaries", url.Values{})
+	r.ErrorContains(err, "unknown resource dictionaries")
+}
+
+func TestSchemaEnumValues(t *testing.T) {
+	r := require.New(t)
+	r.Equal([]string{"GET", "POST"}, schemaEnumValues("Enum8('GET' = 1, 'POST' = 2)"))
+	r.Equal([]string{"it's", "a=b"}, schemaEnumValues(`Nullable(Enum16('it\'s' = -1, 'a=b' = 1000))`))
+	r.Nil(schemaEnumValues("LowCardinality(String)"))
+	r.Equal("DateTime64", typeFamily("DateTime64(3, 'UTC')"))
+}
+
+func TestSchemaCacheRefresh(t *testing.T) {
+	r := require.New(t)
+	var loads atomic.Int32
+	var failRefresh atomic.Bool
+	cache := newSchemaCache(50*time.Millisecond, func(ctx context.Context) (*schema, error) {
+		if failRefresh.Load() {
+			return nil, errors.New("connection refused")
+		}
+		n := loads.Add(1)
+		return &schema{databases: []string{string(rune('a' + n - 1))}}, nil
+	})
+
+	loaded, err := cache.get(context.Background())
+	r.NoError(err)
+	r.Equal([]string{"a"}, loaded.databases)
+	loaded, _ = cache.get(context.Background())
+	r.Equal([]string{"a"}, loaded.databases)
+	r.Equal(int32(1), loads.Load())
+
+	// expired schema is returned while background refresh loads new one
+	time.Sleep(60 * time.Millisecond)
+	loaded, _ = cache.get(context.Background())
+	r.Equal([]string{"a"}, loaded.databases)
+	r.Eventually(func() bool {
+		loaded, _ := cache.get(context.Background())
+		return loaded.databases[0] == "b"
+	}, time.Second, 5*time.Millisecond)
+
+	// failed refresh keeps previous schema
+	failRefresh.Store(true)
+	time.Sleep(60 * time.Millisecond)
+	_, _ = cache.get(context.Background())
+	r.Eventually(func() bool {
+		cache.mu.Lock()
+		defer cache.mu.Unlock()
+		return !cache.refreshing
+	}, time.Second, 5*time.Millisecond)
+	loaded, err = cache.get(context.Background())
+	r.NoError(err)
+	r.Equal([]string{"b"}, loaded.databases)
+
+	failing := newSchemaCache(time.Minute, func(ctx context.Context) (*schema, error) {
+		return nil, errors.New("connection refused")
+	})
+	_, err = failing.get(context.Background())
+	r.ErrorContains(err, "connection refused")
+}
+
+func TestSchemaCacheFirstLoadWithoutLock(t *testing.T) {
+	r := require.New(t)
+	var loads atomic.Int32
+	release := make(chan struct{})
+	cache := newSchemaCache(time.Minute, func(ctx context.Context) (*schema, error) {
+		loads.Add(1)
+		<-release
+		return &schema{databases: []string{"default"}}, nil
+	})
+
+	// request with done context returns while the first load is still running
+	ctx, cancel := context.WithTimeout(context.Background(), 20*time.Millisecond)
+	defer cancel()
+	_, err := cache.get(ctx)
+	r.ErrorIs(err, context.DeadlineExceeded)
+
+	result := make(chan *schema)
+	for i := 0; i < 3; i++ {
+		go func() {
+			loaded, _ := cache.get(context.Background())
+			result <- loaded
+		}()
+	}
+	close(release)
+	for i := 0; i < 3; i++ {
+		r.Equal([]string{"default"}, (<-result).databases)
+	}
+	r.Equal(int32(1), loads.Load())
+}
@@ -1,6 +1,17 @@
+import { DataSourceGetTagValuesOptions } from '@grafana/data';
+import TagValuesCache from './tag_values_cache';
+
+const DefaultTagValuesLimit = 300;
+// seconds
+const DefaultTagValuesCacheTTL = 300;
+const TagValuesCacheMaxEntries = 200;
+
 export default class AdHocFilter {
   tagKeys: any[];
   tagValues: { [key: string]: any } = {};
+  tagValuesCache: TagValuesCache;
+  tagValuesLimit: number;
+  tagValuesMaxRowsToRead: number;
   datasource: any;
   query: string;
 
@@ -12,6 +23,12 @@ export default class AdHocFilter {
     this.tagKeys = [];
     this.tagValues = [];
     this.datasource = datasource;
+    this.tagValuesLimit = datasource.adHocValuesLimit || DefaultTagValuesLimit;
+    this.tagValuesMaxRowsToRead = datasource.adHocValuesMaxRowsToRead || 0;
+    this.tagValuesCache = new TagValuesCache(
+      (datasource.adHocValuesCacheTTL || DefaultTagValuesCacheTTL) * 1000,
+      TagValuesCacheMaxEntries
+    );
     let filter = queryFilter;
     if (datasource.defaultDatabase.length > 0) {
       filter = "database = '" + datasource.defaultDatabase + "' AND " + queryFilter;
@@ -23,18 +40,31 @@ export default class AdHocFilter {
   // if no filters applied all tables from all databases will be fetched
   // if datasource setting `defaultDatabase` is set only tables from that database will be fetched
   // if query param passed it will be performed instead of default
+  // default columns are fetched from schema cache of backend, `query` is used when backend is not available
   GetTagKeys(query?: string) {
     let self = this;
     if (this.tagKeys.length > 0) {
       return Promise.resolve(this.tagKeys);
     }
-    let q = this.query;
     if (query && query.length > 0) {
-      q = query;
+      return this.datasource.metricFindQuery(query).then(function (response: any) {
+        return self.processTagKeysResponse(response);
+      });
     }
-    return this.datasource.metricFindQuery(q).then(function (response: any) {
-      return self.processTagKeysResponse(response);
-    });
+    const params: any = { excludeSystem: true };
+    if (this.datasource.defaultDatabase.length > 0) {
+      params.database = this.datasource.defaultDatabase;
+    }
+    return this.datasource
+      .fetchSchema('columns', params)
+      .then(function (response: any) {
+        return self.processTagKeysResponse(response.items);
+      })
+      .catch(function () {
+        return self.datasource.metricFindQuery(self.query).then(function (response: any) {
+          return self.processTagKeysResponse(response);
+        });
+      });
   }
 
   processTagKeysResponse(response: any): Promise<any[]> {
@@ -47,7 +77,14 @@ export default class AdHocFilter {
 
       this.tagKeys.push({ text, value });
 
-      if (item.type.slice(0, 4) === 'Enum') {
+      if (item.enumValues && item.enumValues.length > 0) {
+        // values parsed by backend are unquoted, quote them the same way as ClickHouse does in Enum type
+        this.tagValues[text] = item.enumValues.map((v: string) => {
+          const o = "'" + v.replace(/\\/g, '\\\\').replace(/'/g, "\\'") + "'";
+          return { text: o, value: o };
+        });
+        this.tagValues[item.name] = this.tagValues[text];
+      } else if (item.type.slice(0, 4) === 'Enum') {
         const regexEnum = /'(?:[^']+|'')+'/gim;
         const options = item.type.match(regexEnum) || [];
 
@@ -70,14 +107,18 @@ export default class AdHocFilter {
 
   // GetTagValues returns column values according to passed options
   // Values for fields with Enum type were already fetched in GetTagKeys func and stored in `tagValues`
-  // Values for fields which not represented on `tagValues` get from ClickHouse and cached on `tagValues`
-  GetTagValues(options: any) {
-    const valuesQuery = 'SELECT DISTINCT {field} AS value FROM {database}.{table} LIMIT 300';
+  // Values for other fields are fetched from ClickHouse with LIMIT and cached in `tagValuesCache` with TTL
+  GetTagValues(options: DataSourceGetTagValuesOptions) {
+    const valuesQuery = 'SELECT DISTINCT {field} AS value FROM {database}.{table} LIMIT {limit}{settings}';
 
     let self = this;
     if (this.tagValues.hasOwnProperty(options.key)) {
       return Promise.resolve(this.tagValues[options.key]);
     }
+    const cached = this.tagValuesCache.get(options.key);
+    if (cached) {
+      return Promise.resolve(cached);
+    }
     let key_items = options.key.split('.');
     if (
       key_items.length < 2 ||
@@ -98,16 +139,26 @@ export default class AdHocFilter {
       database = self.datasource.defaultDatabase;
       [table, field] = key_items;
     }
-    let q = valuesQuery.replace('{field}', field).replace('{database}', database).replace('{table}', table);
+    // max_rows_to_read guards scan of huge tables, result read till the limit may miss values
+    let settings = '';
+    if (this.tagValuesMaxRowsToRead > 0) {
+      settings = " SETTINGS max_rows_to_read=" + this.tagValuesMaxRowsToRead + ", read_overflow_mode='break'";
+    }
+    let q = valuesQuery
+      .replace('{field}', field)
+      .replace('{database}', database)
+      .replace('{table}', table)
+      .replace('{limit}', String(this.tagValuesLimit))
+      .replace('{settings}', settings);
 
     return this.datasource.metricFindQuery(q).then(function (response: any) {
-      self.tagValues[options.key] = self.processTagValuesResponse(response);
-      return self.tagValues[options.key];
+      const values = self.processTagValuesResponse(response);
+      self.tagValuesCache.set(options.key, values);
+      return values;
     });
   }
 
   processTagValuesResponse(response: any) {
-    const tagValues = response.map((item: any) => ({ text: item.text, value: item.text }));
-    return Promise.resolve(tagValues);
+    return response.map((item: any) => ({ text: item.text, value: item.text }));
   }
 }
@@ -9,12 +9,13 @@ import {
   AnnotationEvent,
   DataQueryRequest,
   DataSourceApi,
+  DataSourceGetTagValuesOptions,
   DataSourceInstanceSettings,
   TypedVariableModel
 } from '@grafana/data';
 import { BackendSrv, getBackendSrv, getTemplateSrv, TemplateSrv } from '@grafana/runtime';
 
-import { CHDataSourceOptions, CHQuery, DEFAULT_QUERY } from '../types/types';
+import { CHDataSourceOptions, CHQuery, DEFAULT_QUERY, SchemaParams, SchemaResponse } from '../types/types';
 import { SqlQueryHelper } from './sql-query/sql-query-helper';
 import SqlQueryMacros from './sql-query/sql-query-macros';
 import { QueryEditor } from "../views/QueryEditor/QueryEditor";
@@ -39,6 +40,9 @@ export class CHDataSource extends DataSourceApi<CHQuery, CHDataSourceOptions> {
   useYandexCloudAuthorization: boolean;
   useCompression: boolean;
   compressionType: string;
+  adHocValuesLimit: number;
+  adHocValuesCacheTTL: number;
+  adHocValuesMaxRowsToRead: number;
 
   constructor(instanceSettings: DataSourceInstanceSettings<CHDataSourceOptions>) {
     super(instanceSettings);
@@ -52,6 +56,9 @@ export class CHDataSource extends DataSourceApi<CHQuery, CHDataSourceOptions> {
     this.defaultDatabase = instanceSettings.jsonData.defaultDatabase || '';
     this.xHeaderUser = instanceSettings.jsonData.xHeaderUser || '';
     this.useYandexCloudAuthorization = instanceSettings.jsonData.useYandexCloudAuthorization || false;
+    this.adHocValuesLimit = instanceSettings.jsonData.adHocValuesLimit || 0;
+    this.adHocValuesCacheTTL = instanceSettings.jsonData.adHocValuesCacheTTL || 0;
+    this.adHocValuesMaxRowsToRead = instanceSettings.jsonData.adHocValuesMaxRowsToRead || 0;
     if (instanceSettings.jsonData.useDefaultConfiguration) {
       this.defaultValues = {
         dateTime: {
@@ -145,6 +152,27 @@ export class CHDataSource extends DataSourceApi<CHQuery, CHDataSourceOptions> {
     return dataRequest
   }
 
+  // fetchSchema requests databases, tables or columns cached by backend, see CallResource in pkg/datasource.go
+  // supported params: database, table, prefix, types, excludeSystem, offset, limit
+  fetchSchema(resource: 'databases' | 'tables' | 'columns', params: SchemaParams = {}): Promise<SchemaResponse> {
+    return new Promise((resolve, reject) => {
+      this.backendSrv
+        .fetch<SchemaResponse>({
+          method: 'GET',
+          url: `/api/datasources/uid/${this.uid}/resources/${resource}`,
+          params,
+        })
+        .subscribe(
+          (response) => {
+            resolve(response?.data || { items: [], total: 0 });
+          },
+          (e) => {
+            reject(e);
+          }
+        );
+    });
+  }
+
   query(options: DataQueryRequest<CHQuery>) {
     this.options = options;
     const targets = options.targets.filter((target) => !target.hide && target.query);
@@ -181,7 +209,7 @@ export class CHDataSource extends DataSourceApi<CHQuery, CHDataSourceOptions> {
         });
 
         if (target.format === 'table') {
-          _.each(sqlSeries.toTable(), (data) => {
+          _.each(sqlSeries.toTableFrames(), (data) => {
             result.push(data);
           });
         } else if (target.format === 'traces') {
@@ -193,7 +221,7 @@ export class CHDataSource extends DataSourceApi<CHQuery, CHDataSourceOptions> {
         } else if (target.refId === 'Anno') {
           result = sqlSeries.toAnnotation(response.data);
         } else {
-          _.each(sqlSeries.toTimeSeries(target.extrapolate), (data) => {
+          _.each(sqlSeries.toTimeSeriesFrames(target.extrapolate), (data) => {
             result.push(data);
           });
         }
@@ -253,13 +281,16 @@ export class CHDataSource extends DataSourceApi<CHQuery, CHDataSourceOptions> {
     const adhocFilters = this.templateSrv?.getAdhocFilters(this.adHocFilter?.datasource?.name || 'clickhouse') || []
     const stmt = queryModel.replace(options, adhocFilters);
 
-    let keys = [];
-
-    try {
-      let queryAST = new Scanner(stmt).toAST();
-      keys = queryAST['group by'] || [];
-    } catch (err) {
-      console.log('AST parser error: ', err);
+    // GROUP BY keys are extracted by queryModel from the same AST as macros,
+    // rendered statement is parsed only when keys contain macros or variables
+    let keys = queryModel.keys || [];
+    if (!queryModel.keys && stmt) {
+      try {
+        let queryAST = new Scanner(stmt).toAST();
+        keys = queryAST['group by'] || [];
+      } catch (err) {
+        console.log('AST parser error: ', err);
+      }
     }
 
     return {
@@ -346,7 +377,6 @@ export class CHDataSource extends DataSourceApi<CHQuery, CHDataSourceOptions> {
 
   formatQuery(query) {
     let scanner = new Scanner(query ?? '');
-    scanner.Format()
     return scanner.Format()
   }
 
@@ -372,7 +402,7 @@ export class CHDataSource extends DataSourceApi<CHQuery, CHDataSourceOptions> {
     return this.adHocFilter.GetTagKeys(queryFilter);
   }
 
-  getTagValues(options: any) {
+  getTagValues(options: DataSourceGetTagValuesOptions) {
     return this.adHocFilter.GetTagValues(options);
   }
 
@@ -0,0 +1,233 @@
+import Scanner, { lexToken, ScannerSection } from './scanner';
+
+// multi-word tokens like `global any left outer join` consist of at most 9 words and whitespaces,
+// so edit can't change tokens which start more than BackoffTokens tokens before it
+const BackoffTokens = 16;
+
+const wsOnlyRe = /^\s+$/;
+const inOnlyRe = /^(global in|global not in|not in|in)$/i;
+
+// IncrementalScanner keeps tokens and AST of query between editor changes,
+// after edit only tokens from the nearest safe token boundary are lexed again till they match previous tokens,
+// and AST section which contains changed tokens is parsed again instead of the whole query
+export default class IncrementalScanner {
+  text = '';
+  tokens: string[] = [];
+  starts: number[] = [];
+  // offsets of `/*` and `--` which were not lexed as comments and `in [` of lists which were not lexed as one token,
+  // edit after them can change tokens far behind, so the whole query is lexed again
+  markers: number[] = [];
+  ast: any = null;
+  sections: ScannerSection[] = [];
+  // how AST was built by the last edit: full, patch or none when AST sections were not changed
+  lastUpdate = '';
+  // amount of tokens lexed by the last edit
+  lastLexed = 0;
+
+  // update returns AST of changed text, changed range is found as difference with previous text
+  update(text: string) {
+    if (text === this.text && this.ast !== null) {
+      this.lastUpdate = 'none';
+      this.lastLexed = 0;
+      return this.ast;
+    }
+    const oldText = this.text;
+    let start = 0;
+    const maxPrefix = Math.min(oldText.length, text.length);
+    while (start < maxPrefix && oldText.charCodeAt(start) === text.charCodeAt(start)) {
+      start++;
+    }
+    let oldEnd = oldText.length,
+      newEnd = text.length;
+    while (oldEnd > start && newEnd > start && oldText.charCodeAt(oldEnd - 1) === text.charCodeAt(newEnd - 1)) {
+      oldEnd--;
+      newEnd--;
+    }
+    return this.applyEdit(start, oldEnd - start, text.substring(start, newEnd));
+  }
+
+  // applyEdit replaces deleteLength chars at offset with insertText, and returns AST of changed text
+  applyEdit(offset: number, deleteLength: number, insertText: string) {
+    const text = this.text.slice(0, offset) + insertText + this.text.slice(offset + deleteLength);
+    if (this.ast === null || this.tokens.length === 0) {
+      return this.reset(text);
+    }
+    const oldEnd = offset + deleteLength;
+    const newEnd = offset + insertText.length;
+    const delta = newEnd - oldEnd;
+
+    const i = this.tokenAt(offset);
+    const j = Math.max(0, i - BackoffTokens);
+    if (this.markers.length > 0 && this.markers[0] < this.starts[j]) {
+      return this.reset(text);
+    }
+
+    // lex from token j till new token starts at the same place as one of previous tokens after the edit,
+    // text after that place is the same, so the rest of tokens are the same
+    let k = i;
+    let pos = this.starts[j];
+    const newTokens: string[] = [];
+    const newStarts: number[] = [];
+    try {
+      while (pos < text.length) {
+        while (k < this.tokens.length && (this.starts[k] < oldEnd || this.starts[k] + delta < pos)) {
+          k++;
+        }
+        if (pos >= newEnd && k < this.tokens.length && this.starts[k] + delta === pos) {
+          break;
+        }
+        const token = lexToken(text.substring(pos));
+        newTokens.push(token);
+        newStarts.push(pos);
+        pos += token.length;
+      }
+    } catch (err) {
+      return this.reset(text);
+    }
+    if (pos >= text.length) {
+      k = this.tokens.length;
+    }
+
+    // the first changed token and the end of changed tokens in previous text
+    let d = 0;
+    while (
+      d < newTokens.length &&
+      j + d < k &&
+      newTokens[d] === this.tokens[j + d] &&
+      newStarts[d] === this.starts[j + d]
+    ) {
+      d++;
+    }
+    const changedStart = j + d < this.tokens.length ? this.starts[j + d] : this.text.length;
+    const changedOldEnd = k < this.tokens.length ? this.starts[k] : this.text.length;
+
+    const markersFrom = Math.max(0, j - 2);
+    const markersLow = this.starts[markersFrom];
+    const markersHigh = k + 2 < this.tokens.length ? this.starts[k + 2] : Infinity;
+    for (let x = k; x < this.starts.length; x++) {
+      this.starts[x] += delta;
+    }
+    this.tokens.splice(j, k - j, ...newTokens);
+    this.starts.splice(j, k - j, ...newStarts);
+    this.markers = this.markers
+      .filter((m) => m < markersLow)
+      .concat(this.findMarkers(markersFrom, j + newTokens.length + 2))
+      .concat(this.markers.filter((m) => m >= markersHigh).map((m) => m + delta));
+
+    this.text = text;
+    this.lastLexed = newTokens.length;
+    return this.patch(changedStart, changedOldEnd, delta);
+  }
+
+  // patch parses again section of AST which contains changed tokens
+  patch(changedStart: number, changedOldEnd: number, delta: number) {
+    const sectionKeys = this.sections.map((s) => s.key);
+    const astKeys = Object.keys(this.ast);
+    // joins and macro functions add keys from the middle of sections
+    if (astKeys.length !== sectionKeys.length || !astKeys.every((key) => sectionKeys.includes(key))) {
+      return this.parse();
+    }
+    const n = this.sections.findIndex((section, idx) => {
+      const end = idx + 1 < this.sections.length ? this.sections[idx + 1].keywordStart : Infinity;
+      return section.start <= changedStart && changedOldEnd <= end;
+    });
+    if (n === -1) {
+      return this.parse();
+    }
+    const section = this.sections[n];
+    const next = this.sections[n + 1];
+    const contentEnd = next ? next.keywordStart + delta : this.text.length;
+
+    const previousSection = {};
+    const tree: any = {};
+    for (let idx = 0; idx < n; idx++) {
+      tree[this.sections[idx].key] = previousSection;
+    }
+    const scanner = new Scanner(this.text.substring(section.start, contentEnd));
+    try {
+      scanner.parseSection(section.key, tree);
+    } catch (err) {
+      return this.parse();
+    }
+    const treeKeys = Object.keys(tree);
+    if (
+      // sub-queries which are not closed in section are looked for in the rest of query
+      scanner.unclosed ||
+      scanner.sections.length !== 1 ||
+      treeKeys.length !== n + 1 ||
+      treeKeys.some((key) => key !== section.key && tree[key] !== previousSection) ||
+      (next && (!scanner.closured || scanner.expectedNext))
+    ) {
+      return this.parse();
+    }
+
+    this.ast = { ...this.ast, [section.key]: tree[section.key] };
+    this.sections = this.sections.map((s, idx) =>
+      idx <= n ? s : { key: s.key, keywordStart: s.keywordStart + delta, start: s.start + delta }
+    );
+    this.lastUpdate = 'patch';
+    return this.ast;
+  }
+
+  // reset lexes and parses the whole text
+  reset(text: string) {
+    this.text = text;
+    this.ast = null;
+    this.tokens = [];
+    this.starts = [];
+    let pos = 0;
+    try {
+      while (pos < text.length) {
+        const token = lexToken(text.substring(pos));
+        this.tokens.push(token);
+        this.starts.push(pos);
+        pos += token.length;
+      }
+    } catch (err) {
+      this.tokens = [];
+      this.starts = [];
+    }
+    this.markers = this.findMarkers(0, this.tokens.length);
+    this.lastLexed = this.tokens.length;
+    return this.parse();
+  }
+
+  parse() {
+    this.ast = null;
+    const scanner = new Scanner(this.text);
+    const ast = scanner.toAST();
+    this.ast = ast;
+    this.sections = scanner.sections;
+    this.lastUpdate = 'full';
+    return ast;
+  }
+
+  // tokenAt returns index of token which contains offset, or the last token
+  tokenAt(offset: number): number {
+    let lo = 0,
+      hi = this.starts.length - 1;
+    while (lo < hi) {
+      const mid = (lo + hi + 1) >> 1;
+      if (this.starts[mid] <= offset) {
+        lo = mid;
+      } else {
+        hi = mid - 1;
+      }
+    }
+    return lo;
+  }
+
+  findMarkers(from: number, to: number): number[] {
+    const markers: number[] = [];
+    for (let x = from; x < Math.min(to, this.tokens.length); x++) {
+      const token = this.tokens[x];
+      // `/*` and `--` are not comments only when comment is not closed or has odd amount of quotes
+      if ((token === '/' && this.tokens[x + 1] === '*') || (token === '-' && this.tokens[x + 1] === '-')) {
+        markers.push(this.starts[x]);
+      } else if (inOnlyRe.test(token) && wsOnlyRe.test(this.tokens[x + 1] || '') && this.tokens[x + 2] === '[') {
+        markers.push(this.starts[x]);
+      }
+    }
+    return markers;
+  }
+}
@@ -130,6 +130,25 @@ const tokenRe = [
   macroRe,
 ].join('|');
 
+// compiled once, regexp without `g` flag keeps no state between exec calls
+const tokenStartRe = new RegExp('^(?:' + tokenRe + ')', 'i');
+
+// lexToken returns the first token of s, tokens don't depend on text before s
+export function lexToken(s: string): string {
+  let r = tokenStartRe.exec(s);
+  if (r === null) {
+    throw 'cannot find next token in [' + s + ']';
+  }
+  return r[0];
+}
+
+// ScannerSection is top level statement of query, content is between keyword and the next section keyword
+export interface ScannerSection {
+  key: string;
+  keywordStart: number;
+  start: number;
+}
+
 const tabSize = '    '; // 4 spaces
 const newLine = '\n';
 
@@ -143,6 +162,10 @@ export default class Scanner {
 
   _sOriginal: any;
   _s: any;
+  // sections are recorded by toAST for IncrementalScanner
+  sections: ScannerSection[] = [];
+  closured: boolean | undefined;
+  unclosed = false;
 
   /** @ngInject */
   constructor(s) {
@@ -154,6 +177,15 @@ export default class Scanner {
     return this._sOriginal;
   }
 
+  // betweenBraces returns text till closing brace, unclosed is set when closing brace is not found
+  betweenBraces(): string {
+    const subQuery = betweenBraces(this._s);
+    if (this._s.charAt(subQuery.length) !== ')') {
+      this.unclosed = true;
+    }
+    return subQuery;
+  }
+
   expectNext() {
     if (!this.next()) {
       throw 'expecting additional token at the end of query [' + this._sOriginal + ']';
@@ -211,6 +243,8 @@ export default class Scanner {
   }
 
   setRoot(token) {
+    const start = this._sOriginal.length - this._s.length;
+    this.sections.push({ key: token.toLowerCase(), keywordStart: start - (token === 'root' ? 0 : token.length), start });
     this.rootToken = token.toLowerCase();
     this.tree[this.rootToken] = [];
     this.expectedNext = true;
@@ -229,10 +263,27 @@ export default class Scanner {
   toAST() {
     this._s = this._sOriginal;
     this.tree = {};
+    this.sections = [];
     this.setRoot('root');
     this.expectedNext = false;
+    return this.parse();
+  }
+
+  // parseSection builds AST of one section content, tree contains keys of previous sections,
+  // see IncrementalScanner
+  parseSection(key: string, tree: any) {
+    this._s = this._sOriginal;
+    this.tree = tree;
+    this.sections = [];
+    this.unclosed = false;
+    this.setRoot(key);
+    this.expectedNext = key !== 'root';
+    return this.parse();
+  }
+
+  parse() {
     this.skipSpace = true;
-    this.re = new RegExp('^(?:' + tokenRe + ')', 'i');
+    this.re = tokenStartRe;
     let subQuery = '',
       argument = '';
 
@@ -265,7 +316,7 @@ export default class Scanner {
       }
 
       if (isClosureChars(this.token) && this.rootToken === 'from') {
-        subQuery = betweenBraces(this._s);
+        subQuery = this.betweenBraces();
         if (!isTableFunc(argument)) {
           this.tree[this.rootToken] = toAST(subQuery);
         } else {
@@ -282,7 +333,7 @@ export default class Scanner {
           throw 'wrong function signature for `' + func + '` at [' + this._s + ']';
         }
 
-        subQuery = betweenBraces(this._s);
+        subQuery = this.betweenBraces();
         let subAST = toAST(subQuery);
         if (isSet(subAST, 'root')) {
           this.tree[func] = subAST['root'].map(function (item) {
@@ -305,7 +356,7 @@ export default class Scanner {
         }
 
         if (isClosureChars(this.token)) {
-          subQuery = betweenBraces(this._s);
+          subQuery = this.betweenBraces();
           let subAST = toAST(subQuery);
           if (isSet(subAST, 'root')) {
             argument +=
@@ -380,6 +431,8 @@ export default class Scanner {
 
     }
 
+    // the next section keyword is recognized only after closured argument
+    this.closured = isClosured(argument);
     if (argument !== '') {
       this.push(argument);
     }
@@ -398,7 +451,7 @@ export default class Scanner {
     }
 
     if (isClosureChars(this.token)) {
-      let subQuery = betweenBraces(this._s);
+      let subQuery = this.betweenBraces();
       source = toAST(subQuery);
       this._s = this._s.substring(subQuery.length + 1);
       this.token = '';
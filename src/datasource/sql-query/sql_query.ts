@@ -1,14 +1,32 @@
-import { isArray } from 'lodash';
+import { cloneDeep, isArray } from 'lodash';
 import Scanner from '../scanner/scanner';
+import IncrementalScanner from '../scanner/incremental_scanner';
 import { TemplateSrv } from '@grafana/runtime';
 import { SqlQueryHelper } from './sql-query-helper';
 import SqlQueryMacros from './sql-query-macros';
 import {TimestampFormat} from "../../types/types";
 
+interface ExpandedQuery {
+  query: string;
+  adhocCondition: string[];
+  // keys are GROUP BY keys of rendered query, undefined when they can't be known before rendering
+  keys?: string[];
+}
+
+// expanded queries of recently refreshed targets, Map keeps insertion order, so the oldest are evicted first
+const expandedQueries: Map<string, ExpandedQuery> = new Map();
+const ExpandedQueriesMaxSize = 100;
+
+// scanners of recently edited targets, they keep tokens and AST of previous query text,
+// so each keystroke in editor lexes and parses only the changed part of query
+const incrementalScanners: Map<string, IncrementalScanner> = new Map();
+const IncrementalScannersMaxSize = 100;
+
 export default class SqlQuery {
   target: any;
   templateSrv: TemplateSrv;
   options: any;
+  keys?: string[];
 
   constructor(target: any, templateSrv: TemplateSrv, options: any) {
     this.target = target;
@@ -36,17 +54,83 @@ export default class SqlQuery {
       options.scopedVars,
       SqlQueryHelper.interpolateQueryExpr
     );
-    let scanner = new Scanner(query);
     let dateTimeType = this.target.dateTimeType ? this.target.dateTimeType : TimestampFormat.DateTime;
     let i = this.templateSrv.replace(this.target.interval, options.scopedVars) || options.interval;
     let interval = SqlQueryHelper.convertInterval(i, this.target.intervalFactor || 1);
     let intervalMs = SqlQueryHelper.convertInterval(i, this.target.intervalFactor || 1, true);
-    let adhocCondition: any[] = [];
 
-    // @ts-ignore
-    // adhocFilters = this.templateSrv.getAdhocFilters('clickhouse')
+    // AST is built only when templated query, ad-hoc filters or target table were changed since previous refresh
+    const cacheKey = JSON.stringify([query, adhocFilters, this.target.database, this.target.table]);
+    let expanded = expandedQueries.get(cacheKey);
+    if (expanded) {
+      expandedQueries.delete(cacheKey);
+    } else {
+      expanded = this.expand(query, adhocFilters);
+    }
+    expandedQueries.set(cacheKey, expanded);
+    if (expandedQueries.size > ExpandedQueriesMaxSize) {
+      expandedQueries.delete(expandedQueries.keys().next().value as string);
+    }
+    query = expanded.query;
+    this.keys = expanded.keys;
+    let adhocCondition = expanded.adhocCondition;
+
+    /* Render the ad-hoc condition or evaluate to an always true condition */
+    let renderedAdHocCondition = adhocCondition.length > 0 ? '(' + adhocCondition.join(' AND ') + ')' : '1';
+
+
+    query = SqlQueryHelper.unescape(query);
+    let timeFilter = SqlQueryMacros.getDateTimeFilter(dateTimeType);
+    let timeFilterMs = SqlQueryMacros.getDateTimeFilterMs(dateTimeType);
+    if (typeof this.target.dateColDataType === 'string' && this.target.dateColDataType.length > 0) {
+      timeFilter = SqlQueryMacros.getDateFilter() + ' AND ' + timeFilter;
+      timeFilterMs = SqlQueryMacros.getDateFilter() + ' AND ' + timeFilterMs;
+    }
+
+    let table = SqlQueryHelper.escapeTableIdentifier(this.target.table);
+    if (this.target.database) {
+      table = SqlQueryHelper.escapeTableIdentifier(this.target.database) + '.' + table;
+    }
+
+    let myround = this.target.round === '$step' ? interval : SqlQueryHelper.convertInterval(this.target.round, 1);
+    let from = SqlQueryHelper.convertTimestamp(SqlQueryHelper.round(this.options.range.from, myround));
+    let to = SqlQueryHelper.convertTimestamp(SqlQueryHelper.round(this.options.range.to, myround));
+
+    // TODO: replace
+    this.target.rawQuery = query
+      .replace(/\$timeSeries\b/g, SqlQueryMacros.getTimeSeries(dateTimeType))
+      .replace(/\$timeSeriesMs\b/g, SqlQueryMacros.getTimeSeriesMs(dateTimeType))
+      .replace(/\$naturalTimeSeries/g, SqlQueryMacros.getNaturalTimeSeries(dateTimeType, from, to))
+      .replace(/\$timeFilter\b/g, timeFilter)
+      .replace(/\$timeFilterMs\b/g, timeFilterMs)
+      .replace(/\$table\b/g, table)
+      .replace(/\$from\b/g, from.toString())
+      .replace(/\$to\b/g, to.toString())
+      .replace(/\$dateCol\b/g, SqlQueryHelper.escapeIdentifier(this.target.dateColDataType))
+      .replace(/\$dateTimeCol\b/g, SqlQueryHelper.escapeIdentifier(this.target.dateTimeColDataType))
+      .replace(/\$interval\b/g, interval.toString())
+      .replace(/\$__interval_ms\b/g, intervalMs.toString())
+      .replace(/\$adhoc\b/g, renderedAdHocCondition);
+
+    const round = this.target.round === '$step' ? interval : SqlQueryHelper.convertInterval(this.target.round, 1);
+    this.target.rawQuery = SqlQueryMacros.replaceTimeFilters(
+      this.target.rawQuery,
+      this.options.range,
+      dateTimeType,
+      round
+    );
+    return this.target.rawQuery;
+  }
+
+  // expand applies ad-hoc filters and macro functions with one AST of templated query,
+  // result depends only on query, ad-hoc filters and target table, so it is reused by next refreshes
+  expand(query: string, adhocFilters: any): ExpandedQuery {
+    let scanner = new Scanner(query);
+    let adhocCondition: any[] = [];
+    let keys: string[] | undefined;
     try {
-      let ast = scanner.toAST();
+      // AST of incremental scanner is reused by next edits, ad-hoc filters and macros change the copy
+      let ast = cloneDeep(this.incrementalScanner().update(query));
       let topQueryAST = ast;
       if (adhocFilters.length > 0) {
         /* Check sub queries for ad-hoc filters */
@@ -101,55 +185,35 @@ export default class SqlQuery {
         query = scanner.Print(topQueryAST);
       }
 
-      query = SqlQueryMacros.applyMacros(query, topQueryAST);
+      const macrosQuery = SqlQueryMacros.applyMacros(query, topQueryAST);
+      /* GROUP BY keys are taken from the same AST unless macros built new query */
+      let groupBy = topQueryAST['group by'];
+      if (macrosQuery !== query) {
+        query = macrosQuery;
+        groupBy = new Scanner(query).toAST()['group by'];
+      }
+      /* keys with macros and variables are known only after rendering */
+      if (!(groupBy || []).some((key: string) => key.includes('$'))) {
+        keys = (groupBy || []).slice();
+      }
     } catch (err) {
       console.error('AST parser error: ', err);
     }
+    return { query, adhocCondition, keys };
+  }
 
-    /* Render the ad-hoc condition or evaluate to an always true condition */
-    let renderedAdHocCondition = adhocCondition.length > 0 ? '(' + adhocCondition.join(' AND ') + ')' : '1';
-
-
-    query = SqlQueryHelper.unescape(query);
-    let timeFilter = SqlQueryMacros.getDateTimeFilter(dateTimeType);
-    let timeFilterMs = SqlQueryMacros.getDateTimeFilterMs(dateTimeType);
-    if (typeof this.target.dateColDataType === 'string' && this.target.dateColDataType.length > 0) {
-      timeFilter = SqlQueryMacros.getDateFilter() + ' AND ' + timeFilter;
-      timeFilterMs = SqlQueryMacros.getDateFilter() + ' AND ' + timeFilterMs;
+  incrementalScanner(): IncrementalScanner {
+    const key = `${this.options?.panelId}_${this.target.refId}`;
+    let scanner = incrementalScanners.get(key);
+    if (scanner) {
+      incrementalScanners.delete(key);
+    } else {
+      scanner = new IncrementalScanner();
     }
-
-    let table = SqlQueryHelper.escapeTableIdentifier(this.target.table);
-    if (this.target.database) {
-      table = SqlQueryHelper.escapeTableIdentifier(this.target.database) + '.' + table;
+    incrementalScanners.set(key, scanner);
+    if (incrementalScanners.size > IncrementalScannersMaxSize) {
+      incrementalScanners.delete(incrementalScanners.keys().next().value as string);
     }
-
-    let myround = this.target.round === '$step' ? interval : SqlQueryHelper.convertInterval(this.target.round, 1);
-    let from = SqlQueryHelper.convertTimestamp(SqlQueryHelper.round(this.options.range.from, myround));
-    let to = SqlQueryHelper.convertTimestamp(SqlQueryHelper.round(this.options.range.to, myround));
-
-    // TODO: replace
-    this.target.rawQuery = query
-      .replace(/\$timeSeries\b/g, SqlQueryMacros.getTimeSeries(dateTimeType))
-      .replace(/\$timeSeriesMs\b/g, SqlQueryMacros.getTimeSeriesMs(dateTimeType))
-      .replace(/\$naturalTimeSeries/g, SqlQueryMacros.getNaturalTimeSeries(dateTimeType, from, to))
-      .replace(/\$timeFilter\b/g, timeFilter)
-      .replace(/\$timeFilterMs\b/g, timeFilterMs)
-      .replace(/\$table\b/g, table)
-      .replace(/\$from\b/g, from.toString())
-      .replace(/\$to\b/g, to.toString())
-      .replace(/\$dateCol\b/g, SqlQueryHelper.escapeIdentifier(this.target.dateColDataType))
-      .replace(/\$dateTimeCol\b/g, SqlQueryHelper.escapeIdentifier(this.target.dateTimeColDataType))
-      .replace(/\$interval\b/g, interval.toString())
-      .replace(/\$__interval_ms\b/g, intervalMs.toString())
-      .replace(/\$adhoc\b/g, renderedAdHocCondition);
-
-    const round = this.target.round === '$step' ? interval : SqlQueryHelper.convertInterval(this.target.round, 1);
-    this.target.rawQuery = SqlQueryMacros.replaceTimeFilters(
-      this.target.rawQuery,
-      this.options.range,
-      dateTimeType,
-      round
-    );
-    return this.target.rawQuery;
+    return scanner;
   }
 }
@@ -1,5 +1,11 @@
 import { each, find, isArray, omitBy, pickBy } from 'lodash';
-import { DataFrame, FieldType, MutableDataFrame } from '@grafana/data';
+import {
+  DataFrame,
+  FieldType,
+  MutableDataFrame,
+  TIME_SERIES_TIME_FIELD_NAME,
+  TIME_SERIES_VALUE_FIELD_NAME,
+} from '@grafana/data';
 
 interface Trace {
   traceID: string;
@@ -25,6 +31,21 @@ interface TraceData {
   length: number;
 }
 
+// ColumnField is data frame field, numeric columns without nulls are kept in Float64Array
+interface ColumnField {
+  name: string;
+  type: FieldType;
+  values: Float64Array | any[];
+  config: Record<string, unknown>;
+}
+
+interface ColumnFrame {
+  refId: string;
+  name?: string;
+  fields: ColumnField[];
+  length: number;
+}
+
 export default class SqlSeries {
   refId: string;
   series: any;
@@ -205,6 +226,32 @@ export default class SqlSeries {
     return data;
   }
 
+  // toTableFrames converts rows into one data frame, columns are built directly from rows without intermediate rows
+  toTableFrames(): ColumnFrame[] {
+    if (this.series.length === 0) {
+      return [];
+    }
+
+    const fields = this.meta.map((col: any): ColumnField => {
+      if (SqlSeries._toJSType(col.type) === 'number') {
+        return {
+          name: col.name,
+          type: FieldType.number,
+          config: {},
+          values: SqlSeries._toNumberColumn(this.series, col.name),
+        };
+      }
+      return {
+        name: col.name,
+        type: FieldType.string,
+        config: {},
+        values: this.series.map((row: any) => SqlSeries._formatValueByType(row[col.name], 'string')),
+      };
+    });
+
+    return [{ refId: this.refId, fields: fields, length: this.series.length }];
+  }
+
   toLogs(): DataFrame[] {
     const dataFrame: DataFrame[] = [];
     const self = this;
@@ -349,42 +396,112 @@ export default class SqlSeries {
     return timeSeries;
   }
 
+  // toTimeSeriesFrames converts result with time column and one column per metric into data frames
+  // with shared Float64Array of timestamps, GROUP BY keys and groupArray results are converted by toTimeSeries
+  toTimeSeriesFrames(extrapolate = true): any[] {
+    if (this.series.length === 0) {
+      return [];
+    }
+
+    const timeCol = this.meta[0].name;
+    if (
+      this.keys.some((name: string) => name !== timeCol) ||
+      this.meta.some((col: any) => typeof col.type === 'string' && col.type.startsWith('Array('))
+    ) {
+      return this.toTimeSeries(extrapolate);
+    }
+
+    const times = SqlSeries._toNumberColumn(this.series, timeCol);
+    if (!(times instanceof Float64Array)) {
+      return this.toTimeSeries(extrapolate);
+    }
+
+    const frames: ColumnFrame[] = [];
+    each(this.meta, (col: any) => {
+      /* Skip timestamp and GROUP BY keys */
+      if ((this.keys.length === 0 && col.name === timeCol) || this.keys.indexOf(col.name) >= 0) {
+        return;
+      }
+      const values = SqlSeries._toNumberColumn(this.series, col.name);
+      if (extrapolate) {
+        this.extrapolateColumn(times, values);
+      }
+      frames.push({
+        refId: this.refId,
+        name: col.name,
+        fields: [
+          { name: TIME_SERIES_TIME_FIELD_NAME, type: FieldType.time, config: {}, values: times },
+          { name: TIME_SERIES_VALUE_FIELD_NAME, type: FieldType.number, config: {}, values: values },
+        ],
+        length: times.length,
+      });
+    });
+
+    return frames;
+  }
+
   extrapolate(datapoints: any) {
-    if (datapoints.length < 10 || (!this.tillNow && datapoints[0][0] !== 0)) {
-      return datapoints;
+    this._extrapolate(
+      datapoints.length,
+      (i: number) => datapoints[i][1],
+      (i: number) => datapoints[i][0],
+      (i: number, value: number) => {
+        datapoints[i][0] = value;
+      }
+    );
+    return datapoints;
+  }
+
+  extrapolateColumn(times: Float64Array, values: Float64Array | any[]) {
+    this._extrapolate(
+      times.length,
+      (i: number) => times[i],
+      (i: number) => values[i],
+      (i: number, value: number) => {
+        values[i] = value;
+      }
+    );
+  }
+
+  _extrapolate(
+    length: number,
+    time: (i: number) => any,
+    value: (i: number) => any,
+    setValue: (i: number, value: number) => void
+  ) {
+    if (length < 10 || (!this.tillNow && value(0) !== 0)) {
+      return;
     }
 
     // Duration between first/last samples and boundary of range.
-    let durationToStart = datapoints[0][1] / 1000 - this.from,
-      durationToEnd = this.to - datapoints[datapoints.length - 1][1] / 1000;
+    let durationToStart = time(0) / 1000 - this.from,
+      durationToEnd = this.to - time(length - 1) / 1000;
 
     // If the first/last samples are close to the boundaries of the range,
     // extrapolate the result.
-    let sampledInterval = (datapoints[datapoints.length - 1][1] - datapoints[0][1]) / 1000,
-      averageDurationBetweenSamples = sampledInterval / (datapoints.length - 1);
+    let sampledInterval = (time(length - 1) - time(0)) / 1000,
+      averageDurationBetweenSamples = sampledInterval / (length - 1);
 
     let diff;
     // close to left border and value is 0 because of runningDifference function
-    if (durationToStart < averageDurationBetweenSamples && datapoints[0][0] === 0) {
-      diff = ((datapoints[1][0] - datapoints[2][0]) / datapoints[1][0]) * 0.1;
+    if (durationToStart < averageDurationBetweenSamples && value(0) === 0) {
+      diff = ((value(1) - value(2)) / value(1)) * 0.1;
       diff %= 1;
       if (isNaN(diff)) {
         diff = 0;
       }
-      datapoints[0][0] = datapoints[1][0] * (1 + diff);
+      setValue(0, value(1) * (1 + diff));
     }
 
     if (durationToEnd < averageDurationBetweenSamples) {
-      let l = datapoints.length;
-      diff = ((datapoints[l - 2][0] - datapoints[l - 3][0]) / datapoints[l - 2][0]) * 0.1;
+      let l = length;
+      diff = ((value(l - 2) - value(l - 3)) / value(l - 2)) * 0.1;
       diff %= 1;
       if (isNaN(diff)) {
         diff = 0;
       }
-      datapoints[l - 1][0] = datapoints[l - 2][0] * (1 + diff);
+      setValue(l - 1, value(l - 2) * (1 + diff));
     }
-
-    return datapoints;
   }
 
   static _pushDatapoint(metrics: any, timestamp: number, key: string, value: number) {
@@ -509,6 +626,22 @@ export default class SqlSeries {
     }
   }
 
+  // _toNumberColumn returns Float64Array of column values,
+  // column with nulls or non-numeric values is returned as array of formatted values
+  static _toNumberColumn(series: any[], name: string): Float64Array | any[] {
+    const values = new Float64Array(series.length);
+    for (let i = 0; i < series.length; i++) {
+      const value = series[i][name];
+      const numeric =
+        typeof value === 'number' ? value : value === null || typeof value === 'object' ? NaN : Number(value);
+      if (isNaN(numeric)) {
+        return series.map((row: any) => SqlSeries._formatValue(row[name]));
+      }
+      values[i] = numeric;
+    }
+    return values;
+  }
+
   static _formatValueByType(value: any, t: string) {
     if (value === null) {
       return value;
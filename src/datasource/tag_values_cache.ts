@@ -0,0 +1,39 @@
+interface TagValuesEntry {
+  values: any[];
+  expiry: number;
+}
+
+// TagValuesCache keeps ad-hoc tag values per column,
+// entries expire after ttl and least recently used entries are evicted after maxEntries
+export default class TagValuesCache {
+  entries: Map<string, TagValuesEntry> = new Map();
+  ttl: number;
+  maxEntries: number;
+
+  constructor(ttl: number, maxEntries: number) {
+    this.ttl = ttl;
+    this.maxEntries = maxEntries;
+  }
+
+  get(key: string): any[] | undefined {
+    const entry = this.entries.get(key);
+    if (!entry) {
+      return undefined;
+    }
+    this.entries.delete(key);
+    if (entry.expiry <= Date.now()) {
+      return undefined;
+    }
+    // Map keeps insertion order, re-inserted entry becomes the most recently used
+    this.entries.set(key, entry);
+    return entry.values;
+  }
+
+  set(key: string, values: any[]) {
+    this.entries.delete(key);
+    this.entries.set(key, { values, expiry: Date.now() + this.ttl });
+    while (this.entries.size > this.maxEntries) {
+      this.entries.delete(this.entries.keys().next().value as string);
+    }
+  }
+}
@@ -0,0 +1,46 @@
+// benchmark of row and columnar conversion in SqlSeries, it is not matched by `npm test`, run it with `npm run bench`
+import SqlSeries from '../../datasource/sql_series';
+
+const Rows = 200000;
+const Runs = 3;
+
+const response = () => {
+  let data: any[] = [];
+  for (let i = 0; i < Rows; i++) {
+    data.push({ t: String(1485443760000 + i * 60000), requests: 1000 + (i % 97), errors: String(i % 13) });
+  }
+  return {
+    meta: [
+      { name: 't', type: 'UInt64' },
+      { name: 'requests', type: 'UInt64' },
+      { name: 'errors', type: 'UInt64' },
+    ],
+    data: data,
+  };
+};
+
+const measure = (convert: () => any) => {
+  convert();
+  const start = performance.now();
+  for (let i = 0; i < Runs; i++) {
+    convert();
+  }
+  return ((performance.now() - start) / Runs).toFixed(1) + 'ms';
+};
+
+describe('sql series conversion benchmark', () => {
+  it(`converts ${Rows * 2} points`, () => {
+    const { meta, data } = response();
+    const sqlSeries = () => new SqlSeries({ refId: 'A', series: data, meta: meta, from: 0, to: 0 });
+    console.table({
+      timeSeries: {
+        rows: measure(() => sqlSeries().toTimeSeries()),
+        columns: measure(() => sqlSeries().toTimeSeriesFrames()),
+      },
+      table: {
+        rows: measure(() => sqlSeries().toTable()),
+        columns: measure(() => sqlSeries().toTableFrames()),
+      },
+    });
+  });
+});
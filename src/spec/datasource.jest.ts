@@ -1,9 +1,17 @@
 import { size } from 'lodash';
 import SqlSeries from '../datasource/sql_series';
 import AdhocCtrl from '../datasource/adhoc';
+import TagValuesCache from '../datasource/tag_values_cache';
+import { CHDataSource } from '../datasource/datasource';
 import ResponseParser from '../datasource/response_parser';
 import { FieldType, MutableDataFrame } from '@grafana/data';
 
+jest.mock('@grafana/runtime', () => ({
+  ...jest.requireActual('@grafana/runtime'),
+  getBackendSrv: () => ({}),
+  getTemplateSrv: () => ({ getVariables: () => [], replace: (s: string) => s }),
+}));
+
 describe('clickhouse sql series:', () => {
   describe('SELECT $timeseries response WHERE $adhoc = 1', () => {
     let response = {
@@ -202,6 +210,69 @@ describe('clickhouse sql series:', () => {
     });
   });
 
+  describe('When fetching adhoc filter keys from schema resource', () => {
+    const fetchSchema = jest.fn(() =>
+      Promise.resolve({
+        items: [
+          { database: 'default', table: 'requests', name: 'Method', type: "Enum8('GET' = 1, 'it\\'s' = 2)", enumValues: ['GET', "it's"] },
+          { database: 'default', table: 'requests', name: 'URL', type: 'String' },
+        ],
+        total: 2,
+      })
+    );
+    const adhocCtrl = new AdhocCtrl({ defaultDatabase: '', fetchSchema });
+
+    it('should request user columns and use parsed Enum values', async () => {
+      const keys = await adhocCtrl.GetTagKeys();
+      expect(fetchSchema).toHaveBeenCalledWith('columns', { excludeSystem: true });
+      expect(keys.map((k: any) => k.text)).toEqual(['default.requests.Method', 'default.requests.URL', 'Method', 'URL']);
+      const values = await adhocCtrl.GetTagValues({ key: 'Method', filters: [] });
+      expect(values.map((v: any) => v.value)).toEqual(["'GET'", "'it\\'s'"]);
+    });
+  });
+
+  describe('When fetching adhoc filter values through datasource', () => {
+    const datasource = new CHDataSource({
+      url: 'http://localhost:8123',
+      jsonData: { defaultDatabase: 'default', adHocValuesLimit: 3, adHocValuesMaxRowsToRead: 1000 },
+    } as any);
+    const metricFindQuery = jest
+      .spyOn(datasource, 'metricFindQuery')
+      .mockImplementation(() => Promise.resolve([{ text: 'host-1' }, { text: 'host-2' }]));
+
+    it('should query values with limit and cache them per column', async () => {
+      let values = await datasource.getTagValues({ key: 'requests.Host', filters: [] });
+      expect(metricFindQuery).toHaveBeenLastCalledWith(
+        "SELECT DISTINCT Host AS value FROM default.requests LIMIT 3 SETTINGS max_rows_to_read=1000, read_overflow_mode='break'"
+      );
+      expect(values).toEqual([
+        { text: 'host-1', value: 'host-1' },
+        { text: 'host-2', value: 'host-2' },
+      ]);
+
+      values = await datasource.getTagValues({ key: 'requests.Host', filters: [] });
+      expect(metricFindQuery).toHaveBeenCalledTimes(1);
+      expect(values.length).toBe(2);
+
+      await datasource.getTagValues({ key: 'default.requests.Path', filters: [] });
+      expect(metricFindQuery).toHaveBeenCalledTimes(2);
+    });
+
+    it('should evict expired and least recently used values', () => {
+      const cache = new TagValuesCache(1000, 2);
+      cache.set('k1', [{ text: 'a' }]);
+      cache.set('k2', [{ text: 'b' }]);
+      cache.get('k1');
+      cache.set('k3', [{ text: 'c' }]);
+      expect(cache.get('k2')).toBeUndefined();
+      expect(cache.get('k1')).toEqual([{ text: 'a' }]);
+
+      const expired = new TagValuesCache(-1, 2);
+      expired.set('k1', [{ text: 'a' }]);
+      expect(expired.get('k1')).toBeUndefined();
+    });
+  });
+
   describe('When performing logs query', () => {
     let response = {
       meta: [
@@ -0,0 +1,132 @@
+import Scanner from '../datasource/scanner/scanner';
+import IncrementalScanner from '../datasource/scanner/incremental_scanner';
+
+const fullAST = (text: string) => {
+  try {
+    return { ast: new Scanner(text).toAST() };
+  } catch (err) {
+    return { err: String(err) };
+  }
+};
+
+const largeQuery = (conditions: number) => {
+  let where: string[] = [];
+  for (let i = 0; i < conditions; i++) {
+    where.push(`(col${i} = 'value ${i}' OR lower(name${i}) LIKE '%${i}%')`);
+  }
+  return (
+    'SELECT $timeSeries as t, count() AS c FROM $table WHERE $timeFilter AND ' +
+    where.join(' AND ') +
+    ' GROUP BY t ORDER BY t'
+  );
+};
+
+describe('incremental scanner:', () => {
+  describe('When typing in SELECT of query', () => {
+    const scanner = new IncrementalScanner();
+    let query = "SELECT a, count() AS c FROM db.t WHERE a = 'x' AND b IN (1, 2) GROUP BY a ORDER BY a LIMIT 10";
+    scanner.update(query);
+
+    it('should patch only changed section', () => {
+      query = query.replace('count()', 'countIf(b > 1)');
+      const ast = scanner.update(query);
+      expect(scanner.lastUpdate).toBe('patch');
+      expect(ast).toEqual(new Scanner(query).toAST());
+      expect(ast.select).toEqual(['a', 'countIf(b > 1) AS c']);
+    });
+
+    it('should not parse unchanged query', () => {
+      scanner.update(query);
+      expect(scanner.lastUpdate).toBe('none');
+    });
+
+    it('should parse whole query when edit adds section', () => {
+      const ast = scanner.applyEdit(query.indexOf(' GROUP BY'), 0, ' HAVING c > 1');
+      expect(scanner.lastUpdate).toBe('full');
+      expect(ast.having).toEqual(['c > 1']);
+    });
+
+    it('should parse whole query with joins', () => {
+      const joinScanner = new IncrementalScanner();
+      joinScanner.update('SELECT a FROM t1 ANY LEFT JOIN t2 USING a WHERE b = 1');
+      const ast = joinScanner.update('SELECT a FROM t1 ANY LEFT JOIN t2 USING a WHERE b = 2');
+      expect(joinScanner.lastUpdate).toBe('full');
+      expect(ast).toEqual(new Scanner('SELECT a FROM t1 ANY LEFT JOIN t2 USING a WHERE b = 2').toAST());
+    });
+  });
+
+  describe('When applying random edits', () => {
+    const queries = [
+      "SELECT $timeSeries as t, count() AS c FROM $table WHERE $timeFilter AND host IN ('a', 'b') GROUP BY t ORDER BY t",
+      "/* comment */ SELECT a, b, sum(c) FROM db.t -- comment\nWHERE a = 'x' AND b > 1 GROUP BY a, b HAVING sum(c) > 0 ORDER BY a LIMIT 10",
+      'SELECT t, groupArray((k, c)) FROM (SELECT $timeSeries as t, k, count() c FROM $table WHERE $timeFilter GROUP BY t, k) GROUP BY t ORDER BY t',
+      'WITH x AS (SELECT 1) SELECT * FROM x UNION ALL SELECT 2',
+    ];
+    const pieces = [
+      'a', ' ', ',', '(', ')', "'", '/*', '*/', '--', '\n', 'SELECT ', ' FROM ', ' WHERE ', ' GROUP BY ',
+      ' ORDER BY ', ' LIMIT ', ' AND ', ' IN [', ']', ' JOIN ', '$rate(', '1', ' UNION ALL ', 'count()',
+    ];
+    let seed = 42;
+    const random = (n: number) => {
+      seed = (seed * 1103515245 + 12345) & 0x7fffffff;
+      return seed % n;
+    };
+
+    it('should build the same AST as full scan', () => {
+      let patched = 0;
+      queries.forEach((query) => {
+        const scanner = new IncrementalScanner();
+        let text = query;
+        scanner.update(text);
+        for (let n = 0; n < 1000; n++) {
+          const offset = random(text.length + 1);
+          const deleteLength = Math.min(random(4) === 0 ? random(6) : 0, text.length - offset);
+          const insertText = random(3) === 0 ? '' : pieces[random(pieces.length)];
+          text = text.slice(0, offset) + insertText + text.slice(offset + deleteLength);
+
+          let got: any;
+          try {
+            got = { ast: random(2) === 0 ? scanner.applyEdit(offset, deleteLength, insertText) : scanner.update(text) };
+          } catch (err) {
+            got = { err: String(err) };
+          }
+          expect(scanner.text).toBe(text);
+          expect(got).toEqual(fullAST(text));
+          if (scanner.lastUpdate === 'patch') {
+            patched++;
+          }
+          if (text.length > 1000) {
+            text = query;
+            scanner.update(text);
+          }
+        }
+      });
+      expect(patched).toBeGreaterThan(0);
+    });
+  });
+
+  describe('When editing large queries', () => {
+    const typeInSelect = (conditions: number) => {
+      const scanner = new IncrementalScanner();
+      const query = largeQuery(conditions);
+      scanner.update(query);
+      const offset = query.indexOf(' FROM');
+      let maxLexed = 0;
+      for (let i = 0; i < 20; i++) {
+        scanner.applyEdit(offset + i, 0, 'x');
+        expect(scanner.lastUpdate).toBe('patch');
+        maxLexed = Math.max(maxLexed, scanner.lastLexed);
+      }
+      expect(scanner.ast).toEqual(new Scanner(scanner.text).toAST());
+      return { maxLexed, tokens: scanner.tokens.length };
+    };
+
+    it('should lex the same amount of tokens per edit regardless of query length', () => {
+      const small = typeInSelect(10);
+      const large = typeInSelect(1000);
+      expect(large.maxLexed).toBe(small.maxLexed);
+      expect(large.maxLexed).toBeLessThan(40);
+      expect(large.tokens).toBeGreaterThan(20000);
+    });
+  });
+});
@@ -1190,3 +1190,48 @@ describe('Query SELECT with special character in table', () => {
     expect(sql_query.replace(options, adhocFilters)).toBe(expQuery);
   });
 });
+
+describe('Query with GROUP BY keys refreshed with another time range', () => {
+  const query = 'SELECT $timeSeries as t, host, count() AS c FROM $table WHERE $timeFilter GROUP BY t, host ORDER BY t';
+  let templateSrv = new TemplateSrvStub();
+  const adhocFilters: any[] = [];
+  let target = {
+    query: query,
+    interval: '1s',
+    intervalFactor: 1,
+    skip_comments: false,
+    table: 'requests',
+    database: 'default',
+    dateTimeType: 'DATETIME',
+    dateColDataType: '',
+    dateTimeColDataType: 'd',
+    round: '0s',
+    rawQuery: '',
+  };
+  const rangeOptions = (from: string, to: string) => ({
+    range: { from: dayjs(from), to: dayjs(to) },
+    scopedVars: {},
+  });
+
+  it('extracts keys from the same AST and reuses it for the next refresh', () => {
+    const firstOptions = rangeOptions('2018-12-24 01:02:03Z', '2018-12-31 23:59:59Z');
+    const first = new SqlQuery(target, templateSrv, firstOptions);
+    expect(first.replace(firstOptions, adhocFilters)).toContain('toDateTime(1545613323)');
+    expect(first.keys).toEqual(['t', 'host']);
+
+    const expandSpy = jest.spyOn(SqlQuery.prototype, 'expand');
+    const nextOptions = rangeOptions('2018-12-25 01:02:03Z', '2019-01-01 23:59:59Z');
+    const next = new SqlQuery(target, templateSrv, nextOptions);
+    expect(next.replace(nextOptions, adhocFilters)).toContain('toDateTime(1545699723)');
+    expect(next.keys).toEqual(['t', 'host']);
+    expect(expandSpy).not.toHaveBeenCalled();
+    expandSpy.mockRestore();
+  });
+
+  it('leaves keys with macros to rendered statement', () => {
+    const options = rangeOptions('2018-12-24 01:02:03Z', '2018-12-31 23:59:59Z');
+    const sqlQuery = new SqlQuery({ ...target, query: 'SELECT $timeSeries, count() FROM $table GROUP BY $timeSeries' }, templateSrv, options);
+    sqlQuery.replace(options, adhocFilters);
+    expect(sqlQuery.keys).toBeUndefined();
+  });
+});
@@ -0,0 +1,100 @@
+import SqlSeries from '../datasource/sql_series';
+import { FieldType } from '@grafana/data';
+
+const wideResponse = (rows: number, withNull = false) => {
+  let data: any[] = [];
+  for (let i = 0; i < rows; i++) {
+    data.push({
+      t: String(1485443760000 + i * 60000),
+      requests: i === 0 ? 0 : 1000 + (i % 97),
+      errors: withNull && i === 5 ? null : String(i % 13),
+    });
+  }
+  return {
+    meta: [
+      { name: 't', type: 'UInt64' },
+      { name: 'requests', type: 'UInt64' },
+      { name: 'errors', type: 'Nullable(UInt64)' },
+    ],
+    data: data,
+  };
+};
+
+const sqlSeries = (response: any, keys: string[] = []) =>
+  new SqlSeries({
+    refId: 'A',
+    series: response.data,
+    meta: response.meta,
+    keys: keys,
+    tillNow: true,
+    from: 1485443760,
+    to: 1485443760 + response.data.length * 60,
+  });
+
+// datapoints returns the same [value, timestamp] pairs as toTimeSeries for data frame
+const datapoints = (frame: any) =>
+  Array.from(frame.fields[0].values, (t: number, i: number) => [frame.fields[1].values[i], t]);
+
+describe('sql series columnar conversion:', () => {
+  describe('When converting time series', () => {
+    const response = wideResponse(20);
+
+    it('should build typed columns with the same datapoints as row conversion', () => {
+      const frames = sqlSeries(response).toTimeSeriesFrames();
+      const timeSeries = sqlSeries(response).toTimeSeries();
+      expect(frames.map((f: any) => f.name)).toEqual(['requests', 'errors']);
+      expect(frames[0].fields[0].type).toBe(FieldType.time);
+      expect(frames[0].fields[0].values).toBeInstanceOf(Float64Array);
+      expect(frames[0].fields[0].values).toBe(frames[1].fields[0].values);
+      expect(frames[0].fields[1].values).toBeInstanceOf(Float64Array);
+      expect(frames[0].refId).toBe('A');
+      expect(frames.map(datapoints)).toEqual(timeSeries.map((ts: any) => ts.datapoints));
+      // first value of runningDifference is extrapolated
+      expect(frames[0].fields[1].values[0]).not.toBe(0);
+    });
+
+    it('should keep columns with nulls as arrays', () => {
+      const nullResponse = wideResponse(20, true);
+      const frames = sqlSeries(nullResponse).toTimeSeriesFrames(false);
+      expect(frames[0].fields[1].values).toBeInstanceOf(Float64Array);
+      expect(Array.isArray(frames[1].fields[1].values)).toBe(true);
+      expect(frames[1].fields[1].values[5]).toBeNull();
+      expect(frames.map(datapoints)).toEqual(
+        sqlSeries(nullResponse)
+          .toTimeSeries(false)
+          .map((ts: any) => ts.datapoints)
+      );
+    });
+
+    it('should convert GROUP BY keys by rows', () => {
+      const keyed = {
+        meta: [
+          { name: 't', type: 'UInt64' },
+          { name: 'host', type: 'String' },
+          { name: 'c', type: 'UInt64' },
+        ],
+        data: [
+          { t: '1485443760000', host: 'a', c: '1' },
+          { t: '1485443760000', host: 'b', c: '2' },
+        ],
+      };
+      const frames = sqlSeries(keyed, ['t', 'host']).toTimeSeriesFrames();
+      expect(frames).toEqual(sqlSeries(keyed, ['t', 'host']).toTimeSeries());
+    });
+  });
+
+  describe('When converting table', () => {
+    it('should build the same columns as rows of table', () => {
+      const response = wideResponse(10, true);
+      response.meta.push({ name: 'host', type: 'String' });
+      response.data.forEach((row: any, i: number) => (row.host = i % 2 ? 'a' : { name: 'b' }));
+      const frame = sqlSeries(response).toTableFrames()[0];
+      const table = sqlSeries(response).toTable()[0];
+      expect(frame.fields.map((f: any) => f.name)).toEqual(table.columns.map((c: any) => c.text));
+      expect(frame.fields[0].values).toBeInstanceOf(Float64Array);
+      expect(frame.fields[3].type).toBe(FieldType.string);
+      expect(frame.length).toBe(10);
+      expect(table.rows).toEqual(table.rows.map((_row: any, i: number) => frame.fields.map((f: any) => f.values[i])));
+    });
+  });
+});
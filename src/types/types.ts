@@ -38,6 +38,7 @@ export interface CHQuery extends DataQuery {
   add_metadata?: boolean;
 
   round?: string;
+  splitInterval?: string;
   intervalFactor?: number;
   interval?: string;
   formattedQuery?: string;
@@ -62,6 +63,55 @@ export interface CHDataSourceOptions extends DataSourceJsonData {
   defaultUint32?: string;
   defaultDateDate32?: string;
   defaultDateTimeType?: string;
+  maxIdleConns?: number;
+  maxIdleConnsPerHost?: number;
+  maxConnsPerHost?: number;
+  idleConnTimeout?: number;
+  timeZoneCacheTTL?: number;
+  responseFormat?: string;
+  evalQueryCacheSize?: number;
+  maxConcurrentQueries?: number;
+  deduplicateQueries?: boolean;
+  resultCacheSize?: number;
+  resultCacheUnsettledWindow?: number;
+  querySettings?: Record<string, string | number | boolean>;
+  panelQuerySettings?: Record<string, string | number | boolean>;
+  alertQuerySettings?: Record<string, string | number | boolean>;
+  replicas?: string[];
+  replicaHealthCheckInterval?: number;
+  sendProgress?: boolean;
+  maxRowsToRead?: number;
+  requestCompressionThreshold?: number;
+  schemaCacheTTL?: number;
+  adHocValuesLimit?: number;
+  adHocValuesCacheTTL?: number;
+  adHocValuesMaxRowsToRead?: number;
+}
+
+/**
+ * Query params and response of schema resources served by backend
+ */
+export interface SchemaParams {
+  database?: string;
+  table?: string;
+  prefix?: string;
+  types?: string;
+  excludeSystem?: boolean;
+  offset?: number;
+  limit?: number;
+}
+
+export interface SchemaColumn {
+  database: string;
+  table: string;
+  name: string;
+  type: string;
+  enumValues?: string[];
+}
+
+export interface SchemaResponse<T = any> {
+  items: T[];
+  total: number;
 }
 
 /**
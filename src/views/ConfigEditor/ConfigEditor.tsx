@@ -24,7 +24,7 @@ export function ConfigEditor(props: Props) {
     jsonData.dataSourceUrl = newOptions.url
   }
   const onSwitchToggle = (
-    key: keyof Pick<CHDataSourceOptions, 'useYandexCloudAuthorization' | 'addCorsHeader' | 'usePOST' | 'useCompression'>,
+    key: keyof Pick<CHDataSourceOptions, 'useYandexCloudAuthorization' | 'addCorsHeader' | 'usePOST' | 'useCompression' | 'deduplicateQueries' | 'sendProgress'>,
     value: boolean
   ) => {
     onOptionsChange({
@@ -72,6 +72,17 @@ export function ConfigEditor(props: Props) {
     onOptionsChange({ ...options, jsonData: {...jsonData}})
   };
 
+  const onNumberFieldChange = (
+    key: keyof Pick<CHDataSourceOptions, 'maxIdleConns' | 'maxIdleConnsPerHost' | 'maxConnsPerHost' | 'idleConnTimeout' | 'maxConcurrentQueries' | 'resultCacheSize' | 'resultCacheUnsettledWindow' | 'maxRowsToRead' | 'requestCompressionThreshold' | 'adHocValuesLimit' | 'adHocValuesCacheTTL' | 'adHocValuesMaxRowsToRead'>,
+    event: FormEvent<HTMLInputElement>
+  ) => {
+    const value = parseInt(event.currentTarget.value, 10);
+    onOptionsChange({
+      ...newOptions,
+      jsonData: { ...jsonData, [key]: isNaN(value) ? undefined : value },
+    });
+  };
+
   return (
     <>
       <DataSourceHttpSettings
@@ -161,6 +172,48 @@ export function ConfigEditor(props: Props) {
             onChange={onUpdateDatasourceJsonDataOption(props, 'defaultDatabase')}
           />
         </InlineField>
+        <InlineField
+          label="Ad-hoc values limit"
+          labelWidth={32}
+          tooltip="How many distinct values of column are fetched for ad-hoc filter, 0 means 300"
+        >
+          <Input
+            data-test-id='adhoc-values-limit-input'
+            type="number"
+            width={24}
+            value={jsonData.adHocValuesLimit || ''}
+            placeholder="300"
+            onChange={(e) => onNumberFieldChange('adHocValuesLimit', e)}
+          />
+        </InlineField>
+        <InlineField
+          label="Ad-hoc values cache TTL (seconds)"
+          labelWidth={32}
+          tooltip="How long fetched ad-hoc filter values are cached in browser, 0 means 300"
+        >
+          <Input
+            data-test-id='adhoc-values-cache-ttl-input'
+            type="number"
+            width={24}
+            value={jsonData.adHocValuesCacheTTL || ''}
+            placeholder="300"
+            onChange={(e) => onNumberFieldChange('adHocValuesCacheTTL', e)}
+          />
+        </InlineField>
+        <InlineField
+          label="Ad-hoc values max rows to read"
+          labelWidth={32}
+          tooltip="Stop reading table after this amount of rows when ad-hoc filter values are fetched from huge tables, values may be incomplete, 0 disables"
+        >
+          <Input
+            data-test-id='adhoc-values-max-rows-to-read-input'
+            type="number"
+            width={24}
+            value={jsonData.adHocValuesMaxRowsToRead || ''}
+            placeholder="0"
+            onChange={(e) => onNumberFieldChange('adHocValuesMaxRowsToRead', e)}
+          />
+        </InlineField>
         <InlineField
           label="Use Compression"
           labelWidth={32}
@@ -194,6 +247,181 @@ export function ConfigEditor(props: Props) {
             ]}
           />
         </InlineField>
+        <InlineField
+          label="Request compression threshold (bytes)"
+          labelWidth={32}
+          tooltip="POST queries longer than threshold are sent compressed with selected compression type, useful for big ad-hoc filters and multi-value variables over slow links, 0 disables"
+        >
+          <Input
+            data-test-id='request-compression-threshold-input'
+            type="number"
+            width={24}
+            value={jsonData.requestCompressionThreshold || ''}
+            placeholder="0"
+            disabled={!jsonData.useCompression || !jsonData.usePOST}
+            onChange={(e) => onNumberFieldChange('requestCompressionThreshold', e)}
+          />
+        </InlineField>
+        <InlineField
+          label="Response format"
+          labelWidth={32}
+          tooltip="Result format requested by backend for alerts and backend queries. JSONCompact is decoded as a stream directly into data frame columns and use less memory for big results. RowBinaryWithNamesAndTypes avoids text formatting of numbers and dates."
+        >
+          <Select
+            data-test-id="response-format-select"
+            id="responseFormat"
+            allowCustomValue={false}
+            width={24}
+            value={jsonData.responseFormat || 'JSON'}
+            onChange={(column) => onFieldChange(column, 'responseFormat')}
+            options={[
+              {label: 'JSON', value: 'JSON'},
+              {label: 'JSONCompact', value: 'JSONCompact'},
+              {label: 'RowBinaryWithNamesAndTypes', value: 'RowBinaryWithNamesAndTypes'},
+            ]}
+          />
+        </InlineField>
+      </div>
+      <h3 className="page-heading">Connection pool</h3>
+      <div className="gf-form-group">
+        <InlineField
+          label="Max idle connections"
+          labelWidth={32}
+          tooltip="Maximum keep-alive connections kept open by backend for all ClickHouse hosts, 0 means default 100"
+        >
+          <Input
+            data-test-id='max-idle-conns-input'
+            type="number"
+            width={24}
+            value={jsonData.maxIdleConns || ''}
+            placeholder="100"
+            onChange={(e) => onNumberFieldChange('maxIdleConns', e)}
+          />
+        </InlineField>
+        <InlineField
+          label="Max idle connections per host"
+          labelWidth={32}
+          tooltip="Maximum keep-alive connections kept open by backend for each ClickHouse host, 0 means default 32"
+        >
+          <Input
+            data-test-id='max-idle-conns-per-host-input'
+            type="number"
+            width={24}
+            value={jsonData.maxIdleConnsPerHost || ''}
+            placeholder="32"
+            onChange={(e) => onNumberFieldChange('maxIdleConnsPerHost', e)}
+          />
+        </InlineField>
+        <InlineField
+          label="Max open connections per host"
+          labelWidth={32}
+          tooltip="Maximum connections to each ClickHouse host including active ones, 0 means unlimited"
+        >
+          <Input
+            data-test-id='max-conns-per-host-input'
+            type="number"
+            width={24}
+            value={jsonData.maxConnsPerHost || ''}
+            placeholder="0"
+            onChange={(e) => onNumberFieldChange('maxConnsPerHost', e)}
+          />
+        </InlineField>
+        <InlineField
+          label="Idle connection timeout (seconds)"
+          labelWidth={32}
+          tooltip="How long idle keep-alive connection stay open before closing, 0 means default 90 seconds"
+        >
+          <Input
+            data-test-id='idle-conn-timeout-input'
+            type="number"
+            width={24}
+            value={jsonData.idleConnTimeout || ''}
+            placeholder="90"
+            onChange={(e) => onNumberFieldChange('idleConnTimeout', e)}
+          />
+        </InlineField>
+        <InlineField
+          label="Max concurrent queries"
+          labelWidth={32}
+          tooltip="Maximum queries executed by backend at the same time, other queries wait in queue shared fairly between users, 0 means default 32, negative value means unlimited"
+        >
+          <Input
+            data-test-id='max-concurrent-queries-input'
+            type="number"
+            width={24}
+            value={jsonData.maxConcurrentQueries || ''}
+            placeholder="32"
+            onChange={(e) => onNumberFieldChange('maxConcurrentQueries', e)}
+          />
+        </InlineField>
+        <InlineField
+          label="Deduplicate identical queries"
+          labelWidth={32}
+          tooltip="Identical queries running at the same time, for example the same dashboard opened by many users, are sent to ClickHouse once and share the result"
+        >
+          <InlineSwitch
+            data-test-id='deduplicate-queries-switch'
+            id="deduplicateQueries"
+            className="gf-form"
+            value={jsonData.deduplicateQueries || false}
+            onChange={(e) => onSwitchToggle('deduplicateQueries', e.currentTarget.checked)}
+          />
+        </InlineField>
+        <InlineField
+          label="Result cache size (MB)"
+          labelWidth={32}
+          tooltip="Memory for results of time series queries with $timeSeries and $timeFilter macros, on dashboard refresh only new buckets are fetched from ClickHouse, 0 disables cache"
+        >
+          <Input
+            data-test-id='result-cache-size-input'
+            type="number"
+            width={24}
+            value={jsonData.resultCacheSize || ''}
+            placeholder="0"
+            onChange={(e) => onNumberFieldChange('resultCacheSize', e)}
+          />
+        </InlineField>
+        <InlineField
+          label="Result cache unsettled window (seconds)"
+          labelWidth={32}
+          tooltip="Last buckets of cached result which are fetched again on each refresh because data can still arrive, 0 means default 60 seconds"
+        >
+          <Input
+            data-test-id='result-cache-unsettled-window-input'
+            type="number"
+            width={24}
+            value={jsonData.resultCacheUnsettledWindow || ''}
+            placeholder="60"
+            onChange={(e) => onNumberFieldChange('resultCacheUnsettledWindow', e)}
+          />
+        </InlineField>
+        <InlineField
+          label="Send progress headers"
+          labelWidth={32}
+          tooltip="Enables send_progress_in_http_headers, rows and bytes read by ClickHouse are shown in query inspector"
+        >
+          <InlineSwitch
+            data-test-id='send-progress-switch'
+            id="sendProgress"
+            className="gf-form"
+            value={jsonData.sendProgress || false}
+            onChange={(e) => onSwitchToggle('sendProgress', e.currentTarget.checked)}
+          />
+        </InlineField>
+        <InlineField
+          label="Max rows to read"
+          labelWidth={32}
+          tooltip="ClickHouse stops queries which read more rows with error instead of waiting for timeout, 0 means unlimited"
+        >
+          <Input
+            data-test-id='max-rows-to-read-input'
+            type="number"
+            width={24}
+            value={jsonData.maxRowsToRead || ''}
+            placeholder="0"
+            onChange={(e) => onNumberFieldChange('maxRowsToRead', e)}
+          />
+        </InlineField>
       </div>
     </>
   );
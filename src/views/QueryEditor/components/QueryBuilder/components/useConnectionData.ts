@@ -12,67 +12,42 @@ export const useConnectionData = (query, datasource) => {
   let [selectedColumnDateType, setSelectedColumnDateType] = useState(query.dateColDataType);
   let [selectedDateTimeType, setSelectedDateTimeType] = useState(query.dateTimeType);
 
-  const buildExploreQuery = useCallback((type) => {
-    let query;
+  // segments are served from schema cache of backend, see CallResource in pkg/datasource.go
+  const querySegment = useCallback(async (type: any) => {
+    const columns = async (types: string) => {
+      if (!selectedDatabase || !selectedTable) {
+        return { items: [], total: 0 };
+      }
+      return datasource.fetchSchema('columns', { database: selectedDatabase, table: selectedTable, types });
+    };
+    let response;
     switch (type) {
+      case 'DATABASES':
+        response = await datasource.fetchSchema('databases');
+        return response.items.map((name: string) => ({ text: name }));
       case 'TABLES':
-        query = 'SELECT name ' +
-          'FROM system.tables ' +
-          'WHERE database = \'' + selectedDatabase + '\' ' +
-          'ORDER BY name';
-        break;
+        response = await datasource.fetchSchema('tables', { database: selectedDatabase });
+        return response.items.map((item: any) => ({ text: item.name }));
       case 'DATE':
-        query = 'SELECT name ' +
-          'FROM system.columns ' +
-          'WHERE database = \'' + selectedDatabase + '\' AND ' +
-          'table = \'' + selectedTable + '\' AND ' +
-          'match(type,\'^Date$|^Date\\([^)]+\\)$\') ' +
-          'ORDER BY name ' +
-          'UNION ALL SELECT \' \' AS name';
-        break;
+        response = await columns('Date');
+        return [...response.items.map((item: any) => ({ text: item.name })), { text: ' ' }];
       case TimestampFormat.DateTime:
-        query = 'SELECT name ' +
-          'FROM system.columns ' +
-          'WHERE database = \'' + selectedDatabase + '\' AND ' +
-          'table = \'' + selectedTable + '\' AND ' +
-          'match(type,\'^DateTime$|^DateTime\\([^)]+\\)$\') ' +
-          'ORDER BY name';
+        response = await columns('DateTime');
         break;
       case TimestampFormat.DateTime64:
-        query = 'SELECT name ' +
-          'FROM system.columns ' +
-          'WHERE database = \'' + selectedDatabase + '\' AND ' +
-          'table = \'' + selectedTable + '\' AND ' +
-          'type LIKE \'DateTime64%\' ' +
-          'ORDER BY name';
+        response = await columns('DateTime64');
         break;
       case 'TIMESTAMP':
-        query = 'SELECT name ' +
-          'FROM system.columns ' +
-          'WHERE database = \'' + selectedDatabase + '\' AND ' +
-          'table = \'' + selectedTable + '\' AND ' +
-          'type = \'UInt32\' ' +
-          'ORDER BY name';
-        break;
-      case 'DATABASES':
-        query = 'SELECT name ' +
-          'FROM system.databases ' +
-          'ORDER BY name';
+        response = await columns('UInt32');
         break;
       case 'COLUMNS':
-        query = 'SELECT name text, type value ' +
-          'FROM system.columns ' +
-          'WHERE database = \'' + selectedDatabase + '\' AND ' +
-          'table = \'' + selectedTable + '\'';
-        break;
+        response = await datasource.fetchSchema('columns', { database: selectedDatabase, table: selectedTable });
+        return response.items.map((item: any) => ({ text: item.name, value: item.type }));
+      default:
+        return [];
     }
-    return query;
-  },[selectedTable, selectedDatabase])
-
-  const querySegment = useCallback((type: any) => {
-    let query = buildExploreQuery(type);
-    return datasource.metricFindQuery(query)
-  },[buildExploreQuery, datasource])
+    return response.items.map((item: any) => ({ text: item.name }));
+  },[selectedTable, selectedDatabase, datasource])
 
   useEffect(() => {
     (async () => {
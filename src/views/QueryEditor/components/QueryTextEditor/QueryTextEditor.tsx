@@ -51,6 +51,12 @@ export const QueryTextEditor = ({
     onFieldChange({ ...fieldValues, query: query.query, round: value });
   };
 
+  const handleSplitIntervalChange = (event: React.ChangeEvent<HTMLInputElement>) => {
+    const { value } = event.target;
+    setFieldValues({ ...fieldValues, query: query.query, splitInterval: value });
+    onFieldChange({ ...fieldValues, query: query.query, splitInterval: value });
+  };
+
   const handleFormatChange = (value: string | undefined) => {
     setFieldValues({ ...fieldValues, query: query.query, format: value || '' });
     onFieldChange({ ...fieldValues, query: query.query, format: value });
@@ -105,6 +111,11 @@ export const QueryTextEditor = ({
           >
             <Input data-testid="round-input" placeholder="" onChange={handleRoundChange} value={fieldValues.round} />
           </InlineField>
+          <InlineField
+            label={<InlineLabel width={10} tooltip="Split long time range to parallel backend queries of this duration, e.g. 24h, used by alerts">Split</InlineLabel>}
+          >
+            <Input data-testid="split-interval-input" placeholder="" onChange={handleSplitIntervalChange} value={fieldValues.splitInterval} />
+          </InlineField>
           <InlineField>
             <ToolbarButton variant={'primary'} onClick={() => handleToggleField('showHelp')} isOpen={fieldValues.showHelp}>Show help</ToolbarButton>
           </InlineField>
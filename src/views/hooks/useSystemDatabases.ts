@@ -1,12 +1,12 @@
 import {useEffect, useState} from "react";
 
-const databasesQuery = 'SELECT name FROM system.tables\n' +
-  'WHERE database=\'system\' AND name IN (\n' +
-  '\'functions\',\'table_engines\',\'formats\',\n' +
-  '\'table_functions\',\'data_type_families\',\'merge_tree_settings\',\n' +
-  '\'settings\',\'clusters\',\'macros\',\'storage_policies\',\'aggregate_function_combinators\',\n' +
-  '\'database\',\'tables\',\'dictionaries\',\'columns\'\n' +
-  ')'
+// system tables which are used for SQL code editor suggestions
+const systemTables = [
+  'functions','table_engines','formats',
+  'table_functions','data_type_families','merge_tree_settings',
+  'settings','clusters','macros','storage_policies','aggregate_function_combinators',
+  'database','tables','dictionaries','columns'
+]
 
 export const useSystemDatabases = (datasource) => {
   const [data, setData] = useState<null | any[]>(null);
@@ -25,10 +25,11 @@ export const useSystemDatabases = (datasource) => {
       }
 
       try {
-        const result = await datasource.metricFindQuery(databasesQuery);
+        const response = await datasource.fetchSchema('tables', { database: 'system' });
+        const result = response.items.map(item => item.name).filter(name => systemTables.includes(name));
         const expiry = now.getTime() + 10 * 60 * 1000;
-        localStorage.setItem(storageKey, JSON.stringify({ expiry, result: result.map(item => item.text) }));
-        setData( result.map(item => item.text));
+        localStorage.setItem(storageKey, JSON.stringify({ expiry, result }));
+        setData(result);
       } catch (error) {
         setData([]);
         console.error("Failed to fetch data:", error)